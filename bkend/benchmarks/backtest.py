@@ -0,0 +1,263 @@
+"""
+Rolling-origin backtest of the forecasting model.
+
+Every fold trains on all of a series before an origin date and forecasts
+the --horizon-days days after it, as the model would be used; origins step
+back from the end of the series by --step-days. Errors are pooled over the
+folds per day of horizon (1 = the day after the origin), next to the train
+time, prediction throughput and size of each fold's model. Results are
+written as JSON so runs on different commits can be compared.
+
+Series are power CSVs (Time and Main_Transformer like Power.csv, or Time
+and Power in W like the per-building exports; other CSVs are skipped) and,
+with --db, each meter's 15-minute demand rollup.
+
+    uv run python -m benchmarks.backtest --csv data/*.csv --output backtest.json
+    uv run python -m benchmarks.backtest --db --folds 4 --horizon-days 3
+"""
+import argparse
+import glob
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from src.api.series import meter_slices
+from src.ml_model import SPLITTERS, FlatForest, SimpleForest, load_training_data, save_forest, time_features
+from src.models import DemandIntervalDB
+
+DAY = np.timedelta64(1, "D")
+
+
+def load_csv_series(path: str):
+    """(timestamps, kW) of a power CSV in time order, or None if it has no power column"""
+    columns = pd.read_csv(path, nrows=0).columns
+    if "Main_Transformer" in columns:
+        df = load_training_data(path)
+        ts, kw = df["DateTime"].to_numpy(), df["Power"].to_numpy()
+    elif {"Time", "Power"} <= set(columns):
+        df = pd.read_csv(path, usecols=["Time", "Power"], dtype={"Power": str})
+        ts = pd.to_datetime(df["Time"], format="%Y/%m/%d %H:%M:%S").to_numpy()
+        kw = pd.to_numeric(df["Power"].str.replace(",", ""), errors="coerce").to_numpy() / 1000
+    else:
+        return None
+
+    keep = ~np.isnan(kw)
+    ts, kw = ts[keep].astype("datetime64[s]"), kw[keep]
+    order = np.argsort(ts, kind="stable")
+    return ts[order], kw[order]
+
+
+def load_db_series(database_url: str | None, meter_ids: list[int] | None):
+    """{meter_id: (timestamps, kW)} from the demand rollup"""
+    if database_url:
+        engine = create_engine(database_url)
+    else:
+        from src.database import db_engine as engine
+
+    stmt = select(DemandIntervalDB.meter_id, DemandIntervalDB.interval_start, DemandIntervalDB.demand_kw).order_by(
+        DemandIntervalDB.meter_id, DemandIntervalDB.interval_start
+    )
+    if meter_ids:
+        stmt = stmt.where(DemandIntervalDB.meter_id.in_(meter_ids))
+    with Session(engine) as db:
+        rows = db.execute(stmt).all()
+    if not rows:
+        return {}
+
+    meters, ts, kw = zip(*rows)
+    meters = np.array(meters, dtype=np.int64)
+    ts = np.array(ts, dtype="datetime64[s]")
+    kw = np.array(kw, dtype=np.float64)
+    return {meter_id: (ts[part], kw[part]) for meter_id, part in meter_slices(meters)}
+
+
+def fold_origins(ts, folds: int, horizon_days: int, step_days: int, min_train_days: int):
+    """Midnight origins, oldest first, whose horizon ends by the last day and that have enough history"""
+    first = ts[0].astype("datetime64[D]")
+    last = ts[-1].astype("datetime64[D]") + DAY
+    origins = [last - horizon_days * DAY - k * step_days * DAY for k in range(folds)]
+    return [o for o in reversed(origins) if o - first >= min_train_days * DAY]
+
+
+def scores(y_true, y_pred):
+    err = y_pred - y_true
+    ss_tot = np.sum((y_true - y_true.mean()) ** 2)
+    return {
+        "rows": int(len(y_true)),
+        "mae": float(np.mean(np.abs(err))),
+        "rmse": float(np.sqrt(np.mean(err ** 2))),
+        # Undefined for a flat test window
+        "r2": float(1 - np.sum(err ** 2) / ss_tot) if ss_tot > 0 else None,
+    }
+
+
+def model_bytes(model: FlatForest) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "model.bin"
+        save_forest(path, model, {})
+        return path.stat().st_size
+
+
+def predict_throughput(model: FlatForest, points: int, rng_seed: int, repeat: int = 3):
+    rng = np.random.default_rng(rng_seed)
+    X = np.column_stack([
+        rng.integers(1, 13, points),
+        rng.integers(0, 7, points),
+        rng.integers(0, 24, points),
+        rng.integers(0, 60, points),
+    ])
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict(X)
+        best = min(best, time.perf_counter() - start)
+    return points / best
+
+
+def backtest(name: str, source: str, ts, kw, args):
+    origins = fold_origins(ts, args.folds, args.horizon_days, args.step_days, args.min_train_days)
+    X = time_features(ts)
+    result = {
+        "name": name,
+        "source": source,
+        "rows": int(len(ts)),
+        "start": str(ts[0]),
+        "end": str(ts[-1]),
+        "folds": [],
+        "horizons": [],
+    }
+
+    truth, predicted, horizon = [], [], []
+    for origin in origins:
+        train = ts < origin
+        test = (ts >= origin) & (ts < origin + args.horizon_days * DAY)
+        if not test.any():
+            continue
+
+        forest = SimpleForest(
+            n_trees=args.trees, max_depth=args.max_depth, splitter=args.splitter,
+            n_jobs=args.jobs, random_state=args.rng_seed,
+        )
+        start = time.perf_counter()
+        forest.fit(X[train], kw[train])
+        train_seconds = time.perf_counter() - start
+        model = FlatForest.from_forest(forest)
+
+        y_pred = model.predict(X[test])
+        flat, _ = model.arrays()
+        result["folds"].append({
+            "origin": str(origin),
+            "train_rows": int(train.sum()),
+            "train_seconds": train_seconds,
+            "predict_rows_per_second": predict_throughput(model, args.predict_points, args.rng_seed),
+            "nodes": int(len(flat.value)),
+            "model_bytes": model_bytes(model),
+            **scores(kw[test], y_pred),
+        })
+        truth.append(kw[test])
+        predicted.append(y_pred)
+        horizon.append(((ts[test] - origin) // DAY).astype(np.int64) + 1)
+
+    if not truth:
+        return result
+
+    truth, predicted, horizon = np.concatenate(truth), np.concatenate(predicted), np.concatenate(horizon)
+    for day in range(1, args.horizon_days + 1):
+        sel = horizon == day
+        if sel.any():
+            result["horizons"].append({"day": day, **scores(truth[sel], predicted[sel])})
+    result["overall"] = scores(truth, predicted)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_series(result):
+    print(f"\n{result['name']} ({result['rows']:,} rows, {result['start']} .. {result['end']})")
+    if not result["folds"]:
+        print("  not enough history for a fold")
+        return
+
+    print(f"  {'origin':>19} {'train rows':>10} {'fit s':>7} {'pred rows/s':>12} {'nodes':>7} {'KiB':>6} {'RMSE':>8}")
+    for fold in result["folds"]:
+        print(
+            f"  {fold['origin']:>19} {fold['train_rows']:>10,} {fold['train_seconds']:>7.2f}"
+            f" {fold['predict_rows_per_second']:>12,.0f} {fold['nodes']:>7,} {fold['model_bytes'] / 1024:>6.0f}"
+            f" {fold['rmse']:>8.2f}"
+        )
+
+    print(f"  {'day':>3} {'rows':>6} {'MAE kW':>8} {'RMSE kW':>8} {'R²':>7}")
+    for row in result["horizons"] + [{"day": "all", **result["overall"]}]:
+        r2 = f"{row['r2']:>7.3f}" if row["r2"] is not None else f"{'-':>7}"
+        print(f"  {row['day']:>3} {row['rows']:>6,} {row['mae']:>8.2f} {row['rmse']:>8.2f} {r2}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", nargs="*", help="Power CSVs; data/*.csv when neither --csv nor --db is given")
+    parser.add_argument("--db", action="store_true", help="Backtest every meter's demand rollup")
+    parser.add_argument("--database-url", help="Database for --db; the configured one by default")
+    parser.add_argument("--meter", type=int, nargs="*", help="Meters for --db; all by default")
+    parser.add_argument("--folds", type=int, default=6)
+    parser.add_argument("--horizon-days", type=int, default=7)
+    parser.add_argument("--step-days", type=int, default=7)
+    parser.add_argument("--min-train-days", type=int, default=28)
+    parser.add_argument("--trees", type=int, default=10)
+    parser.add_argument("--max-depth", type=int, default=8)
+    parser.add_argument("--splitter", choices=SPLITTERS, default=SPLITTERS[0])
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes per fit")
+    parser.add_argument("--predict-points", type=int, default=100_000)
+    parser.add_argument("--rng-seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args()
+
+    csv_paths = args.csv
+    if csv_paths is None and not args.db:
+        csv_paths = sorted(glob.glob("data/*.csv"))
+
+    results = []
+    for path in csv_paths or []:
+        series = load_csv_series(path)
+        if series is None:
+            print(f"Skipping {path}: no power column")
+            continue
+        results.append(backtest(Path(path).stem, "csv", *series, args))
+        print_series(results[-1])
+
+    if args.db:
+        for meter_id, series in load_db_series(args.database_url, args.meter).items():
+            results.append(backtest(f"meter {meter_id}", "db", *series, args))
+            print_series(results[-1])
+
+    if args.output:
+        params = {key: value for key, value in vars(args).items() if key not in ("output", "database_url")}
+        report = {
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "params": params,
+            "series": results,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Monthly billing benchmark: daily energy from the counter readings with
+per-day subqueries (legacy) vs. one window-function query per month, next
+to calculate_bill, which now prices the interval table instead.
+
+Seeds a scratch database with a year of synthetic energy readings and times
+the energy derivation of every month both ways, checking they agree.
+
+    uv run python -m benchmarks.billing_bench --database-url postgresql://.../kusm_bench
+
+The target database is wiped and reseeded with --seed; never point it at
+the production database.
+"""
+import argparse
+import calendar
+import io
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import Date, and_, cast, create_engine, func
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.models import Base, EnergyDB, MeterDB
+from src.api.billing import calculate_bill
+from src.api.interval_energy import refresh_interval_energy
+
+
+ENERGY_COLUMNS = (
+    "meter_id", "timestamp",
+    "\"phase_A_grid_consumption\"", "\"phase_A_exported_power\"",
+    "\"phase_B_grid_consumption\"", "\"phase_B_exported_power\"",
+    "\"phase_C_grid_consumption\"", "\"phase_C_exported_power\"",
+)
+
+
+def seed(engine, year: int, meters: int, interval_minutes: int, rng_seed: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        conn.execute(MeterDB.__table__.insert(), [
+            {"meter_id": i, "name": f"Bench Meter {i}", "sn": f"BENCH{i:05d}"}
+            for i in range(1, meters + 1)
+        ])
+
+    rng = np.random.default_rng(rng_seed)
+    timestamps = np.arange(
+        np.datetime64(f"{year}-01-01T00:00"),
+        np.datetime64(f"{year + 1}-01-01T00:00"),
+        np.timedelta64(interval_minutes, "m"),
+    )
+    n = len(timestamps)
+    stamps = np.datetime_as_string(timestamps, unit="s")
+    hours = timestamps.astype("datetime64[h]").astype(np.int64) % 24
+    daily_shape = 1.0 + 0.6 * np.sin((hours - 6) / 24 * 2 * np.pi)
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for meter_id in range(1, meters + 1):
+            # kWh per interval per phase, accumulated into counters
+            load = rng.gamma(4.0, 0.05, (n, 3)) * daily_shape[:, None] * interval_minutes / 15
+            counters = 1000 + np.cumsum(load, axis=0)
+            if meter_id % 25 == 0:
+                # An occasional counter reset, like a replaced meter
+                reset = rng.integers(n // 4, 3 * n // 4)
+                counters[reset:] -= counters[reset] - 0.5
+
+            buffer = io.StringIO()
+            for ts, (a, b, c) in zip(stamps, counters):
+                buffer.write(f"{meter_id}\t{ts}\t{a:.4f}\t0\t{b:.4f}\t0\t{c:.4f}\t0\n")
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY energy ({', '.join(ENERGY_COLUMNS)}) FROM STDIN",
+                buffer,
+            )
+        raw.commit()
+        cursor.execute("ANALYZE energy")
+        raw.commit()
+    finally:
+        raw.close()
+
+    # calculate_bill prices the interval table
+    session = sessionmaker(bind=engine)()
+    try:
+        refresh_interval_energy(session)
+    finally:
+        session.close()
+
+    print(f"Seeded {meters} meters x {n} readings ({meters * n:,} rows)")
+
+
+# Energy per meter per day straight from the counter readings, as billing
+# derived it before the interval table: first one round of subqueries per
+# day, then one window-function query per month. Kept here as baselines.
+def legacy_day_energy(year: int, month: int, day: int, db: Session):
+    start = datetime(year, month, day)
+    end = start + timedelta(days=1)
+    
+    # Get first and last readings for each meter/phase
+    # Subquery for first reading of the day
+    first_reading = (
+        db.query(
+            EnergyDB.meter_id,
+            func.min(EnergyDB.timestamp).label("first_time")
+        )
+        .filter(
+            EnergyDB.timestamp >= start,
+            EnergyDB.timestamp < end
+        )
+        .group_by(EnergyDB.meter_id)
+        .subquery()
+    )
+    
+    # Subquery for last reading of the day
+    last_reading = (
+        db.query(
+            EnergyDB.meter_id,
+            func.max(EnergyDB.timestamp).label("last_time")
+        )
+        .filter(
+            EnergyDB.timestamp >= start,
+            EnergyDB.timestamp < end
+        )
+        .group_by(EnergyDB.meter_id)
+        .subquery()
+    )
+    
+    # Get first values
+    first_values = (
+        db.query(
+            EnergyDB.meter_id,
+            EnergyDB.phase_A_grid_consumption.label("first_a"),
+            EnergyDB.phase_B_grid_consumption.label("first_b"),
+            EnergyDB.phase_C_grid_consumption.label("first_c"),
+        )
+        .join(
+            first_reading,
+            and_(
+                EnergyDB.meter_id == first_reading.c.meter_id,
+                EnergyDB.timestamp == first_reading.c.first_time
+            )
+        )
+        .all()
+    )
+    
+    # Get last values
+    last_values = (
+        db.query(
+            EnergyDB.meter_id,
+            EnergyDB.phase_A_grid_consumption.label("last_a"),
+            EnergyDB.phase_B_grid_consumption.label("last_b"),
+            EnergyDB.phase_C_grid_consumption.label("last_c"),
+        )
+        .join(
+            last_reading,
+            and_(
+                EnergyDB.meter_id == last_reading.c.meter_id,
+                EnergyDB.timestamp == last_reading.c.last_time
+            )
+        )
+        .all()
+    )
+    
+    # Create lookup dictionaries
+    first_dict = {row.meter_id: row for row in first_values}
+    last_dict = {row.meter_id: row for row in last_values}
+    
+    meter_to_energy = {}
+    
+    for meter_id in first_dict.keys():
+        if meter_id not in last_dict:
+            continue
+            
+        first = first_dict[meter_id]
+        last = last_dict[meter_id]
+        
+        # Calculate consumption as difference
+        phase_a = (last.last_a or 0) - (first.first_a or 0)
+        phase_b = (last.last_b or 0) - (first.first_b or 0)
+        phase_c = (last.last_c or 0) - (first.first_c or 0)
+        
+        total = phase_a + phase_b + phase_c
+        
+        # Handle meter rollover (if meter resets to 0)
+        if total < 0:
+            # This might indicate a meter reset or error
+            # You may want to log this or handle differently
+            continue
+            
+        meter_to_energy[meter_id] = total
+    
+    return meter_to_energy
+
+def window_month_energy(
+    year: int,
+    month: int,
+    db: Session,
+    first_day: int = 1,
+    last_day: int | None = None,
+    meter_ids=None,
+):
+    """
+    Energy per meter for every day of a month in a single query: the first
+    and last counter readings of each (meter_id, date) partition come from
+    window functions instead of one round of subqueries per day.
+    first_day / last_day / meter_ids narrow the scan for incremental billing.
+    Returns {day: {meter_id: energy}}.
+    """
+    start = datetime(year, month, first_day)
+    if last_day is None:
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    else:
+        end = datetime(year, month, last_day) + timedelta(days=1)
+
+    total = (
+        EnergyDB.phase_A_grid_consumption +
+        EnergyDB.phase_B_grid_consumption +
+        EnergyDB.phase_C_grid_consumption
+    )
+    day = cast(EnergyDB.timestamp, Date)
+    window = {
+        "partition_by": (EnergyDB.meter_id, day),
+        "order_by": EnergyDB.timestamp,
+        "rows": (None, None),
+    }
+
+    rows = (
+        db.query(
+            EnergyDB.meter_id,
+            day.label("day"),
+            func.first_value(total).over(**window).label("first_total"),
+            func.last_value(total).over(**window).label("last_total"),
+        )
+        .filter(
+            EnergyDB.timestamp >= start,
+            EnergyDB.timestamp < end,
+            *([EnergyDB.meter_id.in_(meter_ids)] if meter_ids is not None else []),
+        )
+        .distinct()
+        .all()
+    )
+
+    energy_per_day = {}
+    for row in rows:
+        total_energy = (row.last_total or 0) - (row.first_total or 0)
+
+        # Handle meter rollover (if meter resets to 0)
+        if total_energy < 0:
+            continue
+
+        energy_per_day.setdefault(row.day.day, {})[row.meter_id] = total_energy
+
+    return energy_per_day
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def legacy_month(year: int, month: int, db):
+    total_days = calendar.monthrange(year, month)[1]
+    return {
+        day: legacy_day_energy(year, month, day, db)
+        for day in range(1, total_days + 1)
+    }
+
+
+def same_energy(legacy: dict, single: dict, tolerance: float = 1e-6):
+    for day in set(legacy) | set(single):
+        a, b = legacy.get(day, {}), single.get(day, {})
+        if a.keys() != b.keys():
+            return False
+        if any(abs(a[m] - b[m]) > tolerance for m in a):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="Scratch database to seed and query")
+    parser.add_argument("--seed", action="store_true", help="Drop all tables and generate fresh data")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--meters", type=int, default=120)
+    parser.add_argument("--interval-minutes", type=int, default=15)
+    parser.add_argument("--months", type=int, nargs="*", default=list(range(1, 13)))
+    parser.add_argument("--rng-seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if args.seed:
+        seed(engine, args.year, args.meters, args.interval_minutes, args.rng_seed)
+
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        rows = db.query(func.count(EnergyDB.id)).scalar()
+        print(f"energy rows: {rows:,}")
+
+        print(f"{'month':>7} {'legacy s':>10} {'single s':>10} {'speedup':>8} {'bill s':>8}  match")
+        legacy_total = single_total = 0.0
+        for month in args.months:
+            legacy, legacy_s = timed(legacy_month, args.year, month, db)
+            single, single_s = timed(window_month_energy, args.year, month, db)
+            _, bill_s = timed(calculate_bill, args.year, month, db)
+            legacy_total += legacy_s
+            single_total += single_s
+            print(
+                f"{args.year}-{month:02d} {legacy_s:10.3f} {single_s:10.3f} "
+                f"{legacy_s / single_s:7.1f}x {bill_s:8.3f}  {same_energy(legacy, single)}"
+            )
+
+        print(
+            f"{'total':>7} {legacy_total:10.3f} {single_total:10.3f} "
+            f"{legacy_total / single_total:7.1f}x"
+        )
+    finally:
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Forest inference benchmark: per-row recursion through the nested dict trees
+(legacy) vs. the level-by-level traversal of the flattened arrays.
+
+Predicts random (month, day of week, hour, minute) points with a saved
+model both ways, rebuilding the dict trees from its arrays for the legacy
+path, and checks the results are bit-identical.
+
+    uv run python -m benchmarks.prediction_bench --points 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.ml_model import PowerPredictionService, SimpleTree
+
+
+def unflatten(flat, node):
+    """Rebuild the nested dict tree rooted at node"""
+    if flat.feature[node] < 0:
+        return flat.value[node]
+    return {
+        'feature': int(flat.feature[node]),
+        'split': flat.threshold[node],
+        'left': unflatten(flat, flat.left[node]),
+        'right': unflatten(flat, flat.right[node]),
+    }
+
+
+def legacy_predict(trees, X):
+    predictions = np.array([
+        np.array([tree.predict_one(x, tree.tree) for x in X]) for tree in trees
+    ])
+    return np.mean(predictions, axis=0)
+
+
+def random_points(n: int, rng_seed: int):
+    rng = np.random.default_rng(rng_seed)
+    return np.column_stack([
+        rng.integers(1, 13, n),
+        rng.integers(0, 7, n),
+        rng.integers(0, 24, n),
+        rng.integers(0, 60, n),
+    ])
+
+
+def timed(fn, *args, repeat: int = 1):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="data/power_model.bin")
+    parser.add_argument("--points", type=int, nargs="*", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5, help="Best-of runs for the vectorized path")
+    parser.add_argument("--rng-seed", type=int, default=0)
+    args = parser.parse_args()
+
+    service = PowerPredictionService(args.model)
+    service.load_model()
+    forest = service.model
+    packed, roots = forest.arrays()
+    trees = []
+    for root in roots:
+        tree = SimpleTree()
+        tree.tree = unflatten(packed, root)
+        trees.append(tree)
+    print(f"{len(roots)} trees, {len(packed.value):,} nodes, depth {packed.depth}")
+
+    print(f"{'points':>8} {'legacy s':>10} {'flat s':>10} {'speedup':>8}  identical")
+    for n in args.points:
+        X = random_points(n, args.rng_seed)
+        expected, legacy_s = timed(legacy_predict, trees, X)
+        actual, flat_s = timed(forest.predict, X, repeat=args.repeat)
+        print(
+            f"{n:>8,} {legacy_s:>10.3f} {flat_s:>10.4f} {legacy_s / flat_s:>7.0f}x"
+            f"  {np.array_equal(expected, actual)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
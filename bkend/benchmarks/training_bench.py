@@ -0,0 +1,76 @@
+"""
+Forest training benchmark: median-only splits (legacy) vs. the exhaustive
+histogram split search.
+
+Trains both splitters on the same bootstrap samples of a power CSV and
+reports training time and R² / RMSE on the latest 20% of the rows, held
+out in time order as fit_forest does, then times the
+exhaustive splitter across worker counts and checks every count builds the
+same forest.
+
+    uv run python -m benchmarks.training_bench --csv data/Power.csv
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.ml_model import FEATURES, SPLITTERS, SimpleForest, load_training_data
+
+
+def r2_score(y_true, y_pred):
+    return 1 - np.sum((y_true - y_pred) ** 2) / np.sum((y_true - np.mean(y_true)) ** 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="data/Power.csv")
+    parser.add_argument("--trees", type=int, default=10)
+    parser.add_argument("--max-depth", type=int, nargs="*", default=[8, 12])
+    parser.add_argument("--jobs", type=int, nargs="*", default=[1, 2, 4])
+    parser.add_argument("--rng-seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = load_training_data(args.csv)
+    X = df[FEATURES].values
+    y = df["Power"].values
+
+    # A random split would score on hours between training hours
+    split = int(0.8 * len(X))
+    X_train, y_train = X[:split], y[:split]
+    X_test, y_test = X[split:], y[split:]
+    print(f"{len(X_train):,} train / {len(X_test):,} test rows, {args.trees} trees")
+
+    print(f"{'depth':>5} {'splitter':>9} {'fit s':>8} {'R²':>7} {'RMSE kW':>8}")
+    for depth in args.max_depth:
+        for splitter in SPLITTERS[::-1]:
+            # Same bootstrap draws for both splitters
+            forest = SimpleForest(
+                n_trees=args.trees, max_depth=depth, splitter=splitter, n_jobs=1, random_state=args.rng_seed
+            )
+            start = time.perf_counter()
+            forest.fit(X_train, y_train)
+            fit_s = time.perf_counter() - start
+
+            y_pred = forest.predict(X_test)
+            rmse = np.sqrt(np.mean((y_pred - y_test) ** 2))
+            print(f"{depth:>5} {splitter:>9} {fit_s:>8.3f} {r2_score(y_test, y_pred):>7.3f} {rmse:>8.2f}")
+
+    print(f"\n{'jobs':>5} {'fit s':>8} {'speedup':>8}  same forest")
+    baseline = None
+    for jobs in args.jobs:
+        forest = SimpleForest(
+            n_trees=args.trees, max_depth=args.max_depth[-1], n_jobs=jobs, random_state=args.rng_seed
+        )
+        start = time.perf_counter()
+        forest.fit(X_train, y_train)
+        fit_s = time.perf_counter() - start
+
+        y_pred = forest.predict(X_test)
+        if baseline is None:
+            baseline = fit_s, y_pred
+        print(f"{jobs:>5} {fit_s:>8.3f} {baseline[0] / fit_s:>7.2f}x  {np.array_equal(baseline[1], y_pred)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,10 @@ import asyncio
 
 from src.routes.auth import auth_routes
 from src.scheduler import scheduler 
-from src.routes import meter, meter_edits, prediction, analysis, billing, data_collection, meter_status
+from src.routes import meter, meter_edits, prediction, analysis, billing, data_collection, meter_status, power_quality, demand, energy_balance, anomaly, cache, tariff, jobs
 from src.ml_model import power_prediction_service
+from src.api.model_versions import sync_models
+from src.database import SessionLocal
 
 
 
@@ -24,6 +26,16 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Failed to load ML model: {e}")
     
+    # Then whatever versions the model registry has promoted
+    db = SessionLocal()
+    try:
+        swapped = sync_models(db, force=True)
+        print(f"Loaded {swapped} model version(s) from the registry")
+    except Exception as e:
+        print(f"Failed to load model versions: {e}")
+    finally:
+        db.close()
+    
     
     # Start scheduler
     scheduler.start()
@@ -81,6 +93,13 @@ app.include_router(billing.router)
 app.include_router(data_collection.router)
 app.include_router(prediction.router)
 app.include_router(meter_status.router)
+app.include_router(power_quality.router)
+app.include_router(demand.router)
+app.include_router(energy_balance.router)
+app.include_router(anomaly.router)
+app.include_router(cache.router)
+app.include_router(tariff.router)
+app.include_router(jobs.router)
 
 
 
@@ -1,7 +1,7 @@
 
 from src.database import db_engine, get_db
 from src.models import Base
-from src.init_meter import init_meter
+from src.init_meter import init_meter, init_feeders, init_tariffs
 
 
 Base.metadata.create_all(bind=db_engine)
@@ -9,5 +9,7 @@ Base.metadata.create_all(bind=db_engine)
 db = next(get_db())
 try:
     init_meter(db)
+    init_feeders(db)
+    init_tariffs(db)
 finally:
     db.close()
\ No newline at end of file
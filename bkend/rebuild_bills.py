@@ -0,0 +1,59 @@
+import argparse
+import threading
+
+from src.database import SessionLocal
+from src.api.bill_rebuild import DEFAULT_WORKERS, billable_months, months_between, rebuild_bills
+from src.utils.jobs import jobs
+
+
+def parse_month(value: str):
+    year, month = (int(part) for part in value.split("-"))
+    if not 1 <= month <= 12:
+        raise argparse.ArgumentTypeError(f"Invalid month: {value}")
+    return year, month
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalculate bills for a range of months in parallel")
+    parser.add_argument("--from", dest="from_month", type=parse_month, help="YYYY-MM, defaults to the first month with data")
+    parser.add_argument("--to", dest="to_month", type=parse_month, help="YYYY-MM, defaults to the last month with data")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        months = billable_months(db)
+    finally:
+        db.close()
+
+    if args.from_month or args.to_month:
+        start = args.from_month or (months[0] if months else None)
+        end = args.to_month or (months[-1] if months else None)
+        if start is None or end is None:
+            parser.error("--from and --to are required when there is no data")
+        months = months_between(start, end)
+
+    print(f"Rebuilding {len(months)} month(s) with {args.workers} worker(s)")
+
+    # Report progress from a side thread while the pool runs here
+    stop = threading.Event()
+
+    def report():
+        while not stop.wait(5):
+            for job in jobs.running("bill_rebuild"):
+                print(f"  {job.done}/{job.total} {job.message or ''}")
+
+    reporter = threading.Thread(target=report, daemon=True)
+    reporter.start()
+    try:
+        job = jobs.run("bill_rebuild", rebuild_bills, months, args.workers, total=len(months))
+    finally:
+        stop.set()
+
+    print(f"{job.status}: rebuilt {len(job.result or [])} of {len(months)} month(s)")
+    for error in job.errors:
+        print(f"  {error}")
+
+
+if __name__ == "__main__":
+    main()
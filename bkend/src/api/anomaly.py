@@ -0,0 +1,191 @@
+import io
+import threading
+from datetime import datetime
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models import AnomalyDB, AnomalyDetectorStateDB
+
+METRICS = [
+    "voltage_A", "voltage_B", "voltage_C",
+    "current_A", "current_B", "current_C",
+    "power_A", "power_B", "power_C",
+]
+
+EWMA_ALPHA = 0.05
+EWMA_Z_THRESHOLD = 5.0
+ROBUST_Z_THRESHOLD = 6.0
+# Readings kept for the rolling median/MAD (4 hours at 5-minute collection)
+ROBUST_WINDOW = 48
+# No flags until the detector has seen this many readings
+WARMUP = ROBUST_WINDOW
+# Keeps the scores finite on perfectly flat signals
+MIN_SCALE = 1e-3
+MAD_TO_STD = 1.4826
+
+
+class MeterDetector:
+    """
+    Online detectors for one meter, one column per metric. EWMA mean and
+    variance plus a fixed-size ring buffer for a rolling median/MAD; every
+    update costs the same no matter how much history the meter has.
+    """
+
+    def __init__(self, n_metrics: int = len(METRICS), window: int = ROBUST_WINDOW):
+        self.mean = np.zeros(n_metrics)
+        self.var = np.zeros(n_metrics)
+        self.window = np.zeros((window, n_metrics))
+        self.count = 0
+        self.pos = 0
+        self.last_ts: datetime | None = None
+
+    def update(self, x: np.ndarray):
+        """Score a reading, then fold it into the state. Returns per-metric results."""
+        filled = min(self.count, len(self.window))
+        std = np.sqrt(self.var) + MIN_SCALE
+
+        ewma_z = (x - self.mean) / std
+        if filled:
+            recent = self.window[:filled]
+            median = np.median(recent, axis=0)
+            mad = np.median(np.abs(recent - median), axis=0) * MAD_TO_STD + MIN_SCALE
+            robust_z = (x - median) / mad
+        else:
+            median = x.copy()
+            robust_z = np.zeros_like(x)
+
+        if self.count >= WARMUP:
+            ewma_hit = np.abs(ewma_z) > EWMA_Z_THRESHOLD
+            robust_hit = np.abs(robust_z) > ROBUST_Z_THRESHOLD
+        else:
+            ewma_hit = robust_hit = np.zeros(len(x), dtype=bool)
+
+        # Outliers are clipped before they enter the EWMA so one spike does
+        # not inflate the variance and hide the next one
+        if self.count == 0:
+            self.mean = x.astype(np.float64).copy()
+        else:
+            limit = EWMA_Z_THRESHOLD * std
+            clipped = np.clip(x, self.mean - limit, self.mean + limit) if self.count >= WARMUP else x
+            diff = clipped - self.mean
+            incr = EWMA_ALPHA * diff
+            self.mean = self.mean + incr
+            self.var = (1 - EWMA_ALPHA) * (self.var + diff * incr)
+
+        self.window[self.pos] = x
+        self.pos = (self.pos + 1) % len(self.window)
+        self.count += 1
+
+        return ewma_z, robust_z, ewma_hit, robust_hit, median
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            mean=self.mean,
+            var=self.var,
+            window=self.window,
+            counters=np.array([self.count, self.pos], dtype=np.int64),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, last_ts: datetime | None = None):
+        arrays = np.load(io.BytesIO(data), allow_pickle=False)
+        detector = cls(n_metrics=len(arrays["mean"]), window=len(arrays["window"]))
+        detector.mean = arrays["mean"]
+        detector.var = arrays["var"]
+        detector.window = arrays["window"].copy()
+        detector.count, detector.pos = (int(v) for v in arrays["counters"])
+        detector.last_ts = last_ts
+        return detector
+
+
+# Detectors live in the collector process and are checkpointed to the DB
+# with every reading they process
+_detectors: dict[int, MeterDetector] = {}
+_lock = threading.Lock()
+
+
+def _get_detector(db: Session, meter_id: int) -> MeterDetector:
+    detector = _detectors.get(meter_id)
+    if detector is None:
+        saved = db.get(AnomalyDetectorStateDB, meter_id)
+        if saved is not None:
+            detector = MeterDetector.from_bytes(saved.state, saved.last_timestamp)
+        else:
+            detector = MeterDetector()
+        _detectors[meter_id] = detector
+    return detector
+
+
+def reset_cache(meter_id: int | None = None):
+    """Forget in-memory state so it is reloaded from the last checkpoint"""
+    with _lock:
+        if meter_id is None:
+            _detectors.clear()
+        else:
+            _detectors.pop(meter_id, None)
+
+
+def detect_on_ingest(db: Session, meter_id: int, ts: datetime, a: dict, b: dict, c: dict):
+    """
+    Run the detectors on one reading, record anomalies and checkpoint the
+    state in the caller's transaction.
+    """
+    x = np.array([
+        a["voltage"], b["voltage"], c["voltage"],
+        a["current"], b["current"], c["current"],
+        a["active_power"], b["active_power"], c["active_power"],
+    ], dtype=np.float64)
+
+    with _lock:
+        detector = _get_detector(db, meter_id)
+        if detector.last_ts is not None and ts <= detector.last_ts:
+            # Same reading delivered again
+            return []
+
+        ewma_z, robust_z, ewma_hit, robust_hit, median = detector.update(x)
+        detector.last_ts = ts
+        state = detector.to_bytes()
+        samples = detector.count
+
+    anomalies = []
+    for i in np.flatnonzero(ewma_hit | robust_hit):
+        if ewma_hit[i] and robust_hit[i]:
+            name, score = "both", robust_z[i]
+        elif robust_hit[i]:
+            name, score = "robust", robust_z[i]
+        else:
+            name, score = "ewma", ewma_z[i]
+
+        anomalies.append(AnomalyDB(
+            meter_id=meter_id,
+            timestamp=ts,
+            metric=METRICS[i],
+            value=float(x[i]),
+            expected=float(median[i]),
+            score=float(score),
+            detector=name,
+        ))
+    db.add_all(anomalies)
+
+    stmt = insert(AnomalyDetectorStateDB).values(
+        meter_id=meter_id,
+        state=state,
+        samples=samples,
+        last_timestamp=ts,
+        updated_at=datetime.utcnow(),
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[AnomalyDetectorStateDB.meter_id],
+        set_={
+            "state": stmt.excluded.state,
+            "samples": stmt.excluded.samples,
+            "last_timestamp": stmt.excluded.last_timestamp,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ))
+
+    return anomalies
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..models import IntervalEnergyDB
+from ..settings import settings
+from ..utils.jobs import Job
+from .billing import calculate_bill
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+# Session factory of a pool worker, bound to the worker's own engine
+_WorkerSession = None
+
+
+def _init_worker():
+    # Each worker opens its own connections; it bills one month at a time
+    global _WorkerSession
+    engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, pool_size=1, max_overflow=0)
+    _WorkerSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _rebuild_month(year: int, month: int):
+    db = _WorkerSession()
+    try:
+        # calculate_bill writes the whole month in one transaction
+        calculate_bill(year, month, db)
+        return f"{year}-{month:02d}"
+    finally:
+        db.close()
+
+
+def months_between(start: tuple[int, int], end: tuple[int, int]):
+    year, month = start
+    months = []
+    while (year, month) <= end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def billable_months(db: Session):
+    """Every month from the first interval reading to the last"""
+    first, last = db.query(
+        func.min(IntervalEnergyDB.timestamp),
+        func.max(IntervalEnergyDB.timestamp),
+    ).one()
+    if first is None:
+        return []
+    return months_between((first.year, first.month), (last.year, last.month))
+
+
+def rebuild_bills(job: Job, months: list[tuple[int, int]], workers: int = DEFAULT_WORKERS):
+    """
+    Recalculate the bills of the given months across a process pool. A
+    failing month is reported and the rest carry on. Returns the rebuilt
+    month keys.
+    """
+    job.total = len(months)
+    rebuilt = []
+    if not months:
+        return rebuilt
+
+    # Spawned rather than forked from the threaded server, so workers do not
+    # inherit locks held by other threads or the parent's pooled connections
+    pool = ProcessPoolExecutor(
+        max_workers=max(1, workers),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    )
+    with pool:
+        futures = {pool.submit(_rebuild_month, year, month): (year, month) for year, month in months}
+        for future in as_completed(futures):
+            year, month = futures[future]
+            month_key = f"{year}-{month:02d}"
+            try:
+                rebuilt.append(future.result())
+                job.advance(message=f"Rebuilt {month_key}")
+            except Exception as e:
+                job.fail_step(f"{month_key}: {e}")
+                job.advance(message=f"Failed {month_key}")
+
+            if job.cancel_requested:
+                # Months already running finish; queued ones are dropped
+                for pending in futures:
+                    pending.cancel()
+                break
+
+    return sorted(rebuilt)
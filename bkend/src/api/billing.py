@@ -1,143 +1,212 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import calendar
+import numpy as np
 from sqlalchemy.orm import Session
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy import func
+from sqlalchemy import func, literal, select, tuple_
 
-from ..models import EnergyDB, BillingDB, CostPerDayDB, CostPerMeterDB
+from ..models import (
+    IntervalEnergyDB,
+    BillingDB,
+    CostPerDayDB,
+    CostPerMeterDB,
+    CostPerMeterPerDayDB,
+    BillingDirtyDayDB,
+    MonthlyChargeDB,
+)
+from ..utils.watermark import bump_watermark, billing_key
+from .tariff import Intervals, TariffSchedule, load_tariff_schedule
 
 
-TARIFF = 8.0
+def mark_billing_dirty(db: Session, meter_id: int, timestamps):
+    """
+    Flag the days touched by new or changed readings so the billing job
+    re-bills them. Runs in the caller's transaction.
+    """
+    days = {(f"{ts.year}-{ts.month:02d}", ts.day) for ts in timestamps}
+    if not days:
+        return
 
+    now = datetime.utcnow()
+    stmt = insert(BillingDirtyDayDB).values([
+        {"date": month_key, "day": day, "meter_id": meter_id, "marked_at": now}
+        for month_key, day in sorted(days)
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        constraint="unique_billing_dirty_day",
+        set_={"marked_at": stmt.excluded.marked_at},
+    ))
 
-def get_power_per_meter_per_day(year: int, month: int, day: int, db: Session):
-    start = datetime(year, month, day)
-    end = start + timedelta(days=1)
-    
-    # Get first and last readings for each meter/phase
-    from sqlalchemy import and_
-    
-    # Subquery for first reading of the day
-    first_reading = (
-        db.query(
-            EnergyDB.meter_id,
-            func.min(EnergyDB.timestamp).label("first_time")
-        )
-        .filter(
-            EnergyDB.timestamp >= start,
-            EnergyDB.timestamp < end
-        )
-        .group_by(EnergyDB.meter_id)
-        .subquery()
+def mark_bills_dirty(db: Session, start: date, end: date | None = None):
+    """
+    Flag every billed meter-day of the months overlapping [start, end), or
+    from start on when end is None, e.g. after a tariff change, and bump
+    their watermarks so cached bills stop validating. Runs in the caller's
+    transaction. Returns the month keys that will be re-billed.
+    """
+    query = db.query(BillingDB.date).filter(BillingDB.date >= f"{start.year}-{start.month:02d}")
+    if end is not None:
+        last = end - timedelta(days=1)
+        query = query.filter(BillingDB.date <= f"{last.year}-{last.month:02d}")
+    month_keys = sorted({month_key for month_key, in query})
+    if not month_keys:
+        return []
+
+    billed = select(
+        CostPerMeterPerDayDB.date,
+        CostPerMeterPerDayDB.day,
+        CostPerMeterPerDayDB.meter_id,
+        literal(datetime.utcnow()),
+    ).where(CostPerMeterPerDayDB.date.in_(month_keys))
+    stmt = insert(BillingDirtyDayDB).from_select(["date", "day", "meter_id", "marked_at"], billed)
+    db.execute(stmt.on_conflict_do_update(
+        constraint="unique_billing_dirty_day",
+        set_={"marked_at": stmt.excluded.marked_at},
+    ))
+    bump_watermark(db, *(billing_key(month_key) for month_key in month_keys))
+    return month_keys
+
+def _get_dirty_marks(db: Session, month_key: str | None = None):
+    query = db.query(
+        BillingDirtyDayDB.id,
+        BillingDirtyDayDB.date,
+        BillingDirtyDayDB.day,
+        BillingDirtyDayDB.meter_id,
+        BillingDirtyDayDB.marked_at,
     )
-    
-    # Subquery for last reading of the day
-    last_reading = (
-        db.query(
-            EnergyDB.meter_id,
-            func.max(EnergyDB.timestamp).label("last_time")
+    if month_key is not None:
+        query = query.filter(BillingDirtyDayDB.date == month_key)
+    return query.all()
+
+def _clear_dirty_marks(db: Session, marks):
+    # A day re-marked while it was being billed has a newer marked_at and
+    # stays dirty for the next run
+    if not marks:
+        return
+    db.query(BillingDirtyDayDB).filter(
+        tuple_(BillingDirtyDayDB.id, BillingDirtyDayDB.marked_at).in_(
+            [(mark.id, mark.marked_at) for mark in marks]
         )
+    ).delete(synchronize_session=False)
+
+def get_interval_energy(db: Session, start: datetime, end: datetime, meter_ids=None):
+    """
+    Per-reading energy in [start, end) from the interval table. Returns
+    meter_ids, timestamps (datetime64[s]) and kWh arrays sorted by meter
+    then time.
+    """
+    query = (
+        db.query(IntervalEnergyDB.meter_id, IntervalEnergyDB.timestamp, IntervalEnergyDB.energy)
         .filter(
-            EnergyDB.timestamp >= start,
-            EnergyDB.timestamp < end
+            IntervalEnergyDB.timestamp >= start,
+            IntervalEnergyDB.timestamp < end,
         )
-        .group_by(EnergyDB.meter_id)
-        .subquery()
     )
-    
-    # Get first values
-    first_values = (
-        db.query(
-            EnergyDB.meter_id,
-            EnergyDB.phase_A_grid_consumption.label("first_a"),
-            EnergyDB.phase_B_grid_consumption.label("first_b"),
-            EnergyDB.phase_C_grid_consumption.label("first_c"),
-        )
-        .join(
-            first_reading,
-            and_(
-                EnergyDB.meter_id == first_reading.c.meter_id,
-                EnergyDB.timestamp == first_reading.c.first_time
-            )
-        )
-        .all()
+    if meter_ids is not None:
+        query = query.filter(IntervalEnergyDB.meter_id.in_(meter_ids))
+    rows = query.order_by(IntervalEnergyDB.meter_id, IntervalEnergyDB.timestamp).all()
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[s]"), np.empty(0)
+
+    meters, timestamps, energy = zip(*rows)
+    return (
+        np.array(meters, dtype=np.int64),
+        np.array(timestamps, dtype="datetime64[s]"),
+        np.array(energy, dtype=np.float64),
     )
-    
-    # Get last values
-    last_values = (
-        db.query(
-            EnergyDB.meter_id,
-            EnergyDB.phase_A_grid_consumption.label("last_a"),
-            EnergyDB.phase_B_grid_consumption.label("last_b"),
-            EnergyDB.phase_C_grid_consumption.label("last_c"),
-        )
-        .join(
-            last_reading,
-            and_(
-                EnergyDB.meter_id == last_reading.c.meter_id,
-                EnergyDB.timestamp == last_reading.c.last_time
-            )
+
+def _month_bounds(year: int, month: int):
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+def _evaluate_month(
+    db: Session,
+    schedule: TariffSchedule,
+    year: int,
+    month: int,
+    meter_ids=None,
+    first_day: int = 1,
+    last_day: int | None = None,
+):
+    """
+    Price a month (or a range of its days) under the tariff schedule.
+    Returns {(day, meter_id): (energy, cost)} and the monthly charges
+    {meter_id: (tariff_id, peak_kw, demand_cost, fixed_cost)}.
+    """
+    start, end = _month_bounds(year, month)
+    range_start = datetime(year, month, first_day)
+    range_end = end if last_day is None else datetime(year, month, last_day) + timedelta(days=1)
+
+    intervals = Intervals(*get_interval_energy(db, range_start, range_end, meter_ids))
+    costs, group_tariff, peaks, demand, fixed = schedule.evaluate(intervals)
+
+    meter_day = {
+        (int(day), int(meter_id)): (float(energy), float(cost))
+        for meter_id, day, energy, cost in zip(*intervals.per_day(costs))
+    }
+    charges = {
+        int(meter_id): (schedule.tariffs[k].id, float(peak), float(d), float(f))
+        for meter_id, k, peak, d, f in zip(
+            intervals.meter_ids[intervals.group_starts], group_tariff, peaks, demand, fixed
         )
-        .all()
-    )
-    
-    # Create lookup dictionaries
-    first_dict = {row.meter_id: row for row in first_values}
-    last_dict = {row.meter_id: row for row in last_values}
-    
-    meter_to_energy = {}
-    
-    for meter_id in first_dict.keys():
-        if meter_id not in last_dict:
-            continue
-            
-        first = first_dict[meter_id]
-        last = last_dict[meter_id]
-        
-        # Calculate consumption as difference
-        phase_a = (last.last_a or 0) - (first.first_a or 0)
-        phase_b = (last.last_b or 0) - (first.first_b or 0)
-        phase_c = (last.last_c or 0) - (first.first_c or 0)
-        
-        total = phase_a + phase_b + phase_c
-        
-        # Handle meter rollover (if meter resets to 0)
-        if total < 0:
-            # This might indicate a meter reset or error
-            # You may want to log this or handle differently
-            continue
-            
-        meter_to_energy[meter_id] = total
-    
-    return meter_to_energy
+    }
+    return meter_day, charges
+
+def lock_month(db: Session, month_key: str):
+    """
+    Serialize writers of a month's bill across sessions and processes. The
+    Postgres advisory lock is held until the caller's transaction ends.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(func.hashtext(billing_key(month_key)))))
 
 def calculate_bill(year: int, month: int, db: Session):
     month_key = f"{year}-{month:02d}"
     _, total_days = calendar.monthrange(year, month)
+    lock_month(db, month_key)
     
+    # Everything marked so far is covered by this full rebuild
+    marks = _get_dirty_marks(db, month_key)
+    schedule = load_tariff_schedule(db)
+    meter_day, charges = _evaluate_month(db, schedule, year, month)
+
     # Track total cost per meter for the entire month
     meter_total_costs = {}
-    
+    meter_day_costs = []
+    day_costs = {day: 0 for day in range(1, total_days + 1)}
+
+    for (day, meter_id), (energy, cost) in sorted(meter_day.items()):
+        day_costs[day] += cost
+        meter_day_costs.append({
+            "date": month_key,
+            "day": day,
+            "meter_id": meter_id,
+            "energy": energy,
+            "cost": cost,
+        })
+        meter_total_costs[meter_id] = meter_total_costs.get(meter_id, 0) + cost
+
+    # Monthly charges belong to the meter, not to any one day
+    monthly_charges = []
+    for meter_id, (tariff_id, peak_kw, demand_cost, fixed_cost) in charges.items():
+        monthly_charges.append({
+            "date": month_key,
+            "meter_id": meter_id,
+            "tariff_id": tariff_id,
+            "peak_kw": peak_kw,
+            "demand_cost": demand_cost,
+            "fixed_cost": fixed_cost,
+        })
+        meter_total_costs[meter_id] = meter_total_costs.get(meter_id, 0) + demand_cost + fixed_cost
+
     # Temporary storage for new data
     new_daily_costs = []
-    total_cost = 0
+    total_cost = sum(meter_total_costs.values())
     expensive_day = 0
     expensive_day_cost = 0
-    
-    # Main calculation
-    for day in range(1, total_days + 1):
-        meter_to_energy = get_power_per_meter_per_day(year, month, day, db)
-        total_per_day = 0
-        
-        for meter_id, energy in meter_to_energy.items():
-            cost = energy * TARIFF
-            total_per_day += cost
-            
-            # Accumulate cost for this meter across all days
-            if meter_id not in meter_total_costs:
-                meter_total_costs[meter_id] = 0
-            meter_total_costs[meter_id] += cost
-        
+
+    for day, total_per_day in day_costs.items():
         # Store daily cost in temporary list
         new_daily_costs.append(
             CostPerDayDB(
@@ -147,8 +216,6 @@ def calculate_bill(year: int, month: int, db: Session):
             )
         )
         
-        total_cost += total_per_day
-        
         # Update expensive day
         if total_per_day > expensive_day_cost:
             expensive_day = day
@@ -162,6 +229,8 @@ def calculate_bill(year: int, month: int, db: Session):
     db.query(CostPerDayDB).filter(CostPerDayDB.date == month_key).delete()
     db.query(CostPerMeterDB).filter(CostPerMeterDB.date == month_key).delete()
     db.query(BillingDB).filter(BillingDB.date == month_key).delete()
+    db.query(CostPerMeterPerDayDB).filter(CostPerMeterPerDayDB.date == month_key).delete()
+    db.query(MonthlyChargeDB).filter(MonthlyChargeDB.date == month_key).delete()
     
     # Insert all new daily costs
     for daily_cost in new_daily_costs:
@@ -184,5 +253,190 @@ def calculate_bill(year: int, month: int, db: Session):
         expensive_day_cost=expensive_day_cost,
     )
     db.add(billing)
+
+    if meter_day_costs:
+        db.execute(CostPerMeterPerDayDB.__table__.insert(), meter_day_costs)
+    if monthly_charges:
+        db.execute(MonthlyChargeDB.__table__.insert(), monthly_charges)
+    _clear_dirty_marks(db, marks)
+    bump_watermark(db, billing_key(month_key))
     
     db.commit()
+
+def _rebill_days(db: Session, billing: BillingDB, year: int, month: int, marks):
+    """
+    Recompute the marked meter-days of an existing bill and fold the cost
+    differences into the daily, per-meter and monthly totals.
+    """
+    month_key = billing.date
+    _, total_days = calendar.monthrange(year, month)
+
+    dirty = {(mark.day, mark.meter_id) for mark in marks if 1 <= mark.day <= total_days}
+    if not dirty:
+        return 0
+    meter_ids = sorted({meter_id for _, meter_id in dirty})
+
+    schedule = load_tariff_schedule(db)
+    month_wide = schedule.month_wide(*_month_bounds(year, month))
+    if month_wide:
+        # Slab prices and monthly charges depend on the meter's whole month,
+        # so every day after the first dirty one is re-billed as well
+        first_dirty = {}
+        for day, meter_id in dirty:
+            first_dirty[meter_id] = min(day, first_dirty.get(meter_id, day))
+        dirty = {
+            (day, meter_id)
+            for meter_id, first in first_dirty.items()
+            for day in range(first, total_days + 1)
+        }
+        meter_day, charges = _evaluate_month(db, schedule, year, month, meter_ids)
+    else:
+        meter_day, charges = _evaluate_month(
+            db, schedule, year, month, meter_ids,
+            min(day for day, _ in dirty), max(day for day, _ in dirty),
+        )
+
+    first_day = min(day for day, _ in dirty)
+    last_day = max(day for day, _ in dirty)
+    previous = {
+        (row.day, row.meter_id): row
+        for row in db.query(CostPerMeterPerDayDB).filter(
+            CostPerMeterPerDayDB.date == month_key,
+            CostPerMeterPerDayDB.day.between(first_day, last_day),
+            CostPerMeterPerDayDB.meter_id.in_(meter_ids),
+        )
+    }
+
+    day_deltas = {}
+    meter_deltas = {}
+    upserts = []
+    for day, meter_id in dirty:
+        priced = meter_day.get((day, meter_id))
+        old = previous.get((day, meter_id))
+        old_cost = old.cost if old is not None else 0.0
+
+        if priced is None:
+            # No readings for this meter-day any more
+            new_cost = 0.0
+            if old is not None:
+                db.delete(old)
+        else:
+            energy, new_cost = priced
+            upserts.append({
+                "date": month_key,
+                "day": day,
+                "meter_id": meter_id,
+                "energy": energy,
+                "cost": new_cost,
+            })
+
+        delta = new_cost - old_cost
+        if delta:
+            day_deltas[day] = day_deltas.get(day, 0.0) + delta
+            meter_deltas[meter_id] = meter_deltas.get(meter_id, 0.0) + delta
+
+    if upserts:
+        stmt = insert(CostPerMeterPerDayDB).values(upserts)
+        db.execute(stmt.on_conflict_do_update(
+            constraint="unique_cost_per_meter_per_day",
+            set_={"energy": stmt.excluded.energy, "cost": stmt.excluded.cost},
+        ))
+
+    for day, delta in day_deltas.items():
+        db.query(CostPerDayDB).filter(
+            CostPerDayDB.date == month_key,
+            CostPerDayDB.day == day,
+        ).update({CostPerDayDB.cost: CostPerDayDB.cost + delta}, synchronize_session=False)
+
+    charge_delta = 0.0
+    if month_wide:
+        old_charges = {
+            row.meter_id: row
+            for row in db.query(MonthlyChargeDB).filter(
+                MonthlyChargeDB.date == month_key,
+                MonthlyChargeDB.meter_id.in_(meter_ids),
+            )
+        }
+        for meter_id in meter_ids:
+            old = old_charges.get(meter_id)
+            old_cost = old.demand_cost + old.fixed_cost if old is not None else 0.0
+            tariff_id, peak_kw, demand_cost, fixed_cost = charges.get(meter_id, (None, 0.0, 0.0, 0.0))
+
+            if meter_id in charges:
+                stmt = insert(MonthlyChargeDB).values(
+                    date=month_key,
+                    meter_id=meter_id,
+                    tariff_id=tariff_id,
+                    peak_kw=peak_kw,
+                    demand_cost=demand_cost,
+                    fixed_cost=fixed_cost,
+                )
+                db.execute(stmt.on_conflict_do_update(
+                    constraint="unique_monthly_charge",
+                    set_={
+                        column: stmt.excluded[column]
+                        for column in ("tariff_id", "peak_kw", "demand_cost", "fixed_cost")
+                    },
+                ))
+            elif old is not None:
+                db.delete(old)
+
+            delta = demand_cost + fixed_cost - old_cost
+            if delta:
+                charge_delta += delta
+                meter_deltas[meter_id] = meter_deltas.get(meter_id, 0.0) + delta
+
+    if meter_deltas:
+        stmt = insert(CostPerMeterDB).values([
+            {"date": month_key, "meter_id": meter_id, "cost": delta}
+            for meter_id, delta in meter_deltas.items()
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            constraint="unique_constraint",
+            set_={"cost": CostPerMeterDB.cost + stmt.excluded.cost},
+        ))
+
+    # Expensive day and average come from the (at most 31) daily rows
+    db.flush()
+    daily = db.query(CostPerDayDB.day, CostPerDayDB.cost).filter(
+        CostPerDayDB.date == month_key
+    ).order_by(CostPerDayDB.day).all()
+
+    expensive_day = 0
+    expensive_day_cost = 0
+    for day, cost in daily:
+        if cost > expensive_day_cost:
+            expensive_day = day
+            expensive_day_cost = cost
+
+    billing.total_cost += sum(day_deltas.values()) + charge_delta
+    billing.avg_cost_per_day = billing.total_cost / len(daily) if daily else 0
+    billing.expensive_day = expensive_day
+    billing.expensive_day_cost = expensive_day_cost
+
+    return len(dirty)
+
+def update_dirty_bills(db: Session):
+    """
+    Re-bill every meter-day marked dirty since the last run. Months without
+    a bill yet get a full calculate_bill. Returns the number of months updated.
+    """
+    months = {}
+    for mark in _get_dirty_marks(db):
+        months.setdefault(mark.date, []).append(mark)
+
+    for month_key, marks in sorted(months.items()):
+        year, month = (int(part) for part in month_key.split("-"))
+        lock_month(db, month_key)
+        billing = db.query(BillingDB).filter(BillingDB.date == month_key).first()
+
+        if billing is None:
+            calculate_bill(year, month, db)
+            continue
+
+        _rebill_days(db, billing, year, month, marks)
+        _clear_dirty_marks(db, marks)
+        bump_watermark(db, billing_key(month_key))
+        db.commit()
+
+    return len(months)
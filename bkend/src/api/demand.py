@@ -0,0 +1,151 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models import DemandIntervalDB, LoadDurationDB, MeterDB, PeakDemandDB, PowerDB
+from .series import fetch_phase_arrays, POWER_COLUMNS
+
+DEMAND_INTERVAL_SECONDS = 15 * 60
+# Points stored per load duration curve: 0%, 1%, ..., 100% of the time
+LDC_PERCENTS = np.arange(0, 101)
+UPSERT_CHUNK = 5000
+
+
+def demand_intervals(ts, a, b, c):
+    """
+    Average three-phase active power (kW) over fixed 15-minute intervals.
+    Returns (interval_start datetime64[s], demand_kw, samples).
+    """
+    if len(ts) == 0:
+        return np.empty(0, dtype="datetime64[s]"), np.empty(0), np.empty(0, dtype=np.int64)
+
+    total_kw = (a + b + c) / 1000
+    buckets = ts.astype(np.int64) // DEMAND_INTERVAL_SECONDS
+
+    starts, inverse = np.unique(buckets, return_inverse=True)
+    samples = np.bincount(inverse)
+    demand = np.bincount(inverse, weights=total_kw) / samples
+
+    return (starts * DEMAND_INTERVAL_SECONDS).astype("datetime64[s]"), demand, samples
+
+
+def load_duration_curve(demand):
+    """Demand met or exceeded for each percent of the time (descending curve)"""
+    return np.percentile(demand, 100 - LDC_PERCENTS)
+
+
+def _month_bounds(month_key: str):
+    year, month = map(int, month_key.split("-"))
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def refresh_month(db: Session, meter_id: int, month_key: str):
+    """Recompute the peak record and load duration curve of one meter-month"""
+    start, end = _month_bounds(month_key)
+    rows = (
+        db.query(DemandIntervalDB.interval_start, DemandIntervalDB.demand_kw)
+        .filter(
+            DemandIntervalDB.meter_id == meter_id,
+            DemandIntervalDB.interval_start >= start,
+            DemandIntervalDB.interval_start < end,
+        )
+        .all()
+    )
+    if not rows:
+        return
+
+    times, values = zip(*rows)
+    demand = np.fromiter(values, dtype=np.float64, count=len(values))
+    peak = int(np.argmax(demand))
+
+    stmt = insert(PeakDemandDB).values(
+        date=month_key,
+        meter_id=meter_id,
+        peak_kw=float(demand[peak]),
+        peak_at=times[peak],
+        avg_kw=float(demand.mean()),
+        intervals=len(demand),
+        updated_at=datetime.utcnow(),
+    )
+    db.execute(stmt.on_conflict_do_update(
+        constraint="unique_peak_demand",
+        set_={
+            "peak_kw": stmt.excluded.peak_kw,
+            "peak_at": stmt.excluded.peak_at,
+            "avg_kw": stmt.excluded.avg_kw,
+            "intervals": stmt.excluded.intervals,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ))
+
+    curve = load_duration_curve(demand)
+    stmt = insert(LoadDurationDB).values([
+        {
+            "date": month_key,
+            "meter_id": meter_id,
+            "percent_of_time": int(percent),
+            "demand_kw": float(value),
+        }
+        for percent, value in zip(LDC_PERCENTS, curve)
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        constraint="unique_load_duration",
+        set_={"demand_kw": stmt.excluded.demand_kw},
+    ))
+
+
+def refresh_demand(db: Session, meter_ids: list[int] | None = None, rebuild: bool = False):
+    """
+    Bring demand intervals, monthly peaks and load duration curves up to
+    date. Each meter restarts from its newest stored interval (which may
+    have been partial), so a regular run only reads the latest readings.
+    """
+    query = db.query(MeterDB.meter_id)
+    if meter_ids is not None:
+        query = query.filter(MeterDB.meter_id.in_(meter_ids))
+    meters = [m for m, in query.all()]
+
+    resume = {} if rebuild else dict(
+        db.query(DemandIntervalDB.meter_id, func.max(DemandIntervalDB.interval_start))
+        .group_by(DemandIntervalDB.meter_id)
+        .all()
+    )
+
+    updated = 0
+    for meter_id in meters:
+        since = resume.get(meter_id)
+        _, ts, a, b, c = fetch_phase_arrays(db, PowerDB, POWER_COLUMNS, since, None, [meter_id])
+        starts, demand, samples = demand_intervals(ts, a, b, c)
+        if len(starts) == 0:
+            continue
+
+        for chunk in range(0, len(starts), UPSERT_CHUNK):
+            part = slice(chunk, chunk + UPSERT_CHUNK)
+            stmt = insert(DemandIntervalDB).values([
+                {
+                    "meter_id": meter_id,
+                    "interval_start": start.item(),
+                    "demand_kw": float(kw),
+                    "samples": int(n),
+                }
+                for start, kw, n in zip(starts[part], demand[part], samples[part])
+            ])
+            db.execute(stmt.on_conflict_do_update(
+                constraint="unique_demand_interval",
+                set_={
+                    "demand_kw": stmt.excluded.demand_kw,
+                    "samples": stmt.excluded.samples,
+                },
+            ))
+
+        for month in np.unique(starts.astype("datetime64[M]")):
+            refresh_month(db, meter_id, str(month))
+
+        db.commit()
+        updated += len(starts)
+
+    return updated
@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models import EnergyBalanceDB, EnergyDB, FeederDB
+from .series import fetch_phase_arrays, meter_slices, ENERGY_COLUMNS
+
+GRID_SECONDS = 15 * 60
+# A grid edge is only trusted when readings on both sides are this close
+MAX_READING_GAP_SECONDS = 60 * 60
+
+
+def get_feeders(db: Session) -> dict[int, list[int]]:
+    feeders = {}
+    for parent, child in db.query(FeederDB.parent_meter_id, FeederDB.child_meter_id).all():
+        feeders.setdefault(parent, []).append(child)
+    return feeders
+
+
+def cumulative_energy(a, b, c):
+    """Monotonic three-phase consumption counter; steps across a counter reset count as zero"""
+    total = a + b + c
+    steps = np.diff(total, prepend=total[:1])
+    return np.cumsum(np.where(steps < 0, 0.0, steps))
+
+
+def energy_on_grid(seconds, cumulative, edges):
+    """
+    Energy per grid interval, from the counter linearly interpolated at the
+    interval edges. Intervals whose edges are not covered by readings are NaN.
+    """
+    if len(seconds) == 0:
+        return np.full(len(edges) - 1, np.nan)
+
+    at_edges = np.interp(edges, seconds, cumulative)
+
+    hi = np.clip(np.searchsorted(seconds, edges), 0, len(seconds) - 1)
+    lo = np.clip(hi - 1, 0, len(seconds) - 1)
+    inside = (edges >= seconds[0]) & (edges <= seconds[-1])
+    exact = seconds[hi] == edges
+    known = inside & (exact | (seconds[hi] - seconds[lo] <= MAX_READING_GAP_SECONDS))
+
+    valid = known[:-1] & known[1:]
+    return np.where(valid, np.diff(at_edges), np.nan)
+
+
+def compute_balance(db: Session, parent_id: int, child_ids: list[int], start: datetime, end: datetime):
+    """
+    Align parent and child energy on a common 15-minute grid over [start, end).
+    Returns interval starts (datetime64[s]), parent kWh, summed child kWh,
+    loss kWh and a mask of intervals where every meter had data.
+    """
+    start_s = int(np.datetime64(start, "s").astype(np.int64)) // GRID_SECONDS * GRID_SECONDS
+    end_s = int(np.datetime64(end, "s").astype(np.int64))
+    edges = np.arange(start_s, end_s + 1, GRID_SECONDS)
+    if len(edges) < 2:
+        edges = np.array([start_s, start_s + GRID_SECONDS])
+
+    margin = timedelta(seconds=MAX_READING_GAP_SECONDS)
+    meter_order = [parent_id] + list(child_ids)
+    meters, ts, a, b, c = fetch_phase_arrays(
+        db, EnergyDB, ENERGY_COLUMNS, start - margin, end + margin, meter_order
+    )
+
+    energy = np.full((len(meter_order), len(edges) - 1), np.nan)
+    row_of = {meter_id: i for i, meter_id in enumerate(meter_order)}
+    for meter_id, part in meter_slices(meters):
+        energy[row_of[meter_id]] = energy_on_grid(
+            ts[part].astype(np.int64),
+            cumulative_energy(a[part], b[part], c[part]),
+            edges,
+        )
+
+    parent = energy[0]
+    children = energy[1:]
+    valid = ~np.isnan(parent) & ~np.isnan(children).any(axis=0)
+    children_sum = np.nansum(children, axis=0)
+
+    return (
+        edges[:-1].astype("datetime64[s]"),
+        parent,
+        children_sum,
+        parent - children_sum,
+        valid,
+    )
+
+
+def _rollup_rows(parent_id, period, keys, parent, children, valid):
+    # keys: rollup key per interval; only intervals with complete data count
+    labels, inverse = np.unique(keys, return_inverse=True)
+    parent_kwh = np.bincount(inverse, weights=np.where(valid, parent, 0.0))
+    children_kwh = np.bincount(inverse, weights=np.where(valid, children, 0.0))
+    intervals = np.bincount(inverse, weights=valid)
+
+    now = datetime.utcnow()
+    return [
+        {
+            "parent_meter_id": parent_id,
+            "period": period,
+            "date": str(label),
+            "parent_kwh": float(p),
+            "children_kwh": float(ch),
+            "loss_kwh": float(p - ch),
+            "loss_percent": float((p - ch) / p * 100) if p > 0 else None,
+            "intervals": int(n),
+            "updated_at": now,
+        }
+        for label, p, ch, n in zip(labels, parent_kwh, children_kwh, intervals)
+    ]
+
+
+def _upsert(db: Session, rows: list[dict]):
+    if not rows:
+        return
+    stmt = insert(EnergyBalanceDB).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        constraint="unique_energy_balance",
+        set_={
+            column: stmt.excluded[column]
+            for column in ("parent_kwh", "children_kwh", "loss_kwh", "loss_percent", "intervals", "updated_at")
+        },
+    ))
+
+
+def refresh_energy_balance(db: Session, start: datetime | None = None, end: datetime | None = None):
+    """
+    Recompute daily rollups for whole days in [start, end) and the monthly
+    rollups of the months they belong to. Defaults to yesterday and today.
+    """
+    if start is None:
+        start = datetime.combine(datetime.now().date() - timedelta(days=1), datetime.min.time())
+    if end is None:
+        end = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    start = datetime.combine(start.date(), datetime.min.time())
+
+    days = 0
+    for parent_id, child_ids in get_feeders(db).items():
+        grid, parent, children, _, valid = compute_balance(db, parent_id, child_ids, start, end)
+        if len(grid) == 0:
+            continue
+
+        day_rows = _rollup_rows(parent_id, "day", grid.astype("datetime64[D]"), parent, children, valid)
+        _upsert(db, day_rows)
+        db.flush()
+
+        # Months are re-summed from their day rows, so a partial refresh
+        # window still yields complete monthly totals
+        months = {row["date"][:7] for row in day_rows}
+        month_rows = (
+            db.query(
+                func.substr(EnergyBalanceDB.date, 1, 7).label("month"),
+                func.sum(EnergyBalanceDB.parent_kwh),
+                func.sum(EnergyBalanceDB.children_kwh),
+                func.sum(EnergyBalanceDB.intervals),
+            )
+            .filter(
+                EnergyBalanceDB.parent_meter_id == parent_id,
+                EnergyBalanceDB.period == "day",
+                func.substr(EnergyBalanceDB.date, 1, 7).in_(months),
+            )
+            .group_by("month")
+            .all()
+        )
+        now = datetime.utcnow()
+        _upsert(db, [
+            {
+                "parent_meter_id": parent_id,
+                "period": "month",
+                "date": month,
+                "parent_kwh": p,
+                "children_kwh": ch,
+                "loss_kwh": p - ch,
+                "loss_percent": (p - ch) / p * 100 if p > 0 else None,
+                "intervals": int(n),
+                "updated_at": now,
+            }
+            for month, p, ch, n in month_rows
+        ])
+
+        db.commit()
+        days += len(day_rows)
+
+    return days
@@ -0,0 +1,150 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models import DemandIntervalDB
+from ..ml_model import fit_forest, load_forest, time_features
+from .model_versions import active_version, describe, register_version, settle_candidate
+from .series import meter_slices
+
+# Rows fetched per round trip while streaming training data
+TRAINING_CHUNK_ROWS = 50_000
+# A week of 15-minute demand intervals
+MIN_TRAINING_ROWS = 7 * 96
+
+
+def stream_demand(
+    db: Session,
+    meter_ids: list[int] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    chunk_rows: int = TRAINING_CHUNK_ROWS,
+):
+    """
+    Yield (meter_ids, features, demand_kw) chunks of the 15-minute demand
+    rollup ordered by meter then time, using a server-side cursor so only
+    one chunk of rows is in memory at a time.
+    """
+    stmt = (
+        select(DemandIntervalDB.meter_id, DemandIntervalDB.interval_start, DemandIntervalDB.demand_kw)
+        .order_by(DemandIntervalDB.meter_id, DemandIntervalDB.interval_start)
+        .execution_options(stream_results=True, yield_per=chunk_rows)
+    )
+    if start is not None:
+        stmt = stmt.where(DemandIntervalDB.interval_start >= start)
+    if end is not None:
+        stmt = stmt.where(DemandIntervalDB.interval_start < end)
+    if meter_ids is not None:
+        stmt = stmt.where(DemandIntervalDB.meter_id.in_(meter_ids))
+
+    for rows in db.execute(stmt).partitions():
+        meter_id, ts, kw = zip(*rows)
+        yield (
+            np.fromiter(meter_id, dtype=np.int64, count=len(rows)),
+            time_features(np.array(ts, dtype="datetime64[s]")),
+            np.fromiter(kw, dtype=np.float64, count=len(rows)),
+        )
+
+
+def stream_meters(db: Session, meter_ids: list[int] | None = None, **window):
+    """
+    Yield (meter_id, features, demand_kw) for each meter as soon as its last
+    row has been streamed, so only one meter's rows plus the current chunk
+    are held at a time.
+    """
+    current, parts = None, []
+    for meters, X, y in stream_demand(db, meter_ids, **window):
+        for meter_id, part in meter_slices(meters):
+            if meter_id != current:
+                if parts:
+                    yield current, np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+                current, parts = meter_id, []
+            parts.append((X[part], y[part]))
+    if parts:
+        yield current, np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+def _fit_meter(meter_id: int, X, y, random_state, baseline_path: str | None):
+    baseline = load_forest(Path(baseline_path))[0] if baseline_path else None
+    # Trees of one meter train serially; the pool spreads meters over cores
+    model, stats = fit_forest(X, y, n_jobs=1, random_state=random_state, baseline=baseline)
+    return meter_id, model, stats
+
+
+def train_meter_models(
+    db: Session,
+    meter_ids: list[int] | None = None,
+    workers: int | None = None,
+    random_state=None,
+    force: bool = False,
+    progress=None,
+):
+    """
+    Train one model per meter from its demand history, in parallel, and
+    register each as a new version. A version is put in service only if it
+    beats the meter's active model on its holdout rows, unless forced.
+    Meters with less than a week of data are skipped. progress(done, total,
+    message) is called as meters finish; if it raises, meters not yet
+    started are dropped. Returns {meter_id: version}.
+
+    Each meter is handed to a worker as soon as its rows have streamed in,
+    and at most one meter per worker is in flight, so memory stays at a
+    few meters' history however large the rollup is.
+    """
+    counts = (
+        db.query(DemandIntervalDB.meter_id)
+        .group_by(DemandIntervalDB.meter_id)
+        .having(func.count() >= MIN_TRAINING_ROWS)
+        .order_by(DemandIntervalDB.meter_id)
+    )
+    if meter_ids is not None:
+        counts = counts.filter(DemandIntervalDB.meter_id.in_(meter_ids))
+    eligible = [meter_id for meter_id, in counts.all()]
+    if not eligible:
+        return {}
+
+    seeds = dict(zip(eligible, np.random.SeedSequence(random_state).spawn(len(eligible))))
+    workers = min(workers or os.cpu_count() or 1, len(eligible))
+    print(f"Training {len(eligible)} meter model(s) on {workers} worker(s)...")
+
+    results = {}
+
+    def finish(future):
+        meter_id, model, stats = future.result()
+        row = register_version(db, meter_id, model, stats, "demand")
+        promoted = settle_candidate(db, row, force)
+        results[meter_id] = describe(row)
+        print(
+            f"  meter {meter_id}: R² {stats['r2']:.3f}, RMSE {stats['rmse']:.2f} kW,"
+            f" v{row.version} {'promoted' if promoted else 'rejected'}"
+        )
+        if progress is not None:
+            progress(len(results), len(eligible), f"Trained meter {meter_id}")
+
+    # Its own session: registering versions commits db, which would close
+    # the server-side cursor
+    with Session(db.get_bind()) as stream_db, ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        try:
+            for meter_id, X, y in stream_meters(stream_db, eligible):
+                while len(pending) >= workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future)
+
+                row = active_version(db, meter_id)
+                baseline = row.path if row is not None and Path(row.path).exists() else None
+                pending.add(pool.submit(_fit_meter, meter_id, X, y, seeds[meter_id], baseline))
+
+            for future in as_completed(pending):
+                finish(future)
+        except BaseException:
+            # Otherwise leaving the pool waits for every queued meter
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    return results
@@ -1,8 +1,15 @@
 import requests
+import numpy as np
+from bisect import bisect_right
 from ..settings import settings
 from sqlalchemy.orm import Session
 from ..models import CurrentDB, EnergyDB, MeterDB, PowerDB, VoltageDB
 from ..database import SessionLocal
+from ..utils.watermark import bump_watermark, reading_keys
+from .power_quality import update_events_on_ingest
+from .billing import mark_billing_dirty
+from .interval_energy import update_interval_energy_on_ingest
+from . import anomaly
 from datetime import datetime
 
 
@@ -102,6 +109,19 @@ def insert_meterdata(db: Session, meter_id: int, meter_data: dict):
     )
 
     db.add_all([current, voltage, power, energy])
+    update_events_on_ingest(db, meter_id, ts, {
+        "A": a["voltage"],
+        "B": b["voltage"],
+        "C": c["voltage"],
+    })
+    anomaly.detect_on_ingest(db, meter_id, ts, a, b, c)
+    closed = update_interval_energy_on_ingest(db, meter_id, ts, (
+        a["grid_consumption"],
+        b["grid_consumption"],
+        c["grid_consumption"],
+    ))
+    mark_billing_dirty(db, meter_id, [ts, *closed])
+    bump_watermark(db, *reading_keys(meter_id, [ts, *closed]))
 
 def store_all_meter_data():
     db: Session = SessionLocal()
@@ -118,6 +138,8 @@ def store_all_meter_data():
         db.commit()
     except Exception as e:
         db.rollback()
+        # Detector state advanced in memory for readings that were not saved
+        anomaly.reset_cache()
         print("store_all_meter_data error:", e)
         raise
     finally:
@@ -149,6 +171,12 @@ def add_iammeter_station(station_data: dict):
         print("IAMMETER station error:", e)
         return None
     
+# Upper bounds (percent, exclusive) of every status except the last
+VOLTAGE_STATUS_LEVELS = ["NORMAL", "ACCEPTABLE", "WARNING", "CRITICAL"]
+VOLTAGE_STATUS_BOUNDS = [1, 2, 3]
+CURRENT_STATUS_LEVELS = ["NORMAL", "WARNING", "CRITICAL"]
+CURRENT_STATUS_BOUNDS = [10, 20]
+
 def calculate_unbalance(A, B, C):
     avg = (A + B + C) / 3
     if avg == 0:
@@ -162,20 +190,29 @@ def calculate_unbalance(A, B, C):
 
     return round((max_dev / avg) * 100, 2)
 
+def calculate_unbalance_array(A, B, C):
+    """Vectorized calculate_unbalance over equally sized phase arrays"""
+    A = np.asarray(A, dtype=np.float64)
+    B = np.asarray(B, dtype=np.float64)
+    C = np.asarray(C, dtype=np.float64)
+
+    avg = (A + B + C) / 3
+    max_dev = np.maximum(
+        np.abs(A - avg),
+        np.maximum(np.abs(B - avg), np.abs(C - avg))
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unbalance = np.where(avg == 0, 0.0, max_dev / avg * 100)
+
+    return np.round(unbalance, 2)
+
 def voltage_status(unbalance):
-    if unbalance < 1:
-        return "NORMAL"
-    elif unbalance < 2:
-        return "ACCEPTABLE"
-    elif unbalance < 3: 
-        return "WARNING"
-    else:
-        return "CRITICAL"
+    return VOLTAGE_STATUS_LEVELS[bisect_right(VOLTAGE_STATUS_BOUNDS, unbalance)]
     
 def current_status(unbalance):
-    if unbalance < 10:
-        return "NORMAL"
-    elif unbalance < 20:
-        return "WARNING"
-    else:
-        return "CRITICAL"
+    return CURRENT_STATUS_LEVELS[bisect_right(CURRENT_STATUS_BOUNDS, unbalance)]
+
+def status_index_array(unbalance, bounds):
+    """Index into the matching *_STATUS_LEVELS list for every sample"""
+    return np.searchsorted(bounds, unbalance, side="right")
@@ -0,0 +1,156 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models import EnergyDB, IntervalEnergyDB, MeterDB
+from ..utils.watermark import bump_watermark, reading_keys
+from .series import fetch_phase_arrays, ENERGY_COLUMNS
+
+# A backwards step from at least this share of the register's range is a rollover
+ROLLOVER_FRACTION = 0.9
+# Most a single phase can plausibly draw; larger steps are counter faults
+MAX_PHASE_KW = 1000.0
+UPSERT_CHUNK = 5000
+
+
+def counter_deltas(previous, current, seconds):
+    """
+    Energy counted by one phase between consecutive readings, stitched
+    across counter faults:
+    - rollover (register wraps past 10^k back to zero): the wrapped distance
+    - reset (counter restarts from zero): what it counted since the reset
+    - implausible forward jump (e.g. a swapped meter): nothing
+    Returns (delta, fault) arrays.
+    """
+    delta = current - previous
+    plausible = MAX_PHASE_KW * seconds / 3600
+
+    backwards = delta < 0
+    modulus = 10.0 ** np.ceil(np.log10(np.maximum(previous, 1.0)))
+    wrapped = modulus - previous + current
+    rollover = backwards & (previous >= ROLLOVER_FRACTION * modulus) & (wrapped <= plausible)
+    restarted = np.where(current <= plausible, current, 0.0)
+    jumped = delta > plausible
+
+    delta = np.where(rollover, wrapped, np.where(backwards, restarted, delta))
+    delta = np.where(jumped, 0.0, delta)
+    return delta, backwards | jumped
+
+
+def interval_energy(ts, a, b, c):
+    """
+    Intervals between consecutive readings of one meter. Returns closing
+    timestamps, interval seconds, per-phase kWh (3, n - 1) and fault flags.
+    """
+    seconds = np.diff(ts).astype(np.int64).astype(np.float64)
+    deltas = np.empty((3, len(seconds)))
+    faults = np.zeros(len(seconds), dtype=bool)
+    for i, phase in enumerate((a, b, c)):
+        deltas[i], fault = counter_deltas(phase[:-1], phase[1:], seconds)
+        faults |= fault
+    return ts[1:], seconds, deltas, faults
+
+
+def _upsert(db: Session, meter_id: int, ts, seconds, deltas, faults):
+    for chunk in range(0, len(ts), UPSERT_CHUNK):
+        part = slice(chunk, chunk + UPSERT_CHUNK)
+        stmt = insert(IntervalEnergyDB).values([
+            {
+                "meter_id": meter_id,
+                "timestamp": t.item(),
+                "seconds": float(s),
+                "phase_A_energy": float(ea),
+                "phase_B_energy": float(eb),
+                "phase_C_energy": float(ec),
+                "energy": float(ea + eb + ec),
+                "counter_reset": bool(f),
+            }
+            for t, s, ea, eb, ec, f in zip(
+                ts[part], seconds[part], deltas[0][part], deltas[1][part], deltas[2][part], faults[part]
+            )
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            constraint="unique_interval_energy",
+            set_={
+                column: stmt.excluded[column]
+                for column in (
+                    "seconds", "phase_A_energy", "phase_B_energy", "phase_C_energy",
+                    "energy", "counter_reset",
+                )
+            },
+        ))
+
+
+def update_interval_energy_on_ingest(db: Session, meter_id: int, ts: datetime, counters):
+    """
+    Store the interval closed by a new reading, plus the following interval
+    when the reading arrived late. Returns the closing timestamps written.
+    Runs in the caller's transaction.
+    """
+    previous = (
+        db.query(EnergyDB.timestamp, *ENERGY_COLUMNS)
+        .filter(EnergyDB.meter_id == meter_id, EnergyDB.timestamp < ts)
+        .order_by(EnergyDB.timestamp.desc())
+        .first()
+    )
+    following = (
+        db.query(EnergyDB.timestamp, *ENERGY_COLUMNS)
+        .filter(EnergyDB.meter_id == meter_id, EnergyDB.timestamp > ts)
+        .order_by(EnergyDB.timestamp.asc())
+        .first()
+    )
+
+    readings = [r for r in (previous, (ts, *counters), following) if r is not None]
+    if len(readings) < 2:
+        return []
+
+    times, a, b, c = zip(*readings)
+    closing, seconds, deltas, faults = interval_energy(
+        np.array(times, dtype="datetime64[s]"),
+        np.array(a, dtype=np.float64),
+        np.array(b, dtype=np.float64),
+        np.array(c, dtype=np.float64),
+    )
+    _upsert(db, meter_id, closing, seconds, deltas, faults)
+    return [t.item() for t in closing]
+
+
+def refresh_interval_energy(db: Session, meter_ids: list[int] | None = None, rebuild: bool = False):
+    """
+    Catch the interval table up with the energy readings. Each meter resumes
+    from its newest stored interval, whose closing reading becomes the first
+    interval's opening one; rebuild recomputes the meter's whole history.
+    """
+    query = db.query(MeterDB.meter_id)
+    if meter_ids is not None:
+        query = query.filter(MeterDB.meter_id.in_(meter_ids))
+    meters = [m for m, in query.all()]
+
+    resume = {} if rebuild else dict(
+        db.query(IntervalEnergyDB.meter_id, func.max(IntervalEnergyDB.timestamp))
+        .group_by(IntervalEnergyDB.meter_id)
+        .all()
+    )
+
+    updated = 0
+    for meter_id in meters:
+        if rebuild:
+            db.query(IntervalEnergyDB).filter(IntervalEnergyDB.meter_id == meter_id).delete()
+
+        _, ts, a, b, c = fetch_phase_arrays(
+            db, EnergyDB, ENERGY_COLUMNS, resume.get(meter_id), None, [meter_id]
+        )
+        if len(ts) < 2:
+            db.commit()
+            continue
+
+        closing, seconds, deltas, faults = interval_energy(ts, a, b, c)
+        _upsert(db, meter_id, closing, seconds, deltas, faults)
+        months = np.unique(closing.astype("datetime64[M]")).astype("datetime64[D]")
+        bump_watermark(db, *reading_keys(meter_id, months.tolist()))
+        db.commit()
+        updated += len(closing)
+
+    return updated
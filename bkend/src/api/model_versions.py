@@ -0,0 +1,200 @@
+import threading
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models import ModelVersionDB
+from ..ml_model import (
+    FEATURES,
+    fit_forest,
+    load_forest,
+    load_training_data,
+    model_registry,
+    power_prediction_service,
+    save_forest,
+)
+from ..utils.watermark import MODEL_REGISTRY, bump_watermark, get_watermarks
+
+# Version files are written once and never modified, so a process can keep
+# serving from one while another promotes its successor
+MODEL_DIR = Path("data/models")
+
+_sync_lock = threading.Lock()
+# MODEL_REGISTRY watermark this process last loaded models for
+_synced_watermark = None
+
+
+def artifact_path(meter_id: int | None, version: int) -> Path:
+    folder = "campus" if meter_id is None else f"meter_{meter_id}"
+    return MODEL_DIR / folder / f"v{version}.bin"
+
+
+def lock_registry(db: Session):
+    """Serialize version numbering and promotion until the transaction ends"""
+    db.execute(select(func.pg_advisory_xact_lock(func.hashtext(MODEL_REGISTRY))))
+
+
+def describe(row: ModelVersionDB) -> dict:
+    return {
+        "id": row.id,
+        "meter_id": row.meter_id,
+        "version": row.version,
+        "source": row.source,
+        "status": row.status,
+        "mae": row.mae,
+        "rmse": row.rmse,
+        "r2": row.r2,
+        "baseline_rmse": row.baseline_rmse,
+        "train_samples": row.train_samples,
+        "test_samples": row.test_samples,
+        "trained_at": row.trained_at.isoformat(),
+        "promoted_at": row.promoted_at.isoformat() if row.promoted_at else None,
+    }
+
+
+def _meter_filter(query, meter_id: int | None):
+    if meter_id is None:
+        return query.filter(ModelVersionDB.meter_id.is_(None))
+    return query.filter(ModelVersionDB.meter_id == meter_id)
+
+
+def active_version(db: Session, meter_id: int | None):
+    query = db.query(ModelVersionDB).filter(ModelVersionDB.status == "active")
+    return _meter_filter(query, meter_id).one_or_none()
+
+
+def list_versions(db: Session, meter_id: int | None = None):
+    """A model's versions, newest first"""
+    query = _meter_filter(db.query(ModelVersionDB), meter_id)
+    return query.order_by(ModelVersionDB.version.desc()).all()
+
+
+def register_version(db: Session, meter_id: int | None, model, stats: dict, source: str):
+    """Save a trained model as the next version of its meter, as a candidate"""
+    lock_registry(db)
+    latest = _meter_filter(db.query(func.max(ModelVersionDB.version)), meter_id).scalar()
+    version = (latest or 0) + 1
+
+    path = artifact_path(meter_id, version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    save_forest(path, model, stats)
+
+    row = ModelVersionDB(
+        meter_id=meter_id,
+        version=version,
+        path=str(path),
+        source=source,
+        status="candidate",
+        mae=stats["mae"],
+        rmse=stats["rmse"],
+        r2=stats["r2"],
+        baseline_rmse=stats.get("baseline_rmse"),
+        train_samples=stats["train_samples"],
+        test_samples=stats["test_samples"],
+        trained_at=datetime.fromisoformat(stats["trained_at"]),
+    )
+    db.add(row)
+    db.commit()
+    return row
+
+
+def should_promote(stats: dict, force: bool = False) -> bool:
+    """A candidate replaces the active model unless it did worse on the same holdout rows"""
+    baseline = stats.get("baseline_rmse")
+    return force or baseline is None or stats["rmse"] <= baseline
+
+
+def promote(db: Session, row: ModelVersionDB):
+    """
+    Make a version the one in service for its meter, retiring the previous
+    one. Every process picks it up on its next sync_models.
+    """
+    if not Path(row.path).exists():
+        raise ValueError(f"Model file {row.path} is missing")
+
+    lock_registry(db)
+    current = active_version(db, row.meter_id)
+    if current is not None and current.id != row.id:
+        current.status = "retired"
+        # Flushed first so the two rows are never both active
+        db.flush()
+    row.status = "active"
+    row.promoted_at = datetime.utcnow()
+    bump_watermark(db, MODEL_REGISTRY)
+    db.commit()
+
+
+def reject(db: Session, row: ModelVersionDB):
+    row.status = "rejected"
+    db.commit()
+
+
+def settle_candidate(db: Session, row: ModelVersionDB, force: bool = False) -> bool:
+    """Promote or reject a new candidate. Returns whether it was promoted."""
+    stats = {"rmse": row.rmse, "baseline_rmse": row.baseline_rmse}
+    if should_promote(stats, force):
+        promote(db, row)
+        return True
+    reject(db, row)
+    return False
+
+
+def sync_models(db: Session, force: bool = False) -> int:
+    """
+    Load every active version this process is not serving yet. A cheap
+    watermark check when nothing was promoted since the last call, so it
+    can run often. Returns the number of models swapped in.
+    """
+    global _synced_watermark
+
+    with _sync_lock:
+        watermark = get_watermarks(db, resources=[MODEL_REGISTRY]).get(MODEL_REGISTRY)
+        if not force and watermark == _synced_watermark:
+            return 0
+
+        rows = db.query(ModelVersionDB).filter(ModelVersionDB.status == "active").all()
+        swapped = 0
+        failed = False
+        for row in rows:
+            service = model_registry.service(row.meter_id)
+            if not force and service.version_id == row.id:
+                continue
+            try:
+                # Loads and builds the grid aside, then swaps in one assignment
+                service.load_model(Path(row.path), row.id)
+                swapped += 1
+            except Exception as e:
+                failed = True
+                print(f"Failed to load model version {row.id} from {row.path}: {e}")
+
+        if not failed:
+            _synced_watermark = watermark
+        return swapped
+
+
+def load_baseline(db: Session, meter_id: int | None):
+    """The active model of a meter read from its file, or None"""
+    row = active_version(db, meter_id)
+    if row is None or not Path(row.path).exists():
+        return None
+    return load_forest(Path(row.path))[0]
+
+
+def train_campus_model(db: Session, csv_path: str, force: bool = False, progress=None):
+    """
+    Train the campus model from a power CSV and register it. It is promoted
+    only if it beats the model in service on its holdout rows, or if forced;
+    processes swap it in on their next sync_models. progress(done, total)
+    is called as trees finish. Returns the new version row.
+    """
+    df = load_training_data(csv_path)
+    baseline = load_baseline(db, None)
+    if baseline is None and power_prediction_service.model_path.exists():
+        # Before the first version the campus model is the legacy file
+        baseline = load_forest(power_prediction_service.model_path)[0]
+    model, stats = fit_forest(df[FEATURES].values, df['Power'].values, baseline=baseline, progress=progress)
+
+    row = register_version(db, None, model, stats, "csv")
+    settle_candidate(db, row, force)
+    return row
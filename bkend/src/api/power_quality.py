@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models import PowerQualityEventDB, VoltageDB
+from .series import fetch_phase_arrays, meter_slices, VOLTAGE_COLUMNS
+
+NOMINAL_VOLTAGE = 230.0
+
+# Per-unit limits (IEEE 1159 style): below OUTAGE is an interruption,
+# below SAG a sag, above SWELL a swell
+OUTAGE_PU = 0.1
+SAG_PU = 0.9
+SWELL_PU = 1.1
+
+# Consecutive excursions further apart than this are separate events
+MAX_EVENT_GAP = timedelta(minutes=15)
+
+PHASES = ("A", "B", "C")
+EVENT_TYPES = (None, "SAG", "SWELL", "OUTAGE")
+_NORMAL, _SAG, _SWELL, _OUTAGE = range(4)
+
+
+def classify_voltage(values):
+    """Event code per sample: 0 normal, 1 sag, 2 swell, 3 outage"""
+    pu = np.asarray(values, dtype=np.float64) / NOMINAL_VOLTAGE
+    return np.select(
+        [pu < OUTAGE_PU, pu < SAG_PU, pu > SWELL_PU],
+        [_OUTAGE, _SAG, _SWELL],
+        default=_NORMAL,
+    )
+
+
+def detect_events(ts, values):
+    """
+    Group consecutive samples with the same excursion into events.
+    ts must be sorted datetime64; returns (code, start_idx, end_idx) arrays.
+    """
+    codes = classify_voltage(values)
+    n = len(codes)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    gap_ok = np.zeros(n, dtype=bool)
+    gap_ok[1:] = (ts[1:] - ts[:-1]) <= np.timedelta64(MAX_EVENT_GAP)
+
+    continues = np.zeros(n, dtype=bool)
+    continues[1:] = (codes[1:] == codes[:-1]) & gap_ok[1:]
+
+    active = codes != _NORMAL
+    starts = np.flatnonzero(active & ~continues)
+
+    ends_mask = np.zeros(n, dtype=bool)
+    ends_mask[:-1] = active[:-1] & ~continues[1:]
+    ends_mask[-1] = active[-1]
+    ends = np.flatnonzero(ends_mask)
+
+    return codes[starts], starts, ends
+
+
+def _event_rows(meter_id, phase, ts, values, still_open_at_end: bool):
+    codes, starts, ends = detect_events(ts, values)
+    if len(starts) == 0:
+        return []
+
+    last = len(ts) - 1
+
+    rows = []
+    for code, s, e in zip(codes, starts, ends):
+        segment = values[s:e + 1]
+        extreme = segment.max() if code == _SWELL else segment.min()
+        rows.append({
+            "meter_id": meter_id,
+            "phase": phase,
+            "event_type": EVENT_TYPES[code],
+            "start_time": ts[s].item(),
+            "end_time": ts[e].item(),
+            "extreme_value": float(extreme),
+            "samples": int(e - s + 1),
+            "is_open": bool(still_open_at_end and e == last),
+        })
+    return rows
+
+
+def scan_voltage_history(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    meter_ids: list[int] | None = None,
+):
+    """
+    Rebuild events for a window from the raw voltage table. The window is
+    first widened back to the start of any event that overlaps it or ends
+    close enough before it to be continued, so no event is left half
+    replaced next to a rebuilt copy.
+    """
+    def events(query):
+        if meter_ids is not None:
+            query = query.filter(PowerQualityEventDB.meter_id.in_(meter_ids))
+        return query
+
+    earliest = events(db.query(func.min(PowerQualityEventDB.start_time)).filter(
+        PowerQualityEventDB.start_time < start,
+        PowerQualityEventDB.end_time >= start - MAX_EVENT_GAP,
+    )).scalar()
+    if earliest is not None:
+        start = earliest
+
+    meters, ts, a, b, c = fetch_phase_arrays(db, VoltageDB, VOLTAGE_COLUMNS, start, end, meter_ids)
+
+    events(db.query(PowerQualityEventDB).filter(
+        PowerQualityEventDB.start_time >= start,
+        PowerQualityEventDB.start_time < end,
+    )).delete(synchronize_session=False)
+
+    rows = []
+    if len(meters):
+        latest = {
+            meter_id: latest_ts
+            for meter_id, latest_ts in db.query(
+                VoltageDB.meter_id, func.max(VoltageDB.timestamp)
+            ).group_by(VoltageDB.meter_id).all()
+        }
+
+        for meter_id, part in meter_slices(meters):
+            # Only an event touching the newest reading can still be extended by ingest
+            open_at_end = latest.get(meter_id) == ts[part][-1].item()
+            for phase, values in zip(PHASES, (a, b, c)):
+                rows.extend(_event_rows(meter_id, phase, ts[part], values[part], open_at_end))
+
+    # At most one open event per meter and phase: a rebuilt open event
+    # supersedes any left open outside the window
+    for meter_id, phase in {(row["meter_id"], row["phase"]) for row in rows if row["is_open"]}:
+        db.query(PowerQualityEventDB).filter(
+            PowerQualityEventDB.meter_id == meter_id,
+            PowerQualityEventDB.phase == phase,
+            PowerQualityEventDB.is_open == True,
+        ).update({"is_open": False}, synchronize_session=False)
+
+    if rows:
+        db.bulk_insert_mappings(PowerQualityEventDB, rows)
+    db.commit()
+    return len(rows)
+
+
+def update_events_on_ingest(db: Session, meter_id: int, ts: datetime, voltages: dict):
+    """
+    Extend, close or open events for one new reading. voltages maps
+    phase letter to voltage. The caller commits.
+    """
+    open_events = {}
+    for event in db.query(PowerQualityEventDB).filter(
+        PowerQualityEventDB.meter_id == meter_id,
+        PowerQualityEventDB.is_open == True,
+    ).order_by(PowerQualityEventDB.end_time):
+        # Should another be open for the phase, only the latest stays open
+        previous = open_events.get(event.phase)
+        if previous is not None:
+            previous.is_open = False
+        open_events[event.phase] = event
+
+    codes = classify_voltage([voltages[phase] for phase in PHASES])
+
+    for phase, code, value in zip(PHASES, codes, (voltages[p] for p in PHASES)):
+        event_type = EVENT_TYPES[code]
+        event = open_events.get(phase)
+
+        if event is not None:
+            if ts <= event.end_time:
+                # Same reading delivered again
+                continue
+            if event.event_type == event_type and ts - event.end_time <= MAX_EVENT_GAP:
+                event.end_time = ts
+                event.samples += 1
+                if code == _SWELL:
+                    event.extreme_value = max(event.extreme_value, value)
+                else:
+                    event.extreme_value = min(event.extreme_value, value)
+                continue
+            event.is_open = False
+
+        if event_type is not None:
+            db.add(PowerQualityEventDB(
+                meter_id=meter_id,
+                phase=phase,
+                event_type=event_type,
+                start_time=ts,
+                end_time=ts,
+                extreme_value=float(value),
+                samples=1,
+                is_open=True,
+            ))
@@ -0,0 +1,198 @@
+from datetime import datetime, time, timedelta
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models import BillProjectionDB, IntervalEnergyDB
+from .billing import get_interval_energy, _month_bounds
+from .tariff import Intervals, load_tariff_schedule
+
+STEP_MINUTES = 15
+CALIBRATION_DAYS = 14
+# ~90% band if the daily errors are independent and roughly normal
+BAND_Z = 1.645
+
+
+def _grid(start: datetime, end: datetime):
+    """Timestamps on the 15-minute grid in [start, end)"""
+    step = STEP_MINUTES * 60
+    first = -(-int(np.datetime64(start, "s").astype(np.int64)) // step) * step
+    last = int(np.datetime64(end, "s").astype(np.int64))
+    return np.arange(first, last, step).astype("datetime64[s]")
+
+
+def _profile(service, ts):
+    """
+    Expected kWh of each 15-minute step for a meter of scale 1. The shape
+    comes from the campus load model; without one it is flat (run rate).
+    """
+    if service is None or service.model is None or not len(ts):
+        kw = np.ones(len(ts))
+    else:
+        kw = np.clip(service.predict_timestamps(ts), 0, None)
+    return kw * STEP_MINUTES / 60
+
+
+def _calibrate(db: Session, service, as_of: datetime):
+    """
+    Fit every meter to the load profile over the complete days before
+    as_of. Returns {meter_id: scale} and {meter_id: daily error in kWh}.
+    Days a meter did not report are left out of its fit.
+    """
+    end = datetime.combine(as_of.date(), time())
+    start = end - timedelta(days=CALIBRATION_DAYS)
+
+    meter_ids, ts, energy = get_interval_energy(db, start, end)
+    expected = _profile(service, _grid(start, end)).reshape(CALIBRATION_DAYS, -1).sum(axis=1)
+    day = (ts - np.datetime64(start, "s")).astype("timedelta64[D]").astype(np.int64)
+
+    scale, spread = {}, {}
+    for meter_id in np.unique(meter_ids):
+        sel = meter_ids == meter_id
+        actual = np.bincount(day[sel], weights=energy[sel], minlength=CALIBRATION_DAYS)
+        seen = np.bincount(day[sel], minlength=CALIBRATION_DAYS) > 0
+        total_expected = expected[seen].sum()
+        if total_expected <= 0:
+            continue
+
+        s = actual[seen].sum() / total_expected
+        residual = actual[seen] - s * expected[seen]
+        scale[int(meter_id)] = float(s)
+        spread[int(meter_id)] = float(np.sqrt(np.mean(residual ** 2)))
+    return scale, spread
+
+
+def project_month(db: Session, year: int, month: int, service=None, now: datetime | None = None):
+    """
+    Project each meter's bill for the month: readings up to the latest one
+    are priced as they are, the rest of the month is filled with the load
+    profile scaled to the meter's recent consumption and priced under the
+    same tariff schedule, so slabs and demand charges see the whole month.
+
+    realized_cost is the energy cost so far; projected costs include the
+    monthly demand and fixed charges. The low/high costs move the forecast
+    energy by the band, which grows with the square root of the days left.
+    Returns as_of, the method and one dict per meter plus a campus total
+    with meter_id None.
+    """
+    start, end = _month_bounds(year, month)
+    now = now or datetime.now()
+
+    if now >= end:
+        # A closed month has nothing left to forecast
+        as_of = end
+    else:
+        latest = (
+            db.query(func.max(IntervalEnergyDB.timestamp))
+            .filter(IntervalEnergyDB.timestamp >= start, IntervalEnergyDB.timestamp < now)
+            .scalar()
+        )
+        # Interval rows are stamped at the reading that closes them
+        as_of = latest or start
+    after = as_of + timedelta(seconds=1)
+
+    meter_ids, ts, energy = get_interval_energy(db, start, after)
+    grid = _grid(after, end)
+    step_kwh = _profile(service, grid)
+    days_left = len(grid) * STEP_MINUTES / (24 * 60)
+
+    scale, spread = _calibrate(db, service, as_of) if len(grid) else ({}, {})
+    schedule = load_tariff_schedule(db)
+    meters = np.union1d(np.unique(meter_ids), np.array(sorted(scale), dtype=np.int64))
+
+    forecast = {}
+    band = {}
+    for meter_id in meters.tolist():
+        forecast[meter_id] = scale.get(meter_id, 0.0) * float(step_kwh.sum())
+        band[meter_id] = BAND_Z * spread.get(meter_id, 0.0) * np.sqrt(days_left)
+
+    # Every meter's realized intervals followed by its forecast steps keeps
+    # the meter-then-time order Intervals expects
+    lows = np.searchsorted(meter_ids, meters, side="left")
+    highs = np.searchsorted(meter_ids, meters, side="right")
+    n = len(meters)
+    scenarios = []
+    for k in (0, -1, 1) if n else ():
+        parts_meter, parts_ts, parts_energy, parts_realized = [], [], [], []
+        for meter_id, lo, hi in zip(meters.tolist(), lows, highs):
+            parts_meter.append(meter_ids[lo:hi])
+            parts_ts.append(ts[lo:hi])
+            parts_energy.append(energy[lo:hi])
+            parts_realized.append(np.ones(hi - lo, dtype=bool))
+
+            total = forecast[meter_id]
+            if total > 0:
+                factor = max(0.0, total + k * band[meter_id]) / total
+                parts_meter.append(np.full(len(grid), meter_id, dtype=np.int64))
+                parts_ts.append(grid)
+                parts_energy.append(step_kwh * scale[meter_id] * factor)
+                parts_realized.append(np.zeros(len(grid), dtype=bool))
+
+        intervals = Intervals(
+            np.concatenate(parts_meter),
+            np.concatenate(parts_ts).astype("datetime64[s]"),
+            np.concatenate(parts_energy),
+        )
+        costs, _, _, demand, fixed = schedule.evaluate(intervals)
+        realized = np.concatenate(parts_realized)
+        index = np.searchsorted(meters, intervals.meter_ids)
+        group_meter = np.searchsorted(meters, intervals.meter_ids[intervals.group_starts])
+        scenarios.append({
+            "realized_cost": np.bincount(index[realized], weights=costs[realized], minlength=n),
+            "realized_energy": np.bincount(index[realized], weights=intervals.energy[realized], minlength=n),
+            "projected_energy": np.bincount(index, weights=intervals.energy, minlength=n),
+            "projected_cost": (
+                np.bincount(index, weights=costs, minlength=n)
+                + np.bincount(group_meter, weights=demand + fixed, minlength=n)
+            ),
+        })
+
+    rows = []
+    for i, meter_id in enumerate(meters.tolist()):
+        base, low, high = scenarios
+        rows.append({
+            "meter_id": meter_id,
+            "realized_energy": float(base["realized_energy"][i]),
+            "realized_cost": float(base["realized_cost"][i]),
+            "forecast_energy": float(base["projected_energy"][i] - base["realized_energy"][i]),
+            "projected_energy": float(base["projected_energy"][i]),
+            "projected_cost": float(base["projected_cost"][i]),
+            "projected_cost_low": float(low["projected_cost"][i]),
+            "projected_cost_high": float(high["projected_cost"][i]),
+        })
+
+    campus = {"meter_id": None}
+    for field in (
+        "realized_energy", "realized_cost", "forecast_energy", "projected_energy",
+        "projected_cost", "projected_cost_low", "projected_cost_high",
+    ):
+        campus[field] = sum(row[field] for row in rows)
+    rows.append(campus)
+
+    method = "model" if service is not None and service.model is not None else "run_rate"
+    return as_of, method, rows
+
+
+def lock_projection(db: Session, month_key: str):
+    """
+    Serialize writers of a month's projection, such as the scheduler and an
+    admin refresh, until the caller's transaction ends.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"projection:{month_key}"))))
+
+
+def refresh_projection(db: Session, year: int, month: int, service=None, now: datetime | None = None):
+    """Replace the stored projection of a month. Returns the number of meters projected."""
+    as_of, method, rows = project_month(db, year, month, service, now)
+    month_key = f"{year}-{month:02d}"
+
+    # Without it two refreshes could both delete and both insert
+    lock_projection(db, month_key)
+    db.query(BillProjectionDB).filter(BillProjectionDB.date == month_key).delete()
+    computed_at = datetime.utcnow()
+    db.add_all(
+        BillProjectionDB(date=month_key, as_of=as_of, method=method, computed_at=computed_at, **row)
+        for row in rows
+    )
+    db.commit()
+    return len(rows) - 1
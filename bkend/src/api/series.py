@@ -0,0 +1,60 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models import CurrentDB, EnergyDB, PowerDB, VoltageDB
+
+VOLTAGE_COLUMNS = (VoltageDB.phase_A_voltage, VoltageDB.phase_B_voltage, VoltageDB.phase_C_voltage)
+CURRENT_COLUMNS = (CurrentDB.phase_A_current, CurrentDB.phase_B_current, CurrentDB.phase_C_current)
+POWER_COLUMNS = (PowerDB.phase_A_active_power, PowerDB.phase_B_active_power, PowerDB.phase_C_active_power)
+ENERGY_COLUMNS = (EnergyDB.phase_A_grid_consumption, EnergyDB.phase_B_grid_consumption, EnergyDB.phase_C_grid_consumption)
+
+
+def fetch_phase_arrays(
+    db: Session,
+    model,
+    columns,
+    start: datetime | None,
+    end: datetime | None,
+    meter_ids: list[int] | None = None,
+):
+    """
+    Load (meter_id, timestamp, A, B, C) for a window as column arrays,
+    ordered by meter then time. Timestamps are datetime64[s]; an open
+    start or end leaves that side unbounded.
+    """
+    stmt = (
+        select(model.meter_id, model.timestamp, *columns)
+        .order_by(model.meter_id, model.timestamp)
+    )
+    if start is not None:
+        stmt = stmt.where(model.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(model.timestamp < end)
+    if meter_ids is not None:
+        stmt = stmt.where(model.meter_id.in_(meter_ids))
+
+    rows = db.execute(stmt).all()
+    if not rows:
+        empty = np.empty(0, dtype=np.float64)
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[s]"), empty, empty, empty
+
+    meter_id, ts, a, b, c = zip(*rows)
+    return (
+        np.fromiter(meter_id, dtype=np.int64, count=len(rows)),
+        np.array(ts, dtype="datetime64[s]"),
+        np.fromiter(a, dtype=np.float64, count=len(rows)),
+        np.fromiter(b, dtype=np.float64, count=len(rows)),
+        np.fromiter(c, dtype=np.float64, count=len(rows)),
+    )
+
+
+def meter_slices(meter_ids: np.ndarray):
+    """(meter_id, slice) for each run of a meter-sorted meter_id array"""
+    if len(meter_ids) == 0:
+        return []
+    boundaries = np.flatnonzero(np.diff(meter_ids)) + 1
+    starts = np.r_[0, boundaries]
+    ends = np.r_[boundaries, len(meter_ids)]
+    return [(int(meter_ids[s]), slice(s, e)) for s, e in zip(starts, ends)]
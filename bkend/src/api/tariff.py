@@ -0,0 +1,291 @@
+from datetime import date, datetime
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..models import TariffDB, TariffRateDB, TariffSlabDB
+
+# Flat rate (per kWh) used when no tariff is configured
+DEFAULT_RATE = 8.0
+DEFAULT_TARIFF_NAME = "Flat rate"
+DEMAND_INTERVAL_SECONDS = 15 * 60
+# Upper end of the slab cost curve; np.interp does not extrapolate
+SLAB_CAP_KWH = 1e12
+
+
+def _wrapping_range(start: int, stop: int, size: int):
+    if start < stop:
+        return np.arange(start, stop)
+    return np.concatenate([np.arange(start, size), np.arange(0, stop)])
+
+
+def rate_table(default_rate: float, windows=()):
+    """
+    (12, 24) price per kWh by month and hour. windows are
+    (start_month, end_month, start_hour, end_hour, rate); later windows win.
+    """
+    table = np.full((12, 24), float(default_rate))
+    for start_month, end_month, start_hour, end_hour, rate in windows:
+        months = _wrapping_range(start_month - 1, end_month % 12, 12)
+        hours = _wrapping_range(start_hour, end_hour % 24, 24)
+        table[np.ix_(months, hours)] = rate
+    return table
+
+
+def slab_curve(slabs):
+    """
+    Cumulative cost as a function of monthly kWh, sampled at the slab
+    boundaries. slabs are (upper_kwh or None, rate) in ascending order.
+    """
+    bounds = [0.0]
+    costs = [0.0]
+    for upper, rate in slabs:
+        top = SLAB_CAP_KWH if upper is None else float(upper)
+        costs.append(costs[-1] + (top - bounds[-1]) * rate)
+        bounds.append(top)
+        if upper is None:
+            break
+    else:
+        # The last slab's rate carries on past its upper bound
+        costs.append(costs[-1] + (SLAB_CAP_KWH - bounds[-1]) * slabs[-1][1])
+        bounds.append(SLAB_CAP_KWH)
+    return np.array(bounds), np.array(costs)
+
+
+class Tariff:
+    def __init__(
+        self,
+        name: str,
+        effective_from: date,
+        default_rate: float,
+        windows=(),
+        slabs=(),
+        demand_charge: float = 0.0,
+        fixed_charge: float = 0.0,
+        tariff_id: int | None = None,
+    ):
+        self.id = tariff_id
+        self.name = name
+        self.effective_from = effective_from
+        self.rates = rate_table(default_rate, windows)
+        self.slabs = list(slabs)
+        self.slab_bounds, self.slab_costs = slab_curve(self.slabs) if self.slabs else (None, None)
+        self.demand_charge = demand_charge or 0.0
+        self.fixed_charge = fixed_charge or 0.0
+
+    @property
+    def month_wide(self):
+        """Whether a day's cost depends on the rest of the meter's month"""
+        return bool(self.slabs) or self.demand_charge > 0 or self.fixed_charge > 0
+
+    def slab_cost(self, cumulative_kwh):
+        return np.interp(cumulative_kwh, self.slab_bounds, self.slab_costs)
+
+
+class Intervals:
+    """
+    Per-interval energy sorted by meter then time, with the calendar fields
+    and month-to-date totals every tariff needs, computed once and shared by
+    all tariffs evaluated over it.
+    """
+
+    def __init__(self, meter_ids, ts, energy):
+        self.meter_ids = meter_ids
+        self.ts = ts
+        self.energy = energy
+
+        months = ts.astype("datetime64[M]")
+        self.period = months.astype(np.int64)
+        self.month = self.period % 12
+        self.hour = ts.astype("datetime64[h]").astype(np.int64) % 24
+        self.day = (ts.astype("datetime64[D]") - months).astype(np.int64) + 1
+
+        # (meter, month) groups are contiguous because of the sort order
+        boundary = np.ones(len(ts), dtype=bool)
+        boundary[1:] = (meter_ids[1:] != meter_ids[:-1]) | (self.period[1:] != self.period[:-1])
+        self.group_starts = np.flatnonzero(boundary)
+        self.group = np.cumsum(boundary) - 1
+
+        cumulative = np.cumsum(energy)
+        before = cumulative - energy
+        self.month_to_date = before - before[self.group_starts][self.group]
+
+    def __len__(self):
+        return len(self.ts)
+
+    @property
+    def groups(self):
+        return len(self.group_starts)
+
+    def peak_kw(self):
+        """Highest 15-minute demand per (meter, month) group"""
+        peaks = np.zeros(self.groups)
+        if not len(self):
+            return peaks
+        buckets = self.ts.astype(np.int64) // DEMAND_INTERVAL_SECONDS
+        boundary = np.ones(len(self), dtype=bool)
+        boundary[1:] = (self.group[1:] != self.group[:-1]) | (buckets[1:] != buckets[:-1])
+        starts = np.flatnonzero(boundary)
+        demand = np.add.reduceat(self.energy, starts) * 3600 / DEMAND_INTERVAL_SECONDS
+        np.maximum.at(peaks, self.group[starts], demand)
+        return peaks
+
+    def per_day(self, costs):
+        """Sum energy and costs per (meter, day). Returns meter_ids, days, energy, cost."""
+        if not len(self):
+            empty = np.empty(0)
+            return empty.astype(np.int64), empty.astype(np.int64), empty, empty
+        boundary = np.ones(len(self), dtype=bool)
+        boundary[1:] = (self.group[1:] != self.group[:-1]) | (self.day[1:] != self.day[:-1])
+        starts = np.flatnonzero(boundary)
+        return (
+            self.meter_ids[starts],
+            self.day[starts],
+            np.add.reduceat(self.energy, starts),
+            np.add.reduceat(costs, starts),
+        )
+
+
+def energy_costs(tariffs: list[Tariff], intervals: Intervals):
+    """Energy cost of every interval under every tariff, shape (K, n)"""
+    rates = np.stack([t.rates for t in tariffs])
+    costs = rates[:, intervals.month, intervals.hour] * intervals.energy
+
+    for k, tariff in enumerate(tariffs):
+        if tariff.slabs:
+            before = intervals.month_to_date
+            costs[k] = tariff.slab_cost(before + intervals.energy) - tariff.slab_cost(before)
+    return costs
+
+
+def monthly_charges(tariffs: list[Tariff], intervals: Intervals):
+    """Peak kW per (meter, month) group, and demand and fixed charges of shape (K, groups)"""
+    peaks = intervals.peak_kw()
+    demand = np.array([t.demand_charge for t in tariffs])[:, None] * peaks
+    fixed = np.repeat(
+        np.array([t.fixed_charge for t in tariffs])[:, None], intervals.groups, axis=1
+    )
+    return peaks, demand, fixed
+
+
+class TariffSchedule:
+    """Active tariffs ordered by effective date; each interval is priced by the one in effect"""
+
+    def __init__(self, tariffs: list[Tariff]):
+        self.tariffs = sorted(tariffs, key=lambda t: t.effective_from)
+        self.starts = np.array(
+            [np.datetime64(t.effective_from, "s") for t in self.tariffs], dtype="datetime64[s]"
+        )
+
+    def index(self, ts):
+        # Intervals before the first effective date use the first tariff
+        return np.clip(np.searchsorted(self.starts, ts, side="right") - 1, 0, None)
+
+    def in_effect(self, start: datetime, end: datetime):
+        # end is exclusive
+        bounds = np.array([start, end], dtype="datetime64[s]") - np.array([0, 1], dtype="timedelta64[s]")
+        first, last = self.index(bounds)
+        return self.tariffs[first:last + 1]
+
+    def month_wide(self, start: datetime, end: datetime):
+        return any(t.month_wide for t in self.in_effect(start, end))
+
+    def evaluate(self, intervals: Intervals):
+        """
+        Price intervals under the schedule. Returns per-interval energy cost,
+        and per (meter, month) group the tariff index, peak kW, demand and
+        fixed charges. Monthly charges follow the tariff in effect at the
+        group's first interval.
+        """
+        index = self.index(intervals.ts)
+        costs = energy_costs(self.tariffs, intervals)[index, np.arange(len(intervals))]
+
+        peaks, demand, fixed = monthly_charges(self.tariffs, intervals)
+        group_index = index[intervals.group_starts]
+        groups = np.arange(intervals.groups)
+        return costs, group_index, peaks, demand[group_index, groups], fixed[group_index, groups]
+
+
+def tariff_from_db(db: Session, row: TariffDB):
+    windows = [
+        (w.start_month, w.end_month, w.start_hour, w.end_hour, w.rate)
+        for w in db.query(TariffRateDB)
+        .filter(TariffRateDB.tariff_id == row.id)
+        .order_by(TariffRateDB.id)
+    ]
+    slabs = [
+        (s.upper_kwh, s.rate)
+        for s in db.query(TariffSlabDB)
+        .filter(TariffSlabDB.tariff_id == row.id)
+        .order_by(TariffSlabDB.upper_kwh.asc().nulls_last())
+    ]
+    return Tariff(
+        name=row.name,
+        effective_from=row.effective_from,
+        default_rate=row.default_rate,
+        windows=windows,
+        slabs=slabs,
+        demand_charge=row.demand_charge,
+        fixed_charge=row.fixed_charge,
+        tariff_id=row.id,
+    )
+
+
+def load_tariff_schedule(db: Session):
+    rows = (
+        db.query(TariffDB)
+        .filter(TariffDB.is_active.is_(True))
+        .order_by(TariffDB.effective_from)
+        .all()
+    )
+    tariffs = [tariff_from_db(db, row) for row in rows]
+    if not tariffs:
+        tariffs = [Tariff(DEFAULT_TARIFF_NAME, date(2000, 1, 1), DEFAULT_RATE)]
+    return TariffSchedule(tariffs)
+
+
+def compare_tariffs(tariffs: list[Tariff], intervals: Intervals):
+    """
+    What-if pricing: every candidate applied to the whole period, evaluated
+    together over one set of intervals. Returns one summary per candidate
+    with totals and a per-month breakdown.
+    """
+    if not len(intervals):
+        return [
+            {"name": t.name, "energy_kwh": 0.0, "energy_cost": 0.0, "demand_cost": 0.0,
+             "fixed_cost": 0.0, "total_cost": 0.0, "months": []}
+            for t in tariffs
+        ]
+
+    costs = energy_costs(tariffs, intervals)
+    _, demand, fixed = monthly_charges(tariffs, intervals)
+
+    periods, period_of = np.unique(intervals.period, return_inverse=True)
+    group_period = period_of[intervals.group_starts]
+    month_energy = np.bincount(period_of, weights=intervals.energy, minlength=len(periods))
+    labels = [str(p) for p in periods.astype("datetime64[M]")]
+
+    result = []
+    for k, tariff in enumerate(tariffs):
+        month_cost = np.bincount(period_of, weights=costs[k], minlength=len(periods))
+        month_demand = np.bincount(group_period, weights=demand[k], minlength=len(periods))
+        month_fixed = np.bincount(group_period, weights=fixed[k], minlength=len(periods))
+        result.append({
+            "name": tariff.name,
+            "energy_kwh": float(intervals.energy.sum()),
+            "energy_cost": float(costs[k].sum()),
+            "demand_cost": float(demand[k].sum()),
+            "fixed_cost": float(fixed[k].sum()),
+            "total_cost": float(costs[k].sum() + demand[k].sum() + fixed[k].sum()),
+            "months": [
+                {
+                    "month": label,
+                    "energy_kwh": float(e),
+                    "energy_cost": float(c),
+                    "demand_cost": float(d),
+                    "fixed_cost": float(f),
+                    "total_cost": float(c + d + f),
+                }
+                for label, e, c, d, f in zip(labels, month_energy, month_cost, month_demand, month_fixed)
+            ],
+        })
+    return result
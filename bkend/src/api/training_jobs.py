@@ -0,0 +1,137 @@
+import multiprocessing
+import time
+import traceback
+from pathlib import Path
+from queue import Empty
+
+from ..database import SessionLocal
+from ..utils.jobs import Job, JobCancelled
+from .forecast_training import train_meter_models
+from .model_versions import describe, sync_models, train_campus_model
+
+# How often the job thread checks on the training process
+POLL_SECONDS = 0.5
+# How long a cancelled training process gets to stop at its next progress
+# report before it is terminated
+CANCEL_GRACE_SECONDS = 30
+
+
+class ProcessProgress:
+    """
+    Progress callback handed to the training process. Reports go back to
+    the job over a queue, and a cancelled job makes the next report raise.
+    """
+
+    def __init__(self, queue, cancel):
+        self.queue = queue
+        self.cancel = cancel
+
+    def __call__(self, done: int, total: int, message: str | None = None):
+        if self.cancel.is_set():
+            raise JobCancelled()
+        self.queue.put(("progress", done, total, message))
+
+
+def _process_main(target, args, queue, cancel):
+    try:
+        queue.put(("result", target(ProcessProgress(queue, cancel), *args)))
+    except JobCancelled:
+        queue.put(("cancelled",))
+    except Exception as e:
+        traceback.print_exc()
+        queue.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def run_in_process(job: Job, target, *args):
+    """
+    Run target(progress, *args) in a fresh process, mirroring its progress
+    on the job, and return its result. Training is CPU bound and holds the
+    GIL, so on a thread of the API process it would stall every request.
+    The process is spawned rather than forked from the threaded server.
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    cancel = context.Event()
+    process = context.Process(
+        target=_process_main, args=(target, args, queue, cancel), name=f"job-{job.kind}-{job.id[:8]}"
+    )
+    process.start()
+
+    deadline = None
+    try:
+        while True:
+            if job.cancel_requested and deadline is None:
+                cancel.set()
+                deadline = time.monotonic() + CANCEL_GRACE_SECONDS
+            if deadline is not None and time.monotonic() > deadline:
+                raise JobCancelled()
+
+            try:
+                kind, *payload = queue.get(timeout=POLL_SECONDS)
+            except Empty:
+                if process.is_alive():
+                    continue
+                # What it sent right before exiting may still be in flight
+                try:
+                    kind, *payload = queue.get(timeout=POLL_SECONDS)
+                except Empty:
+                    raise RuntimeError(f"Training process exited with code {process.exitcode}")
+
+            if kind == "progress":
+                done, total, message = payload
+                job.total = total
+                job.advance(done - job.done, message)
+            elif kind == "result":
+                return payload[0]
+            elif kind == "cancelled":
+                raise JobCancelled()
+            else:
+                raise RuntimeError(payload[0])
+    finally:
+        expired = deadline is not None and time.monotonic() > deadline
+        process.join(0 if expired else CANCEL_GRACE_SECONDS)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+
+def _train_campus(progress, csv_path: str, force: bool):
+    db = SessionLocal()
+    try:
+        return describe(train_campus_model(db, csv_path, force, progress))
+    finally:
+        db.close()
+
+
+def _train_meters(progress, meter_ids: list[int] | None, workers: int | None, force: bool):
+    db = SessionLocal()
+    try:
+        return train_meter_models(db, meter_ids, workers, force=force, progress=progress)
+    finally:
+        db.close()
+
+
+def _sync():
+    # Swap in here right away; other processes follow on their next sync
+    db = SessionLocal()
+    try:
+        sync_models(db)
+    finally:
+        db.close()
+
+
+def campus_training_job(job: Job, csv_path: str, force: bool = False):
+    """Train and register a campus model version from a CSV, which is deleted afterwards"""
+    try:
+        version = run_in_process(job, _train_campus, csv_path, force)
+    finally:
+        Path(csv_path).unlink(missing_ok=True)
+    _sync()
+    return version
+
+
+def meter_training_job(job: Job, meter_ids: list[int] | None = None, workers: int | None = None, force: bool = False):
+    """Train and register a model version per meter from the demand rollup"""
+    versions = run_in_process(job, _train_meters, meter_ids, workers, force)
+    _sync()
+    return versions
@@ -0,0 +1,142 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..models import CurrentDB, VoltageDB
+from .series import fetch_phase_arrays, meter_slices, VOLTAGE_COLUMNS, CURRENT_COLUMNS
+from .iammeter import (
+    calculate_unbalance_array,
+    status_index_array,
+    VOLTAGE_STATUS_LEVELS,
+    VOLTAGE_STATUS_BOUNDS,
+    CURRENT_STATUS_LEVELS,
+    CURRENT_STATUS_BOUNDS,
+)
+
+# A sample stands for the time until the next one, but never for longer than
+# this many typical intervals; longer gaps are missing data, not status time.
+MAX_GAP_INTERVALS = 3
+# Statuses that make a sample part of an episode
+EPISODE_STATUSES = {"WARNING", "CRITICAL"}
+
+def _sample_durations(seconds: np.ndarray):
+    """Seconds each sample represents and whether it continues the previous one"""
+    n = len(seconds)
+    if n == 0:
+        return np.empty(0), np.empty(0, dtype=bool)
+
+    gaps = np.diff(seconds)
+    typical = float(np.median(gaps)) if len(gaps) else 0.0
+    cap = typical * MAX_GAP_INTERVALS
+
+    durations = np.empty(n, dtype=np.float64)
+    durations[:-1] = np.minimum(gaps, cap)
+    durations[-1] = typical
+
+    contiguous = np.empty(n, dtype=bool)
+    contiguous[0] = False
+    contiguous[1:] = gaps <= cap
+    return durations, contiguous
+
+
+def _episodes(ts, unbalance, flagged, contiguous, durations, levels, status_idx, limit):
+    # A run continues while consecutive samples are flagged and not split by a gap
+    in_run = np.zeros(len(flagged), dtype=bool)
+    in_run[1:] = flagged[1:] & flagged[:-1] & contiguous[1:]
+
+    starts = np.flatnonzero(flagged & ~in_run)
+    if len(starts) == 0:
+        return []
+
+    ends_mask = np.zeros(len(flagged), dtype=bool)
+    ends_mask[:-1] = flagged[:-1] & ~in_run[1:]
+    ends_mask[-1] = flagged[-1]
+    ends = np.flatnonzero(ends_mask)
+
+    masked = np.where(flagged, unbalance, -np.inf)
+    peaks = np.maximum.reduceat(masked, starts)
+    peak_status = np.maximum.reduceat(np.where(flagged, status_idx, -1), starts)
+    lengths = ends - starts + 1
+    duration = np.add.reduceat(np.where(flagged, durations, 0.0), starts)
+
+    # Worst first: highest peak, then longest
+    order = np.lexsort((-duration, -peaks))[:limit]
+
+    return [
+        {
+            "start": ts[starts[i]].item(),
+            "end": (ts[ends[i]] + np.timedelta64(int(durations[ends[i]]), "s")).item(),
+            "samples": int(lengths[i]),
+            "duration_minutes": round(float(duration[i]) / 60, 1),
+            "peak_unbalance_percent": float(peaks[i]),
+            "peak_status": levels[int(peak_status[i])],
+        }
+        for i in order
+    ]
+
+
+def summarize_unbalance(ts, a, b, c, levels, bounds, episode_limit: int = 5):
+    """Unbalance statistics, time in each status and worst episodes for one meter"""
+    if len(ts) == 0:
+        return {"samples": 0, "status": "NO_DATA"}
+
+    unbalance = calculate_unbalance_array(a, b, c)
+    status_idx = status_index_array(unbalance, bounds)
+
+    seconds = ts.astype(np.int64)
+    durations, contiguous = _sample_durations(seconds)
+
+    time_in_status = np.bincount(status_idx, weights=durations, minlength=len(levels))
+    total = float(time_in_status.sum())
+    samples_in_status = np.bincount(status_idx, minlength=len(levels))
+
+    episode_levels = [i for i, name in enumerate(levels) if name in EPISODE_STATUSES]
+    flagged = np.isin(status_idx, episode_levels)
+
+    return {
+        "samples": int(len(ts)),
+        "from": ts[0].item(),
+        "to": ts[-1].item(),
+        "mean_unbalance_percent": round(float(unbalance.mean()), 2),
+        "p95_unbalance_percent": round(float(np.percentile(unbalance, 95)), 2),
+        "max_unbalance_percent": float(unbalance.max()),
+        "time_in_status": {
+            name: {
+                "samples": int(samples_in_status[i]),
+                "minutes": round(float(time_in_status[i]) / 60, 1),
+                "percent": round(float(time_in_status[i]) / total * 100, 2) if total else 0.0,
+            }
+            for i, name in enumerate(levels)
+        },
+        "worst_episodes": _episodes(
+            ts, unbalance, flagged, contiguous, durations, levels, status_idx, episode_limit
+        ),
+    }
+
+
+def _summaries_per_meter(meter_ids, ts, a, b, c, levels, bounds, episode_limit):
+    return {
+        meter_id: summarize_unbalance(
+            ts[rows], a[rows], b[rows], c[rows], levels, bounds, episode_limit
+        )
+        for meter_id, rows in meter_slices(meter_ids)
+    }
+
+
+def unbalance_history(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    meter_ids: list[int] | None = None,
+    episode_limit: int = 5,
+):
+    """Voltage and current unbalance over a window, keyed by meter_id"""
+    voltage = _summaries_per_meter(
+        *fetch_phase_arrays(db, VoltageDB, VOLTAGE_COLUMNS, start, end, meter_ids),
+        VOLTAGE_STATUS_LEVELS, VOLTAGE_STATUS_BOUNDS, episode_limit,
+    )
+    current = _summaries_per_meter(
+        *fetch_phase_arrays(db, CurrentDB, CURRENT_COLUMNS, start, end, meter_ids),
+        CURRENT_STATUS_LEVELS, CURRENT_STATUS_BOUNDS, episode_limit,
+    )
+    return voltage, current
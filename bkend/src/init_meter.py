@@ -1,5 +1,8 @@
 from sqlalchemy.orm import Session
-from .models import MeterDB
+from datetime import date
+from .models import FeederDB, MeterDB, TariffDB
+from .api.tariff import DEFAULT_RATE, DEFAULT_TARIFF_NAME
+from .utils.watermark import bump_watermark, METER_REGISTRY
 
 DEFAULT_METERS = [
         {"name": "Physics Department (Block 6)", "sn": "CD0FF6AB"},
@@ -11,6 +14,9 @@ DEFAULT_METERS = [
         {"name": "Main Transformer", "sn": "F51C3384"},
     ]
 
+# The main transformer feeds every building meter
+DEFAULT_FEEDER_PARENT = "Main Transformer"
+
 def init_meter(db: Session, meters: list[dict] | None = None):
     if meters is None:
         meters = DEFAULT_METERS
@@ -29,6 +35,7 @@ def init_meter(db: Session, meters: list[dict] | None = None):
             added_meters.append(new_meter)
 
     if added_meters:
+        bump_watermark(db, METER_REGISTRY)
         db.commit()
         for meter in added_meters:
             db.refresh(meter)
@@ -37,6 +44,39 @@ def init_meter(db: Session, meters: list[dict] | None = None):
 
 
 
+def init_feeders(db: Session, parent_name: str = DEFAULT_FEEDER_PARENT):
+    if db.query(FeederDB).first():
+        return []
+
+    parent = db.query(MeterDB).filter(MeterDB.name == parent_name).first()
+    if not parent:
+        return []
+
+    children = db.query(MeterDB).filter(MeterDB.meter_id != parent.meter_id).all()
+    edges = [
+        FeederDB(parent_meter_id=parent.meter_id, child_meter_id=child.meter_id)
+        for child in children
+    ]
+    db.add_all(edges)
+    db.commit()
+    return edges
+
+
+def init_tariffs(db: Session):
+    if db.query(TariffDB).first():
+        return None
+
+    # The flat rate billing has always used
+    tariff = TariffDB(
+        name=DEFAULT_TARIFF_NAME,
+        effective_from=date(2000, 1, 1),
+        default_rate=DEFAULT_RATE,
+    )
+    db.add(tariff)
+    db.commit()
+    return tariff
+
+
 def add_meter(db: Session, name: str, sn: str):
     existing = db.query(MeterDB).filter(
         (MeterDB.sn == sn) | (MeterDB.name == name)
@@ -47,6 +87,7 @@ def add_meter(db: Session, name: str, sn: str):
 
     meter = MeterDB(name=name, sn=sn)
     db.add(meter)
+    bump_watermark(db, METER_REGISTRY)
     db.commit()
     db.refresh(meter)
     return meter
@@ -58,6 +99,7 @@ def remove_meter(db: Session, sn: str, force: bool = False):
         raise ValueError("Meter with SN {sn} not found")
 
     db.delete(meter)
+    bump_watermark(db, METER_REGISTRY)
     db.commit()
     return meter
 
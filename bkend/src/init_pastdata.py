@@ -2,6 +2,8 @@ import pandas as pd
 from datetime import datetime
 from .models import EnergyDB
 from .api.iammeter import get_meter_id_by_name
+from .api.billing import mark_billing_dirty
+from .api.interval_energy import refresh_interval_energy
 from .database import SessionLocal
 from sqlalchemy.orm import Session
 
@@ -21,7 +23,8 @@ def insert_past_data(
     meter_name: str
 ):
     df = pd.read_csv(csv_path)
-    meter_id = get_meter_id_by_name(meter_name)
+    meter_id = get_meter_id_by_name(db, meter_name)
+    timestamps = []
 
     for _, row in df.iterrows():
         ts = datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M")
@@ -41,8 +44,16 @@ def insert_past_data(
         )
 
         db.add(energy)
+        timestamps.append(ts)
 
     db.commit()
+
+    # Older readings may now sit between stored intervals
+    refresh_interval_energy(db, [meter_id], rebuild=True)
+
+    # Backfilled days get (re)billed by the next billing job run
+    mark_billing_dirty(db, meter_id, timestamps)
+    db.commit()
  
 for meter in DEFAULT_METERS:
     insert_past_data(meter["path"], meter["name"])
@@ -1,20 +1,177 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, NamedTuple, Optional, Tuple
+import json
+import multiprocessing
+import os
 import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
 from pathlib import Path
 from datetime import datetime
 
+# ============================================================================
+# Flat Tree Arrays
+# ============================================================================
+SPLITTERS = ("best", "median")
+
+# Rows per block in predict_flat
+PREDICT_BLOCK = 4096
+
+
+class FlatTree(NamedTuple):
+    """A tree as parallel node arrays; leaves have feature -1 and no children"""
+    feature: np.ndarray
+    threshold: np.ndarray
+    left: np.ndarray
+    right: np.ndarray
+    value: np.ndarray
+    depth: int
+
+
+def flatten_tree(tree) -> FlatTree:
+    """Convert a nested dict tree (or a bare leaf value) into node arrays"""
+    feature, threshold, left, right, value = [], [], [], [], []
+    depth = 0
+    stack = [(tree, -1, False, 0)]
+    while stack:
+        node, parent, is_right, level = stack.pop()
+        index = len(feature)
+        if parent >= 0:
+            (right if is_right else left)[parent] = index
+        depth = max(depth, level)
+        
+        left.append(-1)
+        right.append(-1)
+        if isinstance(node, dict):
+            feature.append(node['feature'])
+            threshold.append(node['split'])
+            value.append(0.0)
+            stack.append((node['right'], index, True, level + 1))
+            stack.append((node['left'], index, False, level + 1))
+        else:
+            feature.append(-1)
+            threshold.append(0.0)
+            value.append(node)
+    
+    return FlatTree(
+        feature=np.array(feature, dtype=np.int64),
+        threshold=np.array(threshold, dtype=np.float64),
+        left=np.array(left, dtype=np.int64),
+        right=np.array(right, dtype=np.int64),
+        value=np.array(value, dtype=np.float64),
+        depth=depth,
+    )
+
+
+def predict_flat(flat: FlatTree, X, roots) -> np.ndarray:
+    """
+    Walk every sample down every tree one level at a time. roots holds the
+    root node of each tree; returns predictions of shape (len(roots), len(X)).
+    """
+    X = np.asarray(X)
+    n = len(X)
+    # Leaves loop back to themselves so every sample takes exactly `depth`
+    # steps without masking; children are interleaved as [left, right]
+    nodes = np.arange(len(flat.value))
+    leaf = flat.feature < 0
+    children = np.column_stack([
+        np.where(leaf, nodes, flat.left),
+        np.where(leaf, nodes, flat.right),
+    ]).ravel()
+    # Feature-major copy so a (feature, row) lookup is a single flat gather
+    columns = np.ascontiguousarray(X.T).ravel()
+    offsets = np.where(leaf, 0, flat.feature) * n
+
+    out = np.empty((len(roots), n))
+    # Blocks of rows keep the per-level temporaries in cache
+    for start in range(0, n, PREDICT_BLOCK):
+        stop = min(start + PREDICT_BLOCK, n)
+        rows = np.arange(start, stop)
+        node = np.repeat(roots[:, None], stop - start, axis=1)
+        for _ in range(flat.depth):
+            # Written as not <= so NaN goes right, as in predict_one
+            go_right = ~(columns[offsets[node] + rows] <= flat.threshold[node])
+            node = children[2 * node + go_right]
+        out[:, start:stop] = flat.value[node]
+    return out
+
+
 # ============================================================================
 # Simple Decision Tree
 # ============================================================================
 class SimpleTree:
-    def __init__(self, max_depth=5):
+    def __init__(self, max_depth=5, splitter="best"):
+        if splitter not in SPLITTERS:
+            raise ValueError(f"Unknown splitter {splitter!r}, expected one of {SPLITTERS}")
         self.max_depth = max_depth
+        self.splitter = splitter
         self.tree = None
     
     def fit(self, X, y, depth=0):
-        """Build a simple tree by finding best splits"""
+        """
+        Build the tree. "best" tries every threshold between distinct
+        feature values; "median" only tries each feature's median.
+        """
+        if self.splitter == "median":
+            return self.fit_median(X, y, depth)
+        
+        X = np.asarray(X)
+        y = np.asarray(y, dtype=np.float64)
+        # Bin every feature once by its distinct values; nodes only count bins
+        binned = [np.unique(X[:, feature], return_inverse=True) for feature in range(X.shape[1])]
+        return self._grow(binned, y, np.arange(len(y)), depth)
+    
+    def _grow(self, binned, y, rows, depth):
+        y_node = y[rows]
+        if depth >= self.max_depth or len(rows) < 10:
+            return np.mean(y_node)
+        
+        n = len(rows)
+        best_gain = -np.inf
+        best_feature = None
+        best_split = None
+        
+        for feature, (values, codes) in enumerate(binned):
+            node_codes = codes[rows]
+            counts = np.bincount(node_codes, minlength=len(values))
+            present = np.flatnonzero(counts)
+            if len(present) < 2:
+                continue
+            
+            # Left side of candidate i holds the first i + 1 present values
+            left_n = np.cumsum(counts[present])[:-1]
+            left_sum = np.cumsum(np.bincount(node_codes, weights=y_node, minlength=len(values))[present])[:-1]
+            right_n = n - left_n
+            right_sum = y_node.sum() - left_sum
+            
+            # Minimizing the children's squared error is maximizing this
+            gain = left_sum ** 2 / left_n + right_sum ** 2 / right_n
+            gain[(left_n < 5) | (right_n < 5)] = -np.inf
+            best = int(np.argmax(gain))
+            
+            if gain[best] > best_gain:
+                best_gain = gain[best]
+                best_feature = feature
+                best_split = (values[present[best]] + values[present[best + 1]]) / 2
+        
+        if best_feature is None:
+            return np.mean(y_node)
+        
+        values, codes = binned[best_feature]
+        go_left = values[codes[rows]] <= best_split
+        
+        return {
+            'feature': best_feature,
+            'split': best_split,
+            'left': self._grow(binned, y, rows[go_left], depth + 1),
+            'right': self._grow(binned, y, rows[~go_left], depth + 1)
+        }
+    
+    def fit_median(self, X, y, depth=0):
+        """Build a tree splitting each node at the best of the feature medians"""
         if depth >= self.max_depth or len(y) < 10:
             return np.mean(y)
         
@@ -48,8 +205,8 @@ class SimpleTree:
         return {
             'feature': best_feature,
             'split': best_split,
-            'left': self.fit(X[left_mask], y[left_mask], depth + 1),
-            'right': self.fit(X[right_mask], y[right_mask], depth + 1)
+            'left': self.fit_median(X[left_mask], y[left_mask], depth + 1),
+            'right': self.fit_median(X[right_mask], y[right_mask], depth + 1)
         }
     
     def predict_one(self, x, node):
@@ -62,166 +219,543 @@ class SimpleTree:
         else:
             return self.predict_one(x, node['right'])
     
+    def __getstate__(self):
+        # The flat arrays are a cache; rebuilt after unpickling
+        state = self.__dict__.copy()
+        state.pop('_flat', None)
+        return state
+    
+    def arrays(self):
+        """The fitted tree as flat arrays, rebuilt whenever self.tree is replaced"""
+        cached = getattr(self, '_flat', None)
+        if cached is None or cached[0] is not self.tree:
+            cached = self._flat = (self.tree, flatten_tree(self.tree))
+        return cached[1]
+    
     def predict(self, X):
         """Predict multiple samples"""
-        return np.array([self.predict_one(x, self.tree) for x in X])
+        return predict_flat(self.arrays(), X, np.zeros(1, dtype=np.int64))[0]
 
 
 # ============================================================================
 # Simple Random Forest
 # ============================================================================
 class SimpleForest:
-    def __init__(self, n_trees=10, max_depth=5):
+    def __init__(self, n_trees=10, max_depth=5, splitter="best", n_jobs=None, random_state=None):
         self.n_trees = n_trees
         self.max_depth = max_depth
+        self.splitter = splitter
+        # Worker processes for fit; None uses every core
+        self.n_jobs = n_jobs
+        # Seeds the per-tree bootstrap streams (an int or SeedSequence); None draws fresh entropy
+        self.random_state = random_state
         self.trees = []
     
-    def fit(self, X, y):
-        """Train multiple trees on random samples"""
-        print(f"Training {self.n_trees} trees...")
+    def fit(self, X, y, progress=None):
+        """
+        Train the trees on bootstrap samples across a process pool. Tree i
+        always draws from the i-th child of the forest's SeedSequence, so a
+        given random_state builds the same forest for any n_jobs.
+        progress(done, total) is called as trees finish; if it raises, trees
+        not yet started are dropped and the exception propagates.
+        """
+        X = np.ascontiguousarray(X)
+        y = np.ascontiguousarray(y, dtype=np.float64)
+        seeds = _seed_sequence(self.random_state).spawn(self.n_trees)
+        workers = min(self.n_jobs or os.cpu_count() or 1, self.n_trees)
+        print(f"Training {self.n_trees} trees on {workers} worker(s)...")
         
-        for i in range(self.n_trees):
-            indices = np.random.choice(len(X), len(X), replace=True)
-            X_sample = X[indices]
-            y_sample = y[indices]
-            
-            tree = SimpleTree(max_depth=self.max_depth)
-            tree.tree = tree.fit(X_sample, y_sample)
+        nodes = [None] * self.n_trees
+        done = 0
+        
+        def finished(i, node):
+            nonlocal done
+            nodes[i] = node
+            done += 1
+            if progress is not None:
+                progress(done, self.n_trees)
+            if done % 5 == 0:
+                print(f"  {done}/{self.n_trees} complete")
+        
+        if workers <= 1:
+            for i, seed in enumerate(seeds):
+                finished(i, _fit_bootstrap_tree(X, y, seed, self.max_depth, self.splitter))
+        else:
+            with SharedArrays(X=X, y=y) as shared:
+                # Spawned: this can run on a thread of the API server or the
+                # scheduler, and a fork would copy other threads' held locks
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=attach_training_data,
+                    initargs=(shared.specs,),
+                ) as pool:
+                    futures = {
+                        pool.submit(_fit_shared_tree, seed, self.max_depth, self.splitter): i
+                        for i, seed in enumerate(seeds)
+                    }
+                    try:
+                        for future in as_completed(futures):
+                            finished(futures[future], future.result())
+                    except BaseException:
+                        # Otherwise leaving the pool waits for every queued tree
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise
+        
+        self.trees = []
+        for node in nodes:
+            tree = SimpleTree(max_depth=self.max_depth, splitter=self.splitter)
+            tree.tree = node
             self.trees.append(tree)
-            
-            if (i + 1) % 5 == 0:
-                print(f"  {i + 1}/{self.n_trees} complete")
         
         print("✓ Training done!")
     
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_flat', None)
+        return state
+    
+    def arrays(self):
+        """All trees packed into one set of flat arrays, and the index of each root"""
+        cached = getattr(self, '_flat', None)
+        if (
+            cached is None
+            or len(cached[0]) != len(self.trees)
+            or any(a is not b.tree for a, b in zip(cached[0], self.trees))
+        ):
+            flat = [tree.arrays() for tree in self.trees]
+            sizes = np.array([len(f.value) for f in flat], dtype=np.int64)
+            roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+            
+            def children(name):
+                # Shift child links by the tree's offset; -1 stays a leaf marker
+                return np.concatenate([
+                    np.where(getattr(f, name) >= 0, getattr(f, name) + root, -1)
+                    for f, root in zip(flat, roots)
+                ])
+            
+            packed = FlatTree(
+                feature=np.concatenate([f.feature for f in flat]),
+                threshold=np.concatenate([f.threshold for f in flat]),
+                left=children('left'),
+                right=children('right'),
+                value=np.concatenate([f.value for f in flat]),
+                depth=max(f.depth for f in flat),
+            )
+            cached = self._flat = ([tree.tree for tree in self.trees], (packed, roots))
+        return cached[1]
+    
     def predict(self, X):
         """Average predictions from all trees"""
-        predictions = np.array([tree.predict(X) for tree in self.trees])
+        packed, roots = self.arrays()
+        predictions = predict_flat(packed, X, roots)
         return np.mean(predictions, axis=0)
 
 
+# ============================================================================
+# Flat Forest and Model File
+# ============================================================================
+class FlatForest:
+    """A trained forest as packed node arrays; what model files hold"""
+    
+    def __init__(self, flat: FlatTree, roots, params=None):
+        self.flat = flat
+        self.roots = roots
+        # n_trees, max_depth and splitter the forest was trained with
+        self.params = params or {}
+    
+    @classmethod
+    def from_forest(cls, forest: 'SimpleForest'):
+        flat, roots = forest.arrays()
+        params = {
+            'n_trees': forest.n_trees,
+            'max_depth': forest.max_depth,
+            'splitter': getattr(forest, 'splitter', 'median'),
+        }
+        return cls(flat, roots, params)
+    
+    def arrays(self):
+        return self.flat, self.roots
+    
+    def predict(self, X):
+        """Average predictions from all trees"""
+        return np.mean(predict_flat(self.flat, X, self.roots), axis=0)
+
+
+MODEL_MAGIC = b"KUSMFRST"
+MODEL_FORMAT_VERSION = 1
+# Arrays start on cache-line boundaries
+MODEL_ALIGN = 64
+MODEL_ARRAYS = {
+    'feature': '<i8',
+    'threshold': '<f8',
+    'left': '<i8',
+    'right': '<i8',
+    'value': '<f8',
+    'roots': '<i8',
+}
+
+
+def save_forest(path: Path, forest: FlatForest, stats: Dict):
+    """
+    Write a forest as MAGIC, a little-endian uint64 header length, a JSON
+    header and the raw arrays at the offsets the header lists. The file is
+    written next to path and renamed over it, so readers never see half a
+    model and processes that mapped the old file keep their pages.
+    """
+    arrays = {name: getattr(forest.flat, name) for name in MODEL_ARRAYS if name != 'roots'}
+    arrays['roots'] = forest.roots
+    
+    layout = {}
+    offset = 0
+    for name, dtype in MODEL_ARRAYS.items():
+        array = np.ascontiguousarray(arrays[name], dtype=dtype)
+        arrays[name] = array
+        layout[name] = {'dtype': dtype, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // MODEL_ALIGN) * MODEL_ALIGN
+    
+    header = json.dumps({
+        'format_version': MODEL_FORMAT_VERSION,
+        'params': forest.params,
+        'depth': forest.flat.depth,
+        'stats': stats,
+        'arrays': layout,
+    }).encode()
+    prefix = len(MODEL_MAGIC) + 8 + len(header)
+    data_start = -(-prefix // MODEL_ALIGN) * MODEL_ALIGN
+    
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(MODEL_MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for name in MODEL_ARRAYS:
+            f.seek(data_start + layout[name]['offset'])
+            f.write(arrays[name].tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_forest(path: Path):
+    """
+    Map a forest saved by save_forest read-only. Pages are shared by every
+    process that loads the same file. Returns the forest and its stats.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MODEL_MAGIC)) != MODEL_MAGIC:
+            raise ValueError(f"{path} is not a model file")
+        header_len = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(header_len))
+    
+    if header['format_version'] > MODEL_FORMAT_VERSION:
+        raise ValueError(
+            f"{path} has model format {header['format_version']}, "
+            f"this version reads up to {MODEL_FORMAT_VERSION}"
+        )
+    
+    data_start = -(-(len(MODEL_MAGIC) + 8 + header_len) // MODEL_ALIGN) * MODEL_ALIGN
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        shape = tuple(spec['shape'])
+        if not np.prod(shape):
+            arrays[name] = np.empty(shape, dtype=spec['dtype'])
+            continue
+        arrays[name] = np.memmap(
+            path, dtype=spec['dtype'], mode='r', offset=data_start + spec['offset'], shape=shape
+        )
+    
+    roots = arrays.pop('roots')
+    flat = FlatTree(depth=header['depth'], **arrays)
+    return FlatForest(flat, roots, header['params']), header['stats']
+
+
+# ============================================================================
+# Parallel Training
+# ============================================================================
+class SharedArrays:
+    """
+    Copies arrays into shared memory once so pool workers can map them
+    instead of receiving a pickled copy each. Unlinked on exit.
+    """
+    
+    def __init__(self, **arrays):
+        self.blocks = []
+        self.specs = {}
+        for name, array in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self.blocks.append(shm)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            self.specs[name] = (shm.name, array.shape, array.dtype.str)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+
+
+# Training arrays mapped by each pool worker
+_training_data = {}
+
+
+def attach_training_data(specs):
+    for name, (shm_name, shape, dtype) in specs.items():
+        # The parent owns the segment; workers must not unlink it on exit
+        shm = shared_memory.SharedMemory(name=shm_name, track=False)
+        _training_data[name] = (shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf))
+
+
+def _seed_sequence(random_state):
+    if isinstance(random_state, np.random.SeedSequence):
+        return random_state
+    return np.random.SeedSequence(random_state)
+
+
+def _fit_bootstrap_tree(X, y, seed, max_depth, splitter):
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, len(X), len(X))
+    tree = SimpleTree(max_depth=max_depth, splitter=splitter)
+    return tree.fit(X[indices], y[indices])
+
+
+def shared_training_array(name: str) -> np.ndarray:
+    """An array mapped by attach_training_data in this worker"""
+    return _training_data[name][1]
+
+
+def _fit_shared_tree(seed, max_depth, splitter):
+    return _fit_bootstrap_tree(
+        shared_training_array('X'), shared_training_array('y'), seed, max_depth, splitter
+    )
+
+
+# ============================================================================
+# Training Data
+# ============================================================================
+FEATURES = ['Month', 'DayOfWeek', 'Hour', 'Minute']
+
+
+def load_training_data(csv_path: str) -> pd.DataFrame:
+    """Read a Time/Main_Transformer CSV into time features and Power in kW"""
+    print("Loading data...")
+    df = pd.read_csv(csv_path)
+    
+    # Extract time features
+    df['DateTime'] = pd.to_datetime(df['Time'], format='%m/%d/%Y %H:%M')
+    # Training holds out the most recent rows
+    df = df.sort_values('DateTime', kind='stable')
+    df['Month'] = df['DateTime'].dt.month
+    df['DayOfWeek'] = df['DateTime'].dt.dayofweek
+    df['Hour'] = df['DateTime'].dt.hour
+    df['Minute'] = df['DateTime'].dt.minute
+    
+    # Clean power data
+    df['Power'] = df['Main_Transformer'].str.replace(',', '').str.replace(' W', '').astype(float) / 1000
+    df = df.dropna(subset=['Power'])
+    
+    print(f"✓ Loaded {len(df)} records")
+    return df
+
+
+def time_features(ts: np.ndarray) -> np.ndarray:
+    """FEATURES (month, day of week, hour, minute) of datetime64 timestamps"""
+    days = ts.astype('datetime64[D]')
+    minutes = (ts - days).astype('timedelta64[m]').astype(np.int64)
+    return np.column_stack([
+        ts.astype('datetime64[M]').astype(np.int64) % 12 + 1,
+        (days.astype(np.int64) + 3) % 7,  # 1970-01-01 was a Thursday
+        minutes // 60,
+        minutes % 60,
+    ])
+
+
+def fit_forest(X, y, n_trees=10, max_depth=8, n_jobs=None, random_state=None, baseline=None, progress=None):
+    """
+    Train on the first 80% of the rows and score on the last 20%; rows must
+    be in time order, so the holdout is the most recent data and nothing
+    from its period leaks into training. Returns the model and its stats.
+    A baseline model, typically the one in service, is scored on the same
+    holdout rows as baseline_rmse. progress is passed on to
+    SimpleForest.fit.
+    """
+    split = int(0.8 * len(X))
+    X_train, y_train = X[:split], y[:split]
+    X_test, y_test = X[split:], y[split:]
+    
+    forest = SimpleForest(n_trees=n_trees, max_depth=max_depth, n_jobs=n_jobs, random_state=random_state)
+    start = time.perf_counter()
+    forest.fit(X_train, y_train, progress)
+    train_seconds = time.perf_counter() - start
+    model = FlatForest.from_forest(forest)
+    
+    # Evaluate
+    y_pred = model.predict(X_test)
+    mae = np.mean(np.abs(y_pred - y_test))
+    rmse = np.sqrt(np.mean((y_pred - y_test) ** 2))
+    r2 = 1 - np.sum((y_test - y_pred) ** 2) / np.sum((y_test - np.mean(y_test)) ** 2)
+    
+    stats = {
+        'mae': float(mae),
+        'rmse': float(rmse),
+        'r2': float(r2),
+        'train_samples': len(X_train),
+        'test_samples': len(X_test),
+        'train_seconds': round(train_seconds, 3),
+        'power_range': {
+            'min': float(np.min(y)),
+            'max': float(np.max(y)),
+            'mean': float(np.mean(y))
+        },
+        'trained_at': datetime.now().isoformat()
+    }
+    if baseline is not None:
+        stats['baseline_rmse'] = float(np.sqrt(np.mean((baseline.predict(X_test) - y_test) ** 2)))
+    return model, stats
+
+
 # ============================================================================
 # Power Prediction Service
 # ============================================================================
+# Every possible input: month, day of week, hour, minute
+GRID_SHAPE = (12, 7, 24, 60)
+
+
+class ModelState(NamedTuple):
+    """Everything a prediction reads, swapped in as one object"""
+    model: FlatForest
+    stats: Dict
+    # Prediction for every (month - 1, day_of_week, hour, minute)
+    grid: np.ndarray
+    # model_versions row the model came from; None outside the registry
+    version_id: Optional[int]
+
+
 class PowerPredictionService:
     """Service for managing and using the power prediction model"""
     
-    def __init__(self, model_path: str = "data/power_model.pkl"):
+    def __init__(self, model_path: str = "data/power_model.bin"):
         self.model_path = Path(model_path)
-        self.model = None
-        self.model_stats = None
+        # Replaced whole, never mutated, so a reader holding it sees one model
+        self.state: Optional[ModelState] = None
+        # Bumped whenever a different model is put in place
+        self.version = 0
+    
+    @property
+    def model(self):
+        state = self.state
+        return state.model if state else None
+    
+    @property
+    def model_stats(self):
+        state = self.state
+        return state.stats if state else None
+    
+    @property
+    def version_id(self):
+        state = self.state
+        return state.version_id if state else None
         
     def train_model(self, csv_path: str) -> Dict:
         """Train a new model from CSV data"""
-        print("Loading data...")
-        df = pd.read_csv(csv_path)
-        
-        # Extract time features
-        df['DateTime'] = pd.to_datetime(df['Time'], format='%m/%d/%Y %H:%M')
-        df['Month'] = df['DateTime'].dt.month
-        df['DayOfWeek'] = df['DateTime'].dt.dayofweek
-        df['Hour'] = df['DateTime'].dt.hour
-        df['Minute'] = df['DateTime'].dt.minute
-        
-        # Clean power data
-        df['Power'] = df['Main_Transformer'].str.replace(',', '').str.replace(' W', '').astype(float) / 1000
-        df = df.dropna(subset=['Power'])
-        
-        print(f"✓ Loaded {len(df)} records")
-        
-        # Prepare features
-        features = ['Month', 'DayOfWeek', 'Hour', 'Minute']
-        X = df[features].values
-        y = df['Power'].values
-        
-        # Split into train/test
-        split = int(0.8 * len(X))
-        indices = np.random.permutation(len(X))
-        X_train, y_train = X[indices[:split]], y[indices[:split]]
-        X_test, y_test = X[indices[split:]], y[indices[split:]]
-        
-        # Train model
-        self.model = SimpleForest(n_trees=10, max_depth=8)
-        self.model.fit(X_train, y_train)
-        
-        # Evaluate
-        y_pred = self.model.predict(X_test)
-        mae = np.mean(np.abs(y_pred - y_test))
-        rmse = np.sqrt(np.mean((y_pred - y_test) ** 2))
-        r2 = 1 - np.sum((y_test - y_pred) ** 2) / np.sum((y_test - np.mean(y_test)) ** 2)
-        
-        self.model_stats = {
-            'mae': float(mae),
-            'rmse': float(rmse),
-            'r2': float(r2),
-            'train_samples': len(X_train),
-            'test_samples': len(X_test),
-            'power_range': {
-                'min': float(df['Power'].min()),
-                'max': float(df['Power'].max()),
-                'mean': float(df['Power'].mean())
-            },
-            'trained_at': datetime.now().isoformat()
-        }
+        df = load_training_data(csv_path)
+        model, stats = fit_forest(df[FEATURES].values, df['Power'].values)
         
-        # Save model
+        self.install(model, stats)
         self.save_model()
         
         return self.model_stats
     
+    def install(self, model: FlatForest, stats: Dict, version_id: Optional[int] = None):
+        """Put a model in service together with its prediction grid"""
+        month, day_of_week, hour, minute = np.meshgrid(*(np.arange(n) for n in GRID_SHAPE), indexing='ij')
+        # Months are 1-based in the features
+        X = np.column_stack([month.ravel() + 1, day_of_week.ravel(), hour.ravel(), minute.ravel()])
+        # Kept float64 so every endpoint returns exactly what the forest predicts
+        grid = model.predict(X).reshape(GRID_SHAPE)
+        
+        # Built fully before the single assignment that publishes it
+        self.state = ModelState(model, stats, grid, version_id)
+        self.version += 1
+    
     def save_model(self):
         """Save model to disk"""
         self.model_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.model_path, 'wb') as f:
-            pickle.dump({
-                'model': self.model,
-                'stats': self.model_stats
-            }, f)
+        save_forest(self.model_path, self.model, self.model_stats)
         print(f"✓ Model saved to {self.model_path}")
     
-    def load_model(self):
-        """Load model from disk"""
-        if not self.model_path.exists():
-            raise FileNotFoundError(f"Model not found at {self.model_path}")
+    def load_model(self, path: Optional[Path] = None, version_id: Optional[int] = None):
+        """
+        Load model from disk, by default from model_path. A pickle left by
+        older versions at model_path with a .pkl suffix is converted to the
+        binary format once.
+        """
+        if path is None:
+            path = self.model_path
+            if not path.exists():
+                legacy_path = path.with_suffix('.pkl')
+                if not legacy_path.exists():
+                    raise FileNotFoundError(f"Model not found at {path}")
+                self._migrate_pickle(legacy_path)
         
-        with open(self.model_path, 'rb') as f:
+        self.install(*load_forest(Path(path)), version_id)
+        print(f"✓ Model loaded from {path}")
+    
+    def _migrate_pickle(self, legacy_path: Path):
+        # Only ever our own trusted file; pickles are not loaded otherwise
+        with open(legacy_path, 'rb') as f:
             data = pickle.load(f)
-            self.model = data['model']
-            self.model_stats = data['stats']
-        print(f"✓ Model loaded from {self.model_path}")
+        save_forest(self.model_path, FlatForest.from_forest(data['model']), data['stats'])
+        print(f"✓ Migrated {legacy_path} to {self.model_path}")
     
-    def predict_single(self, month: int, day_of_week: int, hour: int, minute: int) -> float:
-        """Predict power for a single time point"""
-        if self.model is None:
+    def _require_grid(self):
+        state = self.state
+        if state is None:
             raise ValueError("Model not loaded. Call load_model() first.")
-        
-        X = np.array([[month, day_of_week, hour, minute]])
-        prediction = self.model.predict(X)[0]
-        return float(prediction)
+        return state.grid
+    
+    def predict_single(self, month: int, day_of_week: int, hour: int, minute: int) -> float:
+        """Predict power for a single time point, read from the minute grid"""
+        grid = self._require_grid()
+        if not (1 <= month <= 12 and 0 <= day_of_week <= 6 and 0 <= hour <= 23 and 0 <= minute <= 59):
+            raise ValueError("month, day_of_week, hour or minute out of range")
+        return float(grid[month - 1, day_of_week, hour, minute])
+    
+    def predict_timestamps(self, ts: np.ndarray) -> np.ndarray:
+        """Predict power (kW) at each of an array of datetime64 timestamps"""
+        grid = self._require_grid()
+        month, day_of_week, hour, minute = time_features(ts).T
+        return grid[month - 1, day_of_week, hour, minute]
     
     def predict_24h(self, month: int, day_of_week: int, interval_minutes: int = 5) -> List[Dict]:
         """Generate 24-hour predictions"""
-        if self.model is None:
-            raise ValueError("Model not loaded. Call load_model() first.")
-        
-        predictions = []
+        return self._predict_day(self._require_grid(), month, day_of_week, interval_minutes)
+    
+    def _predict_day(self, grid, month: int, day_of_week: int, interval_minutes: int) -> List[Dict]:
+        if not (1 <= month <= 12 and 0 <= day_of_week <= 6 and 1 <= interval_minutes <= 60):
+            raise ValueError("month, day_of_week or interval_minutes out of range")
         
-        for hour in range(24):
-            for minute in range(0, 60, interval_minutes):
-                pred = self.predict_single(month, day_of_week, hour, minute)
-                predictions.append({
-                    'hour': hour,
-                    'minute': minute,
-                    'time': f"{hour:02d}:{minute:02d}",
-                    'power_kw': round(pred, 2)
-                })
+        day = grid[month - 1, day_of_week, :, ::interval_minutes].tolist()
+        minutes = range(0, 60, interval_minutes)
         
-        return predictions
+        return [
+            {
+                'hour': hour,
+                'minute': minute,
+                'time': f"{hour:02d}:{minute:02d}",
+                'power_kw': round(power, 2)
+            }
+            for hour, row in enumerate(day)
+            for minute, power in zip(minutes, row)
+        ]
     
     def predict_week(self, month: int, start_day: int = 0) -> Dict[str, List[Dict]]:
         """Generate predictions for a full week"""
-        if self.model is None:
-            raise ValueError("Model not loaded. Call load_model() first.")
+        # Every day comes from the same model even if a swap happens meanwhile
+        grid = self._require_grid()
         
         day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
         week_predictions = {}
@@ -229,7 +763,7 @@ class PowerPredictionService:
         for i in range(7):
             day_of_week = (start_day + i) % 7
             day_name = day_names[day_of_week]
-            week_predictions[day_name] = self.predict_24h(month, day_of_week, interval_minutes=60)
+            week_predictions[day_name] = self._predict_day(grid, month, day_of_week, interval_minutes=60)
         
         return week_predictions
     
@@ -240,5 +774,47 @@ class PowerPredictionService:
         return self.model_stats
 
 
-# Global instance
-power_prediction_service = PowerPredictionService()
\ No newline at end of file
+# ============================================================================
+# Model Registry
+# ============================================================================
+class ModelRegistry:
+    """
+    Prediction services keyed by meter_id, with None for the campus model.
+    Which version each one serves is decided by the model_versions table
+    (see api/model_versions.py); this only holds what is loaded here.
+    """
+    
+    def __init__(self, campus: PowerPredictionService):
+        self._services: Dict[Optional[int], PowerPredictionService] = {None: campus}
+        self._lock = threading.Lock()
+    
+    def get(self, meter_id: Optional[int]):
+        """The loaded service for a meter (None for campus), or None if it has no model"""
+        with self._lock:
+            service = self._services.get(meter_id)
+        return service if service is not None and service.state is not None else None
+    
+    def service(self, meter_id: Optional[int]) -> PowerPredictionService:
+        """The service for a meter, created empty if needed"""
+        with self._lock:
+            service = self._services.get(meter_id)
+            if service is None:
+                service = self._services[meter_id] = PowerPredictionService(f"data/models/meter_{meter_id}.bin")
+            return service
+    
+    def meter_ids(self) -> List[int]:
+        """Meters with a model loaded"""
+        with self._lock:
+            services = list(self._services.items())
+        return sorted(meter_id for meter_id, service in services if meter_id is not None and service.state is not None)
+    
+    @property
+    def version(self):
+        # Changes whenever any model is loaded or replaced
+        with self._lock:
+            return sum(service.version for service in self._services.values())
+
+
+# Global instances
+power_prediction_service = PowerPredictionService()
+model_registry = ModelRegistry(power_prediction_service)
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, Index, String, DateTime, Boolean, Float, Integer, ForeignKey, desc, Text, UniqueConstraint,Enum as SQLEnum
+from sqlalchemy import Column, Index, String, Date, DateTime, Boolean, Float, Integer, ForeignKey, desc, Text, UniqueConstraint, LargeBinary, Enum as SQLEnum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -88,6 +88,28 @@ class EnergyDB(Base):
         Index("idx_energy_meter_timestamp", "meter_id", desc("timestamp")),
     )
 
+class IntervalEnergyDB(Base):
+    """Energy (kWh) consumed between a reading and the meter's previous one"""
+    __tablename__ = "interval_energy"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    meter_id = Column(Integer, ForeignKey("meters.meter_id", ondelete="CASCADE"), nullable=False)
+    timestamp = Column(DateTime, nullable=False)  # reading that closes the interval
+    seconds = Column(Float, nullable=False)
+
+    phase_A_energy = Column(Float, nullable=False)
+    phase_B_energy = Column(Float, nullable=False)
+    phase_C_energy = Column(Float, nullable=False)
+    energy = Column(Float, nullable=False)
+
+    # Counters went backwards or jumped implausibly within this interval
+    counter_reset = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        UniqueConstraint("meter_id", "timestamp", name="unique_interval_energy"),
+        Index("idx_interval_energy_timestamp", "timestamp"),
+    )
+
 class BillingDB(Base):
     __tablename__ = "billing"
 
@@ -122,6 +144,306 @@ class CostPerMeterDB(Base):
         UniqueConstraint("date", "meter_id", name="unique_constraint"),
     )
 
+class CostPerMeterPerDayDB(Base):
+    __tablename__ = "cost_per_meter_per_day"
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Text, nullable=False)
+    day = Column(Integer, nullable=False)
+    meter_id = Column(
+        Integer,
+        ForeignKey("meters.meter_id", ondelete="CASCADE"),
+        nullable=False
+    )
+    energy = Column(Float, nullable=False)
+    cost = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("date", "day", "meter_id", name="unique_cost_per_meter_per_day"),
+        Index("idx_cost_per_meter_per_day_meter_date", "meter_id", "date"),
+    )
+
+class BillingDirtyDayDB(Base):
+    """Meter-days whose readings changed since they were last billed"""
+    __tablename__ = "billing_dirty_days"
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Text, nullable=False)
+    day = Column(Integer, nullable=False)
+    meter_id = Column(
+        Integer,
+        ForeignKey("meters.meter_id", ondelete="CASCADE"),
+        nullable=False
+    )
+    marked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("date", "day", "meter_id", name="unique_billing_dirty_day"),
+    )
+
+class MonthlyChargeDB(Base):
+    """Per-meter monthly charges that are not tied to a day"""
+    __tablename__ = "monthly_charges"
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Text, nullable=False)
+    meter_id = Column(
+        Integer,
+        ForeignKey("meters.meter_id", ondelete="CASCADE"),
+        nullable=False
+    )
+    tariff_id = Column(Integer, ForeignKey("tariffs.id", ondelete="SET NULL"), nullable=True)
+    peak_kw = Column(Float, nullable=False)
+    demand_cost = Column(Float, nullable=False)
+    fixed_cost = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("date", "meter_id", name="unique_monthly_charge"),
+    )
+
+class BillProjectionDB(Base):
+    """End-of-month bill projection per meter; the campus total has no meter_id"""
+    __tablename__ = "bill_projections"
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Text, nullable=False)
+    meter_id = Column(
+        Integer,
+        ForeignKey("meters.meter_id", ondelete="CASCADE"),
+        nullable=True
+    )
+    as_of = Column(DateTime, nullable=False)  # realized up to here, forecast after
+    method = Column(String, nullable=False)  # "model" or "run_rate"
+
+    realized_energy = Column(Float, nullable=False)
+    realized_cost = Column(Float, nullable=False)
+    forecast_energy = Column(Float, nullable=False)
+    projected_energy = Column(Float, nullable=False)
+    projected_cost = Column(Float, nullable=False)
+    projected_cost_low = Column(Float, nullable=False)
+    projected_cost_high = Column(Float, nullable=False)
+
+    computed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # One row per meter and month, the campus row (no meter_id) included
+        Index(
+            "uq_bill_projection_date_meter", "date", "meter_id",
+            unique=True, postgresql_nulls_not_distinct=True,
+        ),
+    )
+
+class TariffDB(Base):
+    """
+    A tariff applies from effective_from until the next active tariff's
+    effective_from. Energy is charged at default_rate unless a rate window
+    or slabs say otherwise.
+    """
+    __tablename__ = "tariffs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, unique=True)
+    effective_from = Column(Date, nullable=False)
+    is_active = Column(Boolean, nullable=False, default=True)
+
+    default_rate = Column(Float, nullable=False)  # per kWh
+    demand_charge = Column(Float, nullable=False, default=0.0)  # per kW of the monthly 15-minute peak
+    fixed_charge = Column(Float, nullable=False, default=0.0)  # per meter per month
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TariffRateDB(Base):
+    """Seasonal time-of-day rate; months are inclusive, end_hour is exclusive, both may wrap"""
+    __tablename__ = "tariff_rates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tariff_id = Column(Integer, ForeignKey("tariffs.id", ondelete="CASCADE"), nullable=False, index=True)
+    start_month = Column(Integer, nullable=False)
+    end_month = Column(Integer, nullable=False)
+    start_hour = Column(Integer, nullable=False)
+    end_hour = Column(Integer, nullable=False)
+    rate = Column(Float, nullable=False)
+
+class TariffSlabDB(Base):
+    """Consumption block on a meter's monthly kWh; the last slab may be unbounded"""
+    __tablename__ = "tariff_slabs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tariff_id = Column(Integer, ForeignKey("tariffs.id", ondelete="CASCADE"), nullable=False, index=True)
+    upper_kwh = Column(Float, nullable=True)
+    rate = Column(Float, nullable=False)
+
+class FeederDB(Base):
+    __tablename__ = "feeders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    parent_meter_id = Column(Integer, ForeignKey("meters.meter_id", ondelete="CASCADE"), nullable=False)
+    child_meter_id = Column(Integer, ForeignKey("meters.meter_id", ondelete="CASCADE"), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("parent_meter_id", "child_meter_id", name="unique_feeder_edge"),
+    )
+
+class EnergyBalanceDB(Base):
+    __tablename__ = "energy_balance"
+
+    id = Column(Integer, primary_key=True, index=True)
+    parent_meter_id = Column(Integer, ForeignKey("meters.meter_id", ondelete="CASCADE"), nullable=False)
+    period = Column(String, nullable=False)  # "day" or "month"
+    date = Column(Text, nullable=False)  # YYYY-MM-DD or YYYY-MM
+
+    parent_kwh = Column(Float, nullable=False)
+    children_kwh = Column(Float, nullable=False)
+    loss_kwh = Column(Float, nullable=False)
+    loss_percent = Column(Float, nullable=True)
+    # Grid intervals where the parent and every child had readings
+    intervals = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("parent_meter_id", "period", "date", name="unique_energy_balance"),
+    )
+
+class DemandIntervalDB(Base):
+    __tablename__ = "demand_intervals"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    meter_id = Column(Integer, ForeignKey("meters.meter_id", ondelete="CASCADE"), nullable=False)
+    interval_start = Column(DateTime, nullable=False)
+
+    demand_kw = Column(Float, nullable=False)  # mean active power over the interval
+    samples = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("meter_id", "interval_start", name="unique_demand_interval"),
+        Index("idx_demand_meter_interval", "meter_id", desc("interval_start")),
+    )
+
+class PeakDemandDB(Base):
+    __tablename__ = "peak_demand"
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Text, nullable=False)
+    meter_id = Column(Integer, ForeignKey("meters.meter_id", ondelete="CASCADE"), nullable=False)
+
+    peak_kw = Column(Float, nullable=False)
+    peak_at = Column(DateTime, nullable=False)
+    avg_kw = Column(Float, nullable=False)
+    intervals = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("date", "meter_id", name="unique_peak_demand"),
+    )
+
+class LoadDurationDB(Base):
+    __tablename__ = "load_duration_curve"
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Text, nullable=False)
+    meter_id = Column(Integer, ForeignKey("meters.meter_id", ondelete="CASCADE"), nullable=False)
+
+    # Demand that was met or exceeded for this percent of the month's intervals
+    percent_of_time = Column(Integer, nullable=False)
+    demand_kw = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("date", "meter_id", "percent_of_time", name="unique_load_duration"),
+    )
+
+class PowerQualityEventDB(Base):
+    __tablename__ = "power_quality_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    meter_id = Column(Integer, ForeignKey("meters.meter_id", ondelete="CASCADE"), nullable=False)
+    phase = Column(String(1), nullable=False)  # "A", "B" or "C"
+    event_type = Column(String, nullable=False)  # SAG, SWELL or OUTAGE
+
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)  # last sample seen inside the event
+    extreme_value = Column(Float, nullable=False)  # lowest voltage for SAG/OUTAGE, highest for SWELL
+    samples = Column(Integer, nullable=False, default=1)
+
+    # Still being extended by ingest
+    is_open = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index("idx_pq_event_meter_start", "meter_id", desc("start_time")),
+        Index("idx_pq_event_type_start", "event_type", desc("start_time")),
+        Index("idx_pq_event_open", "meter_id", "is_open"),
+        # Ingest extends the one open event of each phase
+        Index(
+            "uq_pq_event_open_phase", "meter_id", "phase",
+            unique=True, postgresql_where=is_open.is_(True),
+        ),
+    )
+
+class AnomalyDB(Base):
+    __tablename__ = "anomalies"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    meter_id = Column(Integer, ForeignKey("meters.meter_id", ondelete="CASCADE"), nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+
+    metric = Column(String, nullable=False)  # e.g. "voltage_A", "power_C"
+    value = Column(Float, nullable=False)
+    expected = Column(Float, nullable=False)
+    score = Column(Float, nullable=False)  # z-score of the detector that fired
+    detector = Column(String, nullable=False)  # "ewma", "robust" or "both"
+
+    __table_args__ = (
+        Index("idx_anomaly_meter_timestamp", "meter_id", desc("timestamp")),
+        Index("idx_anomaly_timestamp", desc("timestamp")),
+    )
+
+class AnomalyDetectorStateDB(Base):
+    __tablename__ = "anomaly_detector_state"
+
+    meter_id = Column(Integer, ForeignKey("meters.meter_id", ondelete="CASCADE"), primary_key=True)
+    state = Column(LargeBinary, nullable=False)  # npz of the detector arrays
+    samples = Column(Integer, nullable=False)
+    last_timestamp = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ModelVersionDB(Base):
+    """A trained forecasting model artifact; meter_id is empty for the campus model"""
+    __tablename__ = "model_versions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    meter_id = Column(
+        Integer,
+        ForeignKey("meters.meter_id", ondelete="CASCADE"),
+        nullable=True
+    )
+    version = Column(Integer, nullable=False)  # 1, 2, ... per meter
+    path = Column(String, nullable=False)  # immutable model file
+    source = Column(String, nullable=False)  # "csv" or "demand"
+    status = Column(String, nullable=False)  # candidate, active, rejected or retired
+
+    mae = Column(Float, nullable=False)
+    rmse = Column(Float, nullable=False)
+    r2 = Column(Float, nullable=False)
+    # RMSE of the model that was active, on this version's holdout rows
+    baseline_rmse = Column(Float, nullable=True)
+    train_samples = Column(Integer, nullable=False)
+    test_samples = Column(Integer, nullable=False)
+
+    trained_at = Column(DateTime, nullable=False)
+    promoted_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_model_version_meter_status", "meter_id", "status"),
+    )
+
+class DataWatermarkDB(Base):
+    __tablename__ = "data_watermarks"
+
+    # e.g. "meter:3" (last ingest), "billing:2025-01" (last bill compute), "meters" (registry)
+    resource = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
 class MeterStatusDB(Base):
     __tablename__ = "meter_status"
 
@@ -1,15 +1,49 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import func, desc, cast, Date
 from sqlalchemy.orm import Session
-from ..models import EnergyDB, MeterDB, PowerDB, VoltageDB, CurrentDB
+from ..models import EnergyDB, IntervalEnergyDB, MeterDB, PowerDB, VoltageDB, CurrentDB
 from ..database import get_db
 from ..api.iammeter import voltage_status, calculate_unbalance, current_status
 from ..api.iammeter import get_meter_id_by_name
-from datetime import datetime, date
+from ..api.unbalance import unbalance_history
+from ..utils.http_cache import WatermarkETag
+from ..utils.result_cache import cached
+from ..utils.watermark import METER_PREFIX, METER_REGISTRY, meter_period_key, months_in, period_key
+from datetime import datetime, date, time, timedelta
 
-router = APIRouter(prefix="/analysis", tags=["analysis"])
+# Every analysis view is derived from ingested readings and meter names, so
+# one ETag covering all meter watermarks plus the registry is enough.
+meter_data_etag = WatermarkETag(
+    resources=lambda request: [METER_REGISTRY],
+    prefix=METER_PREFIX,
+)
+
+
+
+def year_keys(year: int, **_):
+    # Every meter's readings of the year, and the meter list itself
+    return [METER_REGISTRY, *(period_key(m) for m in months_in(date(year, 1, 1), date(year + 1, 1, 1)))]
+
+
+def date_range_keys(from_date: date, to_date: date, **_):
+    return [METER_REGISTRY, *(period_key(m) for m in months_in(from_date, to_date))]
+
+
+def meter_year_keys(meter_name: str, year: int, db: Session, **_):
+    meter_id = get_meter_id_by_name(db, meter_name)
+    months = months_in(date(year, 1, 1), date(year + 1, 1, 1))
+    # The registry covers renames, which change which meter the name means
+    return [METER_REGISTRY, *(meter_period_key(meter_id, m) for m in months)]
+
+
+router = APIRouter(
+    prefix="/analysis",
+    tags=["analysis"],
+    dependencies=[Depends(meter_data_etag)],
+)
 
 @router.get("/avg_consumption_yearly")
+@cached(ttl=3600, resources=year_keys)
 def get_yearly_consumption_and_power(
     year: int = Query(..., ge=2000),
     db: Session = Depends(get_db)
@@ -112,25 +146,22 @@ def get_previous_current_power(db: Session = Depends(get_db)):
 
 
 @router.get("/avg_daily_energy")
+@cached(ttl=3600, resources=date_range_keys)
 def get_avg_daily_energy_across_meters(
     from_date: date = Query(...),
     to_date: date = Query(...),
     db: Session = Depends(get_db)
 ):
-    # per-meter daily energy
+    # per-meter daily energy, summed from interval deltas
     per_meter_daily = (
         db.query(
-            cast(EnergyDB.timestamp, Date).label("day"),
-            EnergyDB.meter_id.label("meter_id"),
-            func.sum(
-                EnergyDB.phase_A_grid_consumption +
-                EnergyDB.phase_B_grid_consumption +
-                EnergyDB.phase_C_grid_consumption
-            ).label("meter_energy")
+            cast(IntervalEnergyDB.timestamp, Date).label("day"),
+            IntervalEnergyDB.meter_id.label("meter_id"),
+            func.sum(IntervalEnergyDB.energy).label("meter_energy")
         )
-        .filter(EnergyDB.timestamp >= from_date)
-        .filter(EnergyDB.timestamp < to_date)
-        .group_by("day", EnergyDB.meter_id)
+        .filter(IntervalEnergyDB.timestamp >= from_date)
+        .filter(IntervalEnergyDB.timestamp < to_date)
+        .group_by("day", IntervalEnergyDB.meter_id)
         .subquery()
     )
 
@@ -160,9 +191,10 @@ MONTHS = {
     9: "sep", 10: "oct", 11: "nov", 12: "dec"
 }
 @router.get("/monthly_average/{year}/{meter_name}")
+@cached(ttl=3600, resources=meter_year_keys)
 def monthly_average(meter_name: str, year: int, db:Session = Depends(get_db)):
     data = {}
-    meter_id = get_meter_id_by_name(meter_name)
+    meter_id = get_meter_id_by_name(db, meter_name)
     for month in range(1, 13):
         start_date = datetime(year, month, 1)
         end_date = (
@@ -311,3 +343,51 @@ def get_current_analysis(db: Session = Depends(get_db)):
         "data": result
     }
 
+
+@router.get("/unbalance")
+def get_unbalance_history(
+    from_date: date = Query(...),
+    to_date: date = Query(...),
+    meter_name: str | None = Query(None),
+    episodes: int = Query(5, ge=0, le=100),
+    db: Session = Depends(get_db)
+):
+    if from_date > to_date:
+        raise HTTPException(
+            status_code=400,
+            detail="from_date cannot be later than to_date"
+        )
+
+    query = db.query(MeterDB)
+    if meter_name is not None:
+        query = query.filter(MeterDB.name == meter_name)
+    meters = query.all()
+    if meter_name is not None and not meters:
+        raise HTTPException(status_code=404, detail="Meter not found")
+
+    start = datetime.combine(from_date, time.min)
+    end = datetime.combine(to_date + timedelta(days=1), time.min)
+
+    voltage, current = unbalance_history(
+        db, start, end,
+        meter_ids=[m.meter_id for m in meters],
+        episode_limit=episodes,
+    )
+
+    no_data = {"samples": 0, "status": "NO_DATA"}
+    result = [
+        {
+            "meter_id": m.meter_id,
+            "meter_name": m.name,
+            "voltage": voltage.get(m.meter_id, no_data),
+            "current": current.get(m.meter_id, no_data),
+        }
+        for m in meters
+    ]
+
+    return {
+        "success": True,
+        "from_date": from_date,
+        "to_date": to_date,
+        "data": result
+    }
@@ -0,0 +1,143 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+import numpy as np
+
+from ..models import AnomalyDB, AnomalyDetectorStateDB
+from ..database import get_db
+from ..api.anomaly import METRICS, MeterDetector, reset_cache
+from .auth.auth_utils import require_admin
+
+router = APIRouter(prefix="/anomalies", tags=["anomalies"])
+
+
+def _window(from_date: date, to_date: date):
+    if from_date > to_date:
+        raise HTTPException(
+            status_code=400,
+            detail="from_date cannot be later than to_date"
+        )
+    return (
+        datetime.combine(from_date, time.min),
+        datetime.combine(to_date + timedelta(days=1), time.min),
+    )
+
+
+@router.get("")
+def get_anomalies(
+    from_date: date = Query(...),
+    to_date: date = Query(...),
+    meter_id: Optional[int] = Query(None),
+    metric: Optional[str] = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    start, end = _window(from_date, to_date)
+    if metric is not None and metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric. Expected one of {METRICS}")
+
+    query = db.query(AnomalyDB).filter(
+        AnomalyDB.timestamp >= start,
+        AnomalyDB.timestamp < end,
+    )
+    if meter_id is not None:
+        query = query.filter(AnomalyDB.meter_id == meter_id)
+    if metric is not None:
+        query = query.filter(AnomalyDB.metric == metric)
+
+    rows = query.order_by(AnomalyDB.timestamp.desc()).limit(limit).all()
+
+    return {
+        "success": True,
+        "count": len(rows),
+        "data": [
+            {
+                "id": r.id,
+                "meter_id": r.meter_id,
+                "timestamp": r.timestamp,
+                "metric": r.metric,
+                "value": r.value,
+                "expected": r.expected,
+                "score": r.score,
+                "detector": r.detector,
+            }
+            for r in rows
+        ]
+    }
+
+
+@router.get("/summary")
+def get_anomaly_summary(
+    from_date: date = Query(...),
+    to_date: date = Query(...),
+    db: Session = Depends(get_db)
+):
+    start, end = _window(from_date, to_date)
+
+    rows = (
+        db.query(
+            AnomalyDB.meter_id,
+            AnomalyDB.metric,
+            func.count(AnomalyDB.id),
+            func.max(AnomalyDB.timestamp),
+        )
+        .filter(AnomalyDB.timestamp >= start, AnomalyDB.timestamp < end)
+        .group_by(AnomalyDB.meter_id, AnomalyDB.metric)
+        .all()
+    )
+
+    result = {}
+    for meter_id, metric, count, last_seen in rows:
+        result.setdefault(meter_id, {})[metric] = {"count": count, "last_seen": last_seen}
+
+    return {
+        "success": True,
+        "data": [
+            {"meter_id": meter_id, "metrics": metrics}
+            for meter_id, metrics in result.items()
+        ]
+    }
+
+
+@router.get("/detectors")
+def get_detector_state(db: Session = Depends(get_db)):
+    """Current baseline (EWMA mean and std) of every checkpointed detector"""
+    result = []
+    for saved in db.query(AnomalyDetectorStateDB).all():
+        detector = MeterDetector.from_bytes(saved.state, saved.last_timestamp)
+        std = np.sqrt(detector.var)
+        result.append({
+            "meter_id": saved.meter_id,
+            "samples": saved.samples,
+            "last_timestamp": saved.last_timestamp,
+            "updated_at": saved.updated_at,
+            "baseline": {
+                metric: {"mean": float(detector.mean[i]), "std": float(std[i])}
+                for i, metric in enumerate(METRICS)
+            },
+        })
+
+    return {
+        "success": True,
+        "data": result
+    }
+
+
+@router.delete("/detectors/{meter_id}", dependencies=[Depends(require_admin)])
+def reset_detector(meter_id: int, db: Session = Depends(get_db)):
+    """Drop a meter's learned baseline, e.g. after rewiring or a meter swap"""
+    deleted = db.query(AnomalyDetectorStateDB).filter(
+        AnomalyDetectorStateDB.meter_id == meter_id
+    ).delete()
+    db.commit()
+    reset_cache(meter_id)
+
+    if not deleted:
+        raise HTTPException(status_code=404, detail="No detector state for this meter")
+
+    return {
+        "success": True,
+        "message": f"Detector state reset for meter {meter_id}"
+    }
@@ -1,18 +1,130 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from datetime import date
+from typing import Optional
 
-from ..models import BillingDB, CostPerDayDB, CostPerMeterDB
-from ..database import get_db
+from ..models import BillingDB, BillProjectionDB, CostPerDayDB, CostPerMeterDB, CostPerMeterPerDayDB, MeterDB, MonthlyChargeDB
+from ..database import SessionLocal, get_db
 from ..api.billing import calculate_bill
+from ..api.projection import refresh_projection
+from ..api.bill_rebuild import DEFAULT_WORKERS, billable_months, months_between, rebuild_bills
+from ..utils.http_cache import WatermarkETag
+from ..utils.jobs import jobs
+from ..utils.single_flight import SingleFlight
+from ..utils.watermark import billing_key
+from ..ml_model import power_prediction_service
+from .auth.auth_utils import require_admin
 
 router = APIRouter(prefix="/billing", tags=["billing"])
 
+def _bill_resources(request: Request):
+  try:
+    year = int(request.path_params["year"])
+    month = int(request.path_params["month"])
+  except (KeyError, ValueError):
+    return []
+  return [billing_key(f"{year}-{month:02d}")]
 
-@router.get("/{year}/{month}")
+# A month that was never billed has no watermark yet; it gets its ETag once
+# the bill has been computed below.
+bill_etag = WatermarkETag(resources=_bill_resources, require_all=True)
+
+# Concurrent misses for the same month share a single calculate_bill
+bill_flight = SingleFlight()
+
+
+def _ensure_bill(year: int, month: int):
+  db = SessionLocal()
+  try:
+    month_key = f"{year}-{month:02d}"
+    if not db.query(BillingDB.id).filter(BillingDB.date == month_key).first():
+      calculate_bill(year, month, db)
+  finally:
+    db.close()
+
+
+def _bill_job(job, year: int, month: int):
+  month_key = f"{year}-{month:02d}"
+  bill_flight.do(month_key, _ensure_bill, year, month)
+  job.advance(message=f"Bill for {month_key} ready")
+  return month_key
+
+
+def _avg_per_weekday(year: int, month: int, day_values):
+  weekdays = {}
+  week_count = {}
+
+  for day, value in day_values:
+    d = date(year, month, day)
+    weekday_name = d.strftime("%A")
+
+    if weekday_name in weekdays:
+      weekdays[weekday_name] += value
+      week_count[weekday_name] += 1
+    else:
+      weekdays.update({weekday_name: value})
+      week_count.update({weekday_name: 1})
+
+  return {
+      weekday: weekdays[weekday] / week_count[weekday]
+      for weekday in weekdays
+  }
+
+
+def _latest_bill_job(month_key: str, running_only: bool = False):
+  candidates = jobs.running("bill") if running_only else jobs.list("bill")
+  return next((job for job in candidates if job.params.get("month") == month_key), None)
+
+
+def _parse_month(value: str):
+  year, month = (int(part) for part in value.split("-"))
+  if not 1 <= month <= 12:
+    raise HTTPException(status_code=400, detail=f"Invalid month: {value}")
+  return year, month
+
+
+@router.post("/rebuild", status_code=202, dependencies=[Depends(require_admin)])
+def rebuild(
+    from_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="YYYY-MM, defaults to the first month with data"),
+    to_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="YYYY-MM, defaults to the last month with data"),
+    workers: int = Query(DEFAULT_WORKERS, ge=1, le=16),
+    db: Session = Depends(get_db)
+  ):
+  """Recalculate many months' bills in the background, e.g. after a tariff change or backfill"""
+  if jobs.running("bill_rebuild"):
+    raise HTTPException(status_code=409, detail="A bill rebuild is already running")
+
+  months = billable_months(db)
+  if from_month or to_month:
+    start = _parse_month(from_month) if from_month else (months[0] if months else None)
+    end = _parse_month(to_month) if to_month else (months[-1] if months else None)
+    if start is None or end is None:
+      raise HTTPException(status_code=400, detail="from_month and to_month are required when there is no data")
+    if start > end:
+      raise HTTPException(status_code=400, detail="from_month cannot be later than to_month")
+    months = months_between(start, end)
+
+  job = jobs.submit(
+    "bill_rebuild",
+    rebuild_bills,
+    months,
+    workers,
+    total=len(months),
+    params={"from_month": from_month, "to_month": to_month, "workers": workers},
+  )
+  return {
+    "success": True,
+    "data": job.to_dict()
+  }
+
+
+@router.get("/{year}/{month}", dependencies=[Depends(bill_etag)])
 def get_bill(
     year: int,
     month: int,
+    request: Request,
+    response: Response,
+    wait: bool = Query(True, description="When false, a missing bill is computed in the background and 202 is returned"),
     db: Session = Depends(get_db)
   ):
   month_key = f"{year}-{month:02d}"
@@ -29,7 +141,18 @@ def get_bill(
   )
 
   if not billing:
-    calculate_bill(year, month, db)
+    if not wait:
+      job = _latest_bill_job(month_key, running_only=True) or jobs.submit(
+        "bill", _bill_job, year, month, total=1, params={"month": month_key}
+      )
+      response.status_code = 202
+      return {
+        "status": "computing",
+        "job": job.to_dict(),
+        "status_url": f"{router.prefix}/{year}/{month}/status",
+      }
+
+    bill_flight.do(month_key, _ensure_bill, year, month)
     billing = (
       db.query(
         BillingDB.total_cost,
@@ -40,6 +163,7 @@ def get_bill(
       .filter(BillingDB.date == month_key)
       .first()
     )
+    bill_etag.apply(request, response, db)
 
   cost_per_day = (
     db.query(
@@ -59,24 +183,7 @@ def get_bill(
     .all()
   )
 
-  weekdays = {}
-  week_count = {}
-
-  for day, cost in cost_per_day:
-    d = date(year, month, day)
-    weekday_name = d.strftime("%A")
-
-    if weekday_name in weekdays:
-      weekdays[weekday_name] += cost
-      week_count[weekday_name] += 1
-    else:
-      weekdays.update({weekday_name: cost})
-      week_count.update({weekday_name: 1})
-
-  avg_cost_per_week_days = {
-      weekday: weekdays[weekday] / week_count[weekday]
-      for weekday in weekdays
-  }
+  avg_cost_per_week_days = _avg_per_weekday(year, month, cost_per_day)
 
   return {
     "billing": {
@@ -97,6 +204,201 @@ def get_bill(
   }
 
 
+@router.get("/{year}/{month}/status")
+def get_bill_status(
+    year: int,
+    month: int,
+    db: Session = Depends(get_db)
+  ):
+  month_key = f"{year}-{month:02d}"
+  ready = db.query(BillingDB.id).filter(BillingDB.date == month_key).first() is not None
+  job = _latest_bill_job(month_key)
+
+  return {
+    "success": True,
+    "data": {
+      "month": month_key,
+      "ready": ready,
+      "computing": bill_flight.in_flight(month_key),
+      "job": job.to_dict() if job else None,
+    }
+  }
+
+
+@router.get("/{year}/{month}/meters", dependencies=[Depends(bill_etag)])
+def get_meter_bills(
+    year: int,
+    month: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+  ):
+  """Per-meter energy, cost, monthly charges and weekday averages for a month"""
+  month_key = f"{year}-{month:02d}"
+  if not db.query(BillingDB.id).filter(BillingDB.date == month_key).first():
+    bill_flight.do(month_key, _ensure_bill, year, month)
+    bill_etag.apply(request, response, db)
+
+  rows = (
+    db.query(
+      CostPerMeterPerDayDB.meter_id,
+      CostPerMeterPerDayDB.day,
+      CostPerMeterPerDayDB.energy,
+      CostPerMeterPerDayDB.cost,
+    )
+    .filter(CostPerMeterPerDayDB.date == month_key)
+    .order_by(CostPerMeterPerDayDB.meter_id, CostPerMeterPerDayDB.day)
+    .all()
+  )
+  charges = {
+    row.meter_id: row
+    for row in db.query(MonthlyChargeDB).filter(MonthlyChargeDB.date == month_key)
+  }
+  names = dict(db.query(MeterDB.meter_id, MeterDB.name).all())
+
+  per_meter = {}
+  for meter_id, day, energy, cost in rows:
+    per_meter.setdefault(meter_id, []).append((day, energy, cost))
+
+  result = []
+  for meter_id in sorted(set(per_meter) | set(charges)):
+    days = per_meter.get(meter_id, [])
+    charge = charges.get(meter_id)
+    energy_cost = sum(cost for _, _, cost in days)
+    monthly_cost = (charge.demand_cost + charge.fixed_cost) if charge else 0
+
+    result.append({
+      "meter_id": meter_id,
+      "name": names.get(meter_id),
+      "energy": sum(energy for _, energy, _ in days),
+      "energy_cost": energy_cost,
+      "peak_kw": charge.peak_kw if charge else None,
+      "demand_cost": charge.demand_cost if charge else 0,
+      "fixed_cost": charge.fixed_cost if charge else 0,
+      "total_cost": energy_cost + monthly_cost,
+      "avg_cost_per_weekday": _avg_per_weekday(year, month, [(day, cost) for day, _, cost in days]),
+    })
+
+  return {
+    "success": True,
+    "month": month_key,
+    "data": result
+  }
+
+
+@router.get("/{year}/{month}/meters/{meter_id}", dependencies=[Depends(bill_etag)])
+def get_meter_bill(
+    year: int,
+    month: int,
+    meter_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+  ):
+  """Daily energy and cost of one meter for a month"""
+  month_key = f"{year}-{month:02d}"
+  meter = db.query(MeterDB).filter(MeterDB.meter_id == meter_id).first()
+  if not meter:
+    raise HTTPException(status_code=404, detail="Meter not found")
+
+  if not db.query(BillingDB.id).filter(BillingDB.date == month_key).first():
+    bill_flight.do(month_key, _ensure_bill, year, month)
+    bill_etag.apply(request, response, db)
+
+  days = (
+    db.query(
+      CostPerMeterPerDayDB.day,
+      CostPerMeterPerDayDB.energy,
+      CostPerMeterPerDayDB.cost,
+    )
+    .filter(
+      CostPerMeterPerDayDB.meter_id == meter_id,
+      CostPerMeterPerDayDB.date == month_key,
+    )
+    .order_by(CostPerMeterPerDayDB.day)
+    .all()
+  )
+  charge = (
+    db.query(MonthlyChargeDB)
+    .filter(MonthlyChargeDB.date == month_key, MonthlyChargeDB.meter_id == meter_id)
+    .first()
+  )
+
+  return {
+    "success": True,
+    "month": month_key,
+    "meter_id": meter_id,
+    "name": meter.name,
+    "cost_per_day": [
+      {"day": day, "energy": energy, "cost": cost}
+      for day, energy, cost in days
+    ],
+    "monthly_charges": {
+      "peak_kw": charge.peak_kw,
+      "demand_cost": charge.demand_cost,
+      "fixed_cost": charge.fixed_cost,
+    } if charge else None,
+    "avg_cost_per_weekday": _avg_per_weekday(year, month, [(day, cost) for day, _, cost in days]),
+    "avg_energy_per_weekday": _avg_per_weekday(year, month, [(day, energy) for day, energy, _ in days]),
+  }
+
+
+@router.get("/{year}/{month}/projection")
+def get_projection(
+    year: int,
+    month: int,
+    db: Session = Depends(get_db)
+  ):
+  """End-of-month projection as last stored by the scheduler"""
+  month_key = f"{year}-{month:02d}"
+  rows = db.query(BillProjectionDB).filter(BillProjectionDB.date == month_key).all()
+  if not rows:
+    raise HTTPException(status_code=404, detail=f"No projection for {month_key}")
+
+  names = dict(db.query(MeterDB.meter_id, MeterDB.name).all())
+
+  def as_dict(row):
+    return {
+      "realized_energy": row.realized_energy,
+      "realized_cost": row.realized_cost,
+      "forecast_energy": row.forecast_energy,
+      "projected_energy": row.projected_energy,
+      "projected_cost": row.projected_cost,
+      "projected_cost_low": row.projected_cost_low,
+      "projected_cost_high": row.projected_cost_high,
+    }
+
+  campus = next((row for row in rows if row.meter_id is None), None)
+  if campus is None:
+    raise HTTPException(status_code=404, detail=f"No projection for {month_key}")
+  meters = sorted((row for row in rows if row.meter_id is not None), key=lambda row: row.meter_id)
+
+  return {
+    "success": True,
+    "data": {
+      "month": month_key,
+      "as_of": campus.as_of,
+      "method": campus.method,
+      "computed_at": campus.computed_at,
+      "campus": as_dict(campus),
+      "meters": [
+        {"meter_id": row.meter_id, "name": names.get(row.meter_id), **as_dict(row)}
+        for row in meters
+      ],
+    }
+  }
+
+
+@router.post("/{year}/{month}/projection", dependencies=[Depends(require_admin)])
+def do_projection(
+    year: int,
+    month: int,
+    db: Session = Depends(get_db)
+  ):
+  meters = refresh_projection(db, year, month, power_prediction_service)
+  return {"success": True, "data": {"month": f"{year}-{month:02d}", "meters": meters}}
+
+
 @router.post("/{year}/{month}")
 def do_bill(
     year: int,
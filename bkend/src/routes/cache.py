@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+
+from ..utils.result_cache import result_cache
+from .auth.auth_utils import require_admin
+
+router = APIRouter(prefix="/cache", tags=["cache"])
+
+
+@router.get("/stats")
+def get_cache_stats():
+    return {
+        "success": True,
+        "data": result_cache.stats()
+    }
+
+
+@router.delete("", dependencies=[Depends(require_admin)])
+def clear_cache(namespace: Optional[str] = Query(None, description="Route function name; all when omitted")):
+    removed = result_cache.clear(namespace)
+    return {
+        "success": True,
+        "message": f"Removed {removed} cached result(s)"
+    }
@@ -0,0 +1,132 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from ..models import DemandIntervalDB, LoadDurationDB, MeterDB, PeakDemandDB
+from ..database import get_db
+from ..api.demand import refresh_demand
+from .auth.auth_utils import require_admin
+
+router = APIRouter(prefix="/demand", tags=["demand"])
+
+
+@router.get("/peak/{year}/{month}")
+def get_peak_demand(
+    year: int,
+    month: int,
+    db: Session = Depends(get_db)
+):
+    month_key = f"{year}-{month:02d}"
+
+    rows = (
+        db.query(PeakDemandDB, MeterDB.name)
+        .join(MeterDB, MeterDB.meter_id == PeakDemandDB.meter_id)
+        .filter(PeakDemandDB.date == month_key)
+        .order_by(PeakDemandDB.peak_kw.desc())
+        .all()
+    )
+
+    return {
+        "success": True,
+        "date": month_key,
+        "data": [
+            {
+                "meter_id": peak.meter_id,
+                "meter_name": name,
+                "peak_kw": peak.peak_kw,
+                "peak_at": peak.peak_at,
+                "avg_kw": peak.avg_kw,
+                "load_factor": peak.avg_kw / peak.peak_kw if peak.peak_kw else None,
+                "intervals": peak.intervals,
+                "updated_at": peak.updated_at,
+            }
+            for peak, name in rows
+        ]
+    }
+
+
+@router.get("/ldc/{year}/{month}")
+def get_load_duration_curve(
+    year: int,
+    month: int,
+    meter_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    month_key = f"{year}-{month:02d}"
+
+    query = db.query(
+        LoadDurationDB.meter_id,
+        LoadDurationDB.percent_of_time,
+        LoadDurationDB.demand_kw,
+    ).filter(LoadDurationDB.date == month_key)
+    if meter_id is not None:
+        query = query.filter(LoadDurationDB.meter_id == meter_id)
+
+    curves = {}
+    for row in query.order_by(LoadDurationDB.meter_id, LoadDurationDB.percent_of_time).all():
+        curves.setdefault(row.meter_id, []).append({
+            "percent_of_time": row.percent_of_time,
+            "demand_kw": row.demand_kw,
+        })
+
+    return {
+        "success": True,
+        "date": month_key,
+        "data": [
+            {"meter_id": m, "curve": curve}
+            for m, curve in curves.items()
+        ]
+    }
+
+
+@router.get("/intervals")
+def get_demand_intervals(
+    meter_id: int = Query(...),
+    from_date: date = Query(...),
+    to_date: date = Query(...),
+    db: Session = Depends(get_db)
+):
+    if from_date > to_date:
+        raise HTTPException(
+            status_code=400,
+            detail="from_date cannot be later than to_date"
+        )
+
+    rows = (
+        db.query(DemandIntervalDB.interval_start, DemandIntervalDB.demand_kw, DemandIntervalDB.samples)
+        .filter(
+            DemandIntervalDB.meter_id == meter_id,
+            DemandIntervalDB.interval_start >= datetime.combine(from_date, time.min),
+            DemandIntervalDB.interval_start < datetime.combine(to_date + timedelta(days=1), time.min),
+        )
+        .order_by(DemandIntervalDB.interval_start)
+        .all()
+    )
+
+    return {
+        "success": True,
+        "meter_id": meter_id,
+        "count": len(rows),
+        "data": [
+            {"interval_start": start, "demand_kw": kw, "samples": samples}
+            for start, kw, samples in rows
+        ]
+    }
+
+
+@router.post("/refresh", dependencies=[Depends(require_admin)])
+def refresh(
+    meter_id: Optional[int] = Query(None),
+    rebuild: bool = Query(False, description="Recompute from the first reading (after a backfill)"),
+    db: Session = Depends(get_db)
+):
+    updated = refresh_demand(
+        db,
+        meter_ids=[meter_id] if meter_id is not None else None,
+        rebuild=rebuild,
+    )
+    return {
+        "success": True,
+        "message": f"Refreshed {updated} demand interval(s)"
+    }
@@ -0,0 +1,209 @@
+from typing import List, Optional
+from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from datetime import date, datetime, time, timedelta
+import numpy as np
+
+from ..models import EnergyBalanceDB, FeederDB, MeterDB
+from ..database import get_db
+from ..api.energy_balance import compute_balance, get_feeders, refresh_energy_balance
+from .auth.auth_utils import require_admin
+
+router = APIRouter(prefix="/energy_balance", tags=["energy_balance"])
+
+
+class FeederUpdate(BaseModel):
+    child_meter_ids: List[int]
+
+
+def _balance_row(row: EnergyBalanceDB):
+    return {
+        "date": row.date,
+        "parent_kwh": row.parent_kwh,
+        "children_kwh": row.children_kwh,
+        "loss_kwh": row.loss_kwh,
+        "loss_percent": row.loss_percent,
+        "intervals": row.intervals,
+        "updated_at": row.updated_at,
+    }
+
+
+def _resolve_parent(db: Session, parent_meter_id: Optional[int]):
+    feeders = get_feeders(db)
+    if parent_meter_id is None:
+        if len(feeders) != 1:
+            raise HTTPException(status_code=400, detail="parent_meter_id is required")
+        parent_meter_id = next(iter(feeders))
+    if parent_meter_id not in feeders:
+        raise HTTPException(status_code=404, detail="No feeder defined for this meter")
+    return parent_meter_id, feeders[parent_meter_id]
+
+
+@router.get("/feeders")
+def get_feeder_hierarchy(db: Session = Depends(get_db)):
+    names = dict(db.query(MeterDB.meter_id, MeterDB.name).all())
+    return {
+        "success": True,
+        "data": [
+            {
+                "parent_meter_id": parent,
+                "parent_name": names.get(parent),
+                "children": [
+                    {"meter_id": child, "name": names.get(child)}
+                    for child in sorted(children)
+                ],
+            }
+            for parent, children in get_feeders(db).items()
+        ]
+    }
+
+
+@router.put("/feeders/{parent_meter_id}", dependencies=[Depends(require_admin)])
+def set_feeder_children(
+    parent_meter_id: int,
+    update: FeederUpdate,
+    db: Session = Depends(get_db)
+):
+    """Replace the child meters fed by a parent meter"""
+    meter_ids = {parent_meter_id, *update.child_meter_ids}
+    found = {m for m, in db.query(MeterDB.meter_id).filter(MeterDB.meter_id.in_(meter_ids)).all()}
+    missing = meter_ids - found
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Meter(s) not found: {sorted(missing)}")
+    if parent_meter_id in update.child_meter_ids:
+        raise HTTPException(status_code=400, detail="A meter cannot feed itself")
+
+    try:
+        db.query(FeederDB).filter(FeederDB.parent_meter_id == parent_meter_id).delete()
+        db.add_all([
+            FeederDB(parent_meter_id=parent_meter_id, child_meter_id=child)
+            for child in sorted(set(update.child_meter_ids))
+        ])
+        # Rollups of the old hierarchy no longer apply
+        db.query(EnergyBalanceDB).filter(EnergyBalanceDB.parent_meter_id == parent_meter_id).delete()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to update feeder: {str(e)}")
+
+    return {
+        "success": True,
+        "message": f"Feeder for meter {parent_meter_id} now has {len(set(update.child_meter_ids))} child meter(s)"
+    }
+
+
+@router.get("/daily")
+def get_daily_balance(
+    from_date: date = Query(...),
+    to_date: date = Query(...),
+    parent_meter_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    if from_date > to_date:
+        raise HTTPException(
+            status_code=400,
+            detail="from_date cannot be later than to_date"
+        )
+    parent_meter_id, _ = _resolve_parent(db, parent_meter_id)
+
+    rows = (
+        db.query(EnergyBalanceDB)
+        .filter(
+            EnergyBalanceDB.parent_meter_id == parent_meter_id,
+            EnergyBalanceDB.period == "day",
+            EnergyBalanceDB.date >= from_date.isoformat(),
+            EnergyBalanceDB.date <= to_date.isoformat(),
+        )
+        .order_by(EnergyBalanceDB.date)
+        .all()
+    )
+
+    return {
+        "success": True,
+        "parent_meter_id": parent_meter_id,
+        "data": [_balance_row(row) for row in rows]
+    }
+
+
+@router.get("/monthly/{year}")
+def get_monthly_balance(
+    year: int,
+    parent_meter_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    parent_meter_id, _ = _resolve_parent(db, parent_meter_id)
+
+    rows = (
+        db.query(EnergyBalanceDB)
+        .filter(
+            EnergyBalanceDB.parent_meter_id == parent_meter_id,
+            EnergyBalanceDB.period == "month",
+            EnergyBalanceDB.date.startswith(f"{year}-"),
+        )
+        .order_by(EnergyBalanceDB.date)
+        .all()
+    )
+
+    return {
+        "success": True,
+        "parent_meter_id": parent_meter_id,
+        "year": year,
+        "data": [_balance_row(row) for row in rows]
+    }
+
+
+@router.get("/intervals")
+def get_interval_balance(
+    day: date = Query(...),
+    parent_meter_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Per-interval balance for one day, computed on the fly"""
+    parent_meter_id, child_ids = _resolve_parent(db, parent_meter_id)
+
+    start = datetime.combine(day, time.min)
+    grid, parent, children, loss, valid = compute_balance(
+        db, parent_meter_id, child_ids, start, start + timedelta(days=1)
+    )
+
+    def value(x, ok):
+        return float(x) if ok and not np.isnan(x) else None
+
+    return {
+        "success": True,
+        "parent_meter_id": parent_meter_id,
+        "date": day,
+        "data": [
+            {
+                "interval_start": t.item(),
+                "parent_kwh": value(p, ok),
+                "children_kwh": value(ch, ok),
+                "loss_kwh": value(l, ok),
+            }
+            for t, p, ch, l, ok in zip(grid, parent, children, loss, valid)
+        ]
+    }
+
+
+@router.post("/refresh", dependencies=[Depends(require_admin)])
+def refresh(
+    from_date: date = Query(...),
+    to_date: date = Query(...),
+    db: Session = Depends(get_db)
+):
+    if from_date > to_date:
+        raise HTTPException(
+            status_code=400,
+            detail="from_date cannot be later than to_date"
+        )
+
+    days = refresh_energy_balance(
+        db,
+        datetime.combine(from_date, time.min),
+        datetime.combine(to_date + timedelta(days=1), time.min),
+    )
+    return {
+        "success": True,
+        "message": f"Refreshed {days} day rollup(s)"
+    }
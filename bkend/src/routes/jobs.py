@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+
+from ..utils.jobs import jobs
+from .auth.auth_utils import require_admin
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("", dependencies=[Depends(require_admin)])
+def list_jobs(kind: Optional[str] = Query(None)):
+    return {
+        "success": True,
+        "data": [job.to_dict() for job in jobs.list(kind)]
+    }
+
+
+@router.get("/{job_id}", dependencies=[Depends(require_admin)])
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return {
+        "success": True,
+        "data": job.to_dict()
+    }
+
+
+@router.delete("/{job_id}", dependencies=[Depends(require_admin)])
+def cancel_job(job_id: str):
+    """Ask a job to stop; work already in progress is finished first"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return {
+        "success": True,
+        "data": job.to_dict()
+    }
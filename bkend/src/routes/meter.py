@@ -7,10 +7,18 @@ from sqlalchemy.exc import SQLAlchemyError
 from ..models import CurrentDB, EnergyDB, MeterDB, PowerDB, VoltageDB
 from ..database import get_db
 from ..api.iammeter import get_meter_id_by_name
+from ..utils.http_cache import WatermarkETag
+from ..utils.watermark import bump_watermark, meter_key, METER_REGISTRY
 from datetime import datetime, date, time
 
 router = APIRouter(prefix="/meter", tags=["meter"])
 
+registry_etag = WatermarkETag(resources=lambda request: [METER_REGISTRY])
+latest_etag = WatermarkETag(
+    resources=lambda request: [meter_key(request.path_params["meter_id"])],
+    require_all=True,
+)
+
 # Pydantic models for request validation
 class MeterLocationUpdate(BaseModel):
     x: float = Field(..., ge=0, le=100, description="X coordinate as percentage (0-100)")
@@ -24,7 +32,7 @@ class MeterLocationItem(BaseModel):
 class BulkLocationUpdate(BaseModel):
     locations: List[MeterLocationItem]
 
-@router.get("")
+@router.get("", dependencies=[Depends(registry_etag)])
 def get_all_meters(db: Session = Depends(get_db)):
     meters = db.query(MeterDB).all()
 
@@ -44,7 +52,7 @@ def get_all_meters(db: Session = Depends(get_db)):
     }
 
 
-@router.get("/{meter_id}/latest")
+@router.get("/{meter_id}/latest", dependencies=[Depends(latest_etag)])
 def get_latest_meter_data(
     meter_id: int,
     db: Session = Depends(get_db)
@@ -229,6 +237,7 @@ def update_meter_location(
     try:
         meter.x = location.x
         meter.y = location.y
+        bump_watermark(db, METER_REGISTRY)
         db.commit()
         db.refresh(meter)
         
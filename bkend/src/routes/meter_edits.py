@@ -6,6 +6,7 @@ from src.init_meter import remove_meter
 from src.routes.meter import BulkLocationUpdate
 from ..models import MeterDB
 from ..database import get_db
+from ..utils.watermark import bump_watermark, METER_REGISTRY
 from .auth.auth_utils import require_admin
 
 router = APIRouter(
@@ -38,6 +39,8 @@ def update_meter_locations(
             else:
                 errors.append(f"Meter ID {location_item.meter_id} not found")
         
+        if updated_count:
+            bump_watermark(db, METER_REGISTRY)
         db.commit()
         
         return {
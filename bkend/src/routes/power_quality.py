@@ -0,0 +1,142 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import date, datetime, time, timedelta
+from typing import Literal, Optional
+
+from ..models import MeterDB, PowerQualityEventDB
+from ..database import get_db
+from ..api.power_quality import scan_voltage_history
+from .auth.auth_utils import require_admin
+
+router = APIRouter(prefix="/power_quality", tags=["power_quality"])
+
+EventType = Literal["SAG", "SWELL", "OUTAGE"]
+Phase = Literal["A", "B", "C"]
+
+
+def _window(from_date: date, to_date: date):
+    if from_date > to_date:
+        raise HTTPException(
+            status_code=400,
+            detail="from_date cannot be later than to_date"
+        )
+    return (
+        datetime.combine(from_date, time.min),
+        datetime.combine(to_date + timedelta(days=1), time.min),
+    )
+
+
+@router.get("/events")
+def get_events(
+    from_date: date = Query(...),
+    to_date: date = Query(...),
+    meter_id: Optional[int] = Query(None),
+    event_type: Optional[EventType] = Query(None),
+    phase: Optional[Phase] = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    start, end = _window(from_date, to_date)
+
+    query = db.query(PowerQualityEventDB).filter(
+        PowerQualityEventDB.start_time >= start,
+        PowerQualityEventDB.start_time < end,
+    )
+    if meter_id is not None:
+        query = query.filter(PowerQualityEventDB.meter_id == meter_id)
+    if event_type is not None:
+        query = query.filter(PowerQualityEventDB.event_type == event_type)
+    if phase is not None:
+        query = query.filter(PowerQualityEventDB.phase == phase)
+
+    events = query.order_by(PowerQualityEventDB.start_time.desc()).limit(limit).all()
+
+    return {
+        "success": True,
+        "count": len(events),
+        "data": [
+            {
+                "id": e.id,
+                "meter_id": e.meter_id,
+                "phase": e.phase,
+                "event_type": e.event_type,
+                "start_time": e.start_time,
+                "end_time": e.end_time,
+                "duration_minutes": (e.end_time - e.start_time).total_seconds() / 60,
+                "extreme_value": e.extreme_value,
+                "samples": e.samples,
+                "is_open": e.is_open,
+            }
+            for e in events
+        ]
+    }
+
+
+@router.get("/summary")
+def get_event_summary(
+    from_date: date = Query(...),
+    to_date: date = Query(...),
+    db: Session = Depends(get_db)
+):
+    start, end = _window(from_date, to_date)
+
+    rows = (
+        db.query(
+            PowerQualityEventDB.meter_id,
+            PowerQualityEventDB.event_type,
+            func.count(PowerQualityEventDB.id).label("events"),
+            func.sum(PowerQualityEventDB.samples).label("samples"),
+            func.min(PowerQualityEventDB.extreme_value).label("lowest"),
+            func.max(PowerQualityEventDB.extreme_value).label("highest"),
+        )
+        .filter(
+            PowerQualityEventDB.start_time >= start,
+            PowerQualityEventDB.start_time < end,
+        )
+        .group_by(PowerQualityEventDB.meter_id, PowerQualityEventDB.event_type)
+        .all()
+    )
+
+    names = dict(db.query(MeterDB.meter_id, MeterDB.name).all())
+    result = {}
+    for row in rows:
+        entry = result.setdefault(row.meter_id, {
+            "meter_id": row.meter_id,
+            "meter_name": names.get(row.meter_id),
+            "events": {},
+        })
+        entry["events"][row.event_type] = {
+            "count": row.events,
+            "samples": int(row.samples or 0),
+            "extreme_value": row.highest if row.event_type == "SWELL" else row.lowest,
+        }
+
+    return {
+        "success": True,
+        "from_date": from_date,
+        "to_date": to_date,
+        "data": list(result.values())
+    }
+
+
+@router.post("/rescan", dependencies=[Depends(require_admin)])
+def rescan_events(
+    from_date: date = Query(...),
+    to_date: date = Query(...),
+    meter_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Rebuild events for a window from raw voltage readings (history or backfill)"""
+    start, end = _window(from_date, to_date)
+
+    count = scan_voltage_history(
+        db, start, end,
+        meter_ids=[meter_id] if meter_id is not None else None,
+    )
+
+    return {
+        "success": True,
+        "message": f"Detected {count} event(s)",
+        "count": count
+    }
@@ -1,11 +1,24 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from pydantic import BaseModel, Field
-from typing import List, Dict
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Dict, Optional
 from datetime import datetime
 import shutil
+import tempfile
 from pathlib import Path
 
-from src.ml_model import power_prediction_service
+import numpy as np
+import pandas as pd
+
+from src.api.model_versions import active_version, describe, list_versions, promote, sync_models
+from src.api.training_jobs import campus_training_job, meter_training_job
+from src.models import ModelVersionDB
+from src.database import SessionLocal
+from src.ml_model import model_registry, power_prediction_service
+from src.routes.auth.auth_utils import require_admin
+from src.utils.jobs import jobs
+from src.utils.result_cache import cached
 
 router = APIRouter(
     prefix="/api/prediction",
@@ -21,17 +34,56 @@ class SinglePredictionRequest(BaseModel):
     day_of_week: int = Field(..., ge=0, le=6, description="Day of week (0=Monday, 6=Sunday)")
     hour: int = Field(..., ge=0, le=23, description="Hour (0-23)")
     minute: int = Field(..., ge=0, le=59, description="Minute (0-59)")
+    meter_id: Optional[int] = Field(None, description="Meter whose model to use; the campus model when omitted")
 
 
 class DayPredictionRequest(BaseModel):
     month: int = Field(..., ge=1, le=12, description="Month (1-12)")
     day_of_week: int = Field(..., ge=0, le=6, description="Day of week (0=Monday, 6=Sunday)")
     interval_minutes: int = Field(5, ge=1, le=60, description="Interval in minutes")
+    meter_id: Optional[int] = Field(None, description="Meter whose model to use; the campus model when omitted")
 
 
 class WeekPredictionRequest(BaseModel):
     month: int = Field(..., ge=1, le=12, description="Month (1-12)")
     start_day: int = Field(0, ge=0, le=6, description="Starting day (0=Monday)")
+    meter_id: Optional[int] = Field(None, description="Meter whose model to use; the campus model when omitted")
+
+
+# A leap year of 1-minute points
+MAX_BATCH_POINTS = 366 * 24 * 60
+# Lines per chunk written to the batch stream
+BATCH_CHUNK_LINES = 10_000
+# Invalid timestamps echoed back in a 422
+MAX_INVALID_SHOWN = 5
+
+
+class BatchPredictionRequest(BaseModel):
+    timestamps: Optional[List[str]] = Field(None, description="ISO timestamps, predicted in the given order")
+    start: Optional[datetime] = Field(None, description="First timestamp of a range")
+    end: Optional[datetime] = Field(None, description="End of the range (exclusive)")
+    step_minutes: int = Field(5, ge=1, le=1440, description="Range step in minutes")
+    meter_id: Optional[int] = Field(None, description="Meter whose model to use; the campus model when omitted")
+
+    @model_validator(mode="after")
+    def check_points(self):
+        if (self.timestamps is None) == (self.start is None or self.end is None):
+            raise ValueError("Provide either timestamps or start and end")
+        if self.timestamps is not None:
+            count = len(self.timestamps)
+        else:
+            if self.start >= self.end:
+                raise ValueError("start must be before end")
+            count = -(-(self.end - self.start).total_seconds() // (self.step_minutes * 60))
+        if count > MAX_BATCH_POINTS:
+            raise ValueError(f"At most {MAX_BATCH_POINTS} points per request")
+        return self
+
+
+class TrainMetersRequest(BaseModel):
+    meter_ids: Optional[List[int]] = Field(None, description="Meters to train; all with enough data when omitted")
+    workers: Optional[int] = Field(None, ge=1, description="Training processes; defaults to every core")
+    force: bool = Field(False, description="Put the new models in service even if they do worse than the current ones")
 
 
 class PredictionResponse(BaseModel):
@@ -57,6 +109,8 @@ class ModelStats(BaseModel):
     r2: float
     train_samples: int
     test_samples: int
+    # Missing for models trained before it was recorded
+    train_seconds: Optional[float] = None
     power_range: Dict
     trained_at: str
 
@@ -69,13 +123,100 @@ def get_day_name(day_of_week: int) -> str:
     return days[day_of_week]
 
 
+def get_service(meter_id: Optional[int]):
+    """The campus model, or the given meter's own model"""
+    if meter_id is None:
+        return power_prediction_service
+    service = model_registry.get(meter_id)
+    if service is None:
+        raise HTTPException(status_code=404, detail=f"No model trained for meter {meter_id}")
+    return service
+
+
+def models_version():
+    return power_prediction_service.version, model_registry.version
+
+
+def training_accepted(job, message: str):
+    return {
+        'message': message,
+        'job': job.to_dict(),
+        'status_url': f"/jobs/{job.id}"
+    }
+
+
+def reload_models():
+    """The campus model file, then every active registry version over it"""
+    db = SessionLocal()
+    try:
+        try:
+            power_prediction_service.load_model()
+        except FileNotFoundError:
+            # Only a problem if the registry has no campus version either
+            if active_version(db, None) is None:
+                raise
+        sync_models(db, force=True)
+    finally:
+        db.close()
+
+
+def promote_version(version_id: int):
+    db = SessionLocal()
+    try:
+        row = db.get(ModelVersionDB, version_id)
+        if row is None:
+            return None
+        promote(db, row)
+        sync_models(db)
+        return describe(row)
+    finally:
+        db.close()
+
+
+def versions_of(meter_id: Optional[int]):
+    db = SessionLocal()
+    try:
+        return [describe(row) for row in list_versions(db, meter_id)]
+    finally:
+        db.close()
+
+
+def batch_timestamps(request: BatchPredictionRequest) -> np.ndarray:
+    """
+    The requested points as datetime64[s]; offsets are dropped, keeping
+    wall-clock time. Timestamps that do not parse come out as NaT.
+    """
+    if request.timestamps is not None:
+        wall_clock = pd.Series(request.timestamps, dtype=str).str.replace(
+            r"(Z|[+-]\d{2}:?\d{2})$", "", regex=True
+        )
+        return pd.to_datetime(wall_clock, format="ISO8601", errors="coerce").to_numpy().astype("datetime64[s]")
+    
+    start = np.datetime64(request.start.replace(tzinfo=None), "s")
+    end = np.datetime64(request.end.replace(tzinfo=None), "s")
+    return np.arange(start, end, np.timedelta64(request.step_minutes, "m")).astype("datetime64[s]")
+
+
+def ndjson_lines(ts: np.ndarray, power: np.ndarray):
+    stamps = np.datetime_as_string(ts, unit="s")
+    power = np.round(power, 2)
+    for start in range(0, len(ts), BATCH_CHUNK_LINES):
+        stop = start + BATCH_CHUNK_LINES
+        yield "".join(
+            f'{{"timestamp":"{stamp}","power_kw":{kw}}}\n'
+            for stamp, kw in zip(stamps[start:stop], power[start:stop].tolist())
+        )
+
+
 # ============================================================================
 # Routes
 # ============================================================================
 @router.post("/single", response_model=PredictionResponse)
 async def predict_single_point(request: SinglePredictionRequest):
     """
-    Predict power consumption for a single time point
+    Predict power consumption for a single time point. Like every other
+    prediction endpoint it reads the model's precomputed minute grid, so
+    the same time gives the same value here and in /batch.
     
     Example:
     ```json
@@ -87,8 +228,9 @@ async def predict_single_point(request: SinglePredictionRequest):
     }
     ```
     """
+    service = get_service(request.meter_id)
     try:
-        prediction = power_prediction_service.predict_single(
+        prediction = service.predict_single(
             request.month,
             request.day_of_week,
             request.hour,
@@ -110,6 +252,7 @@ async def predict_single_point(request: SinglePredictionRequest):
 
 
 @router.post("/day", response_model=DayPredictionResponse)
+@cached(ttl=3600, version=models_version)
 async def predict_day(request: DayPredictionRequest):
     """
     Predict power consumption for 24 hours
@@ -123,8 +266,9 @@ async def predict_day(request: DayPredictionRequest):
     }
     ```
     """
+    service = get_service(request.meter_id)
     try:
-        predictions = power_prediction_service.predict_24h(
+        predictions = service.predict_24h(
             request.month,
             request.day_of_week,
             request.interval_minutes
@@ -154,6 +298,7 @@ async def predict_day(request: DayPredictionRequest):
 
 
 @router.post("/week")
+@cached(ttl=3600, version=models_version)
 async def predict_week(request: WeekPredictionRequest):
     """
     Predict power consumption for a full week
@@ -166,8 +311,9 @@ async def predict_week(request: WeekPredictionRequest):
     }
     ```
     """
+    service = get_service(request.meter_id)
     try:
-        week_predictions = power_prediction_service.predict_week(
+        week_predictions = service.predict_week(
             request.month,
             request.start_day
         )
@@ -195,11 +341,58 @@ async def predict_week(request: WeekPredictionRequest):
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 
+@router.post("/batch")
+def predict_batch(request: BatchPredictionRequest):
+    """
+    Predict power for many timestamps in one call, streamed as NDJSON
+    lines of {"timestamp", "power_kw"} in request order
+    
+    Example:
+    ```json
+    {
+        "start": "2025-01-01T00:00:00",
+        "end": "2026-01-01T00:00:00",
+        "step_minutes": 5
+    }
+    ```
+    or `{"timestamps": ["2025-06-02T14:30:00", ...]}`
+    """
+    service = get_service(request.meter_id)
+    try:
+        ts = batch_timestamps(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Checked before anything is streamed; a failure mid-stream would reach
+    # the client as a truncated 200
+    invalid = np.flatnonzero(np.isnat(ts))
+    if len(invalid):
+        shown = [request.timestamps[i] for i in invalid[:MAX_INVALID_SHOWN]]
+        raise HTTPException(
+            status_code=422,
+            detail=f"{len(invalid)} invalid timestamp(s), e.g. at positions {invalid[:MAX_INVALID_SHOWN].tolist()}: {shown}"
+        )
+    
+    try:
+        power = service.predict_timestamps(ts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    
+    return StreamingResponse(
+        ndjson_lines(ts, power),
+        media_type="application/x-ndjson",
+        headers={"X-Prediction-Count": str(len(ts))},
+    )
+
+
 @router.get("/stats", response_model=ModelStats)
-async def get_model_stats():
+async def get_model_stats(meter_id: Optional[int] = None):
     """Get model performance statistics"""
+    service = get_service(meter_id)
     try:
-        stats = power_prediction_service.get_stats()
+        stats = service.get_stats()
         return ModelStats(**stats)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -207,40 +400,93 @@ async def get_model_stats():
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {str(e)}")
 
 
-@router.post("/train")
-async def train_new_model(file: UploadFile = File(...)):
+@router.post("/train", status_code=202, dependencies=[Depends(require_admin)])
+def train_new_model(file: UploadFile = File(...), force: bool = False):
     """
-    Train a new model from uploaded CSV file
+    Train a new campus model version from uploaded CSV file in a background
+    process and return its job at once; follow it at /jobs/{id} and cancel
+    it with DELETE /jobs/{id}. The version is put in service only if it does
+    no worse than the current model on its holdout rows, or with force=true.
     
     CSV should have columns: Time, Main_Transformer
     """
+    if jobs.running("model_training"):
+        raise HTTPException(status_code=409, detail="A model training job is already running")
+    
     try:
-        # Save uploaded file temporarily
-        temp_path = Path("data/temp_training_data.csv")
-        temp_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with temp_path.open("wb") as buffer:
+        # Kept until the job is done with it
+        temp_dir = Path("data")
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", dir=temp_dir, prefix="training_", suffix=".csv", delete=False) as buffer:
             shutil.copyfileobj(file.file, buffer)
-        
-        # Train model
-        stats = power_prediction_service.train_model(str(temp_path))
-        
-        # Clean up
-        temp_path.unlink()
-        
-        return {
-            'message': 'Model trained successfully',
-            'stats': stats
-        }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Training failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to store training data: {str(e)}")
+    
+    job = jobs.submit("model_training", campus_training_job, buffer.name, force, params={'force': force})
+    return training_accepted(job, 'Model training started')
+
+
+@router.post("/train/meters", status_code=202, dependencies=[Depends(require_admin)])
+def train_meter_models_route(request: TrainMetersRequest):
+    """
+    Train one model version per meter from its 15-minute demand history in
+    the database, in a background process; each is put in service if it
+    beats the meter's current one. Returns the job at once.
+    """
+    if jobs.running("meter_training"):
+        raise HTTPException(status_code=409, detail="A meter training job is already running")
+    
+    job = jobs.submit(
+        "meter_training",
+        meter_training_job,
+        request.meter_ids,
+        request.workers,
+        request.force,
+        params=request.model_dump(),
+    )
+    return training_accepted(job, 'Meter model training started')
+
+
+@router.get("/meters")
+async def list_meter_models():
+    """Meters that have their own model, with its statistics"""
+    meters = []
+    for meter_id in model_registry.meter_ids():
+        service = model_registry.get(meter_id)
+        if service is not None:
+            meters.append({'meter_id': meter_id, 'stats': service.get_stats()})
+    return {'meters': meters}
+
+
+@router.get("/versions")
+async def list_model_versions(meter_id: Optional[int] = None):
+    """Versions of the campus model, or of a meter's model, newest first"""
+    try:
+        versions = await run_in_threadpool(versions_of, meter_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to list versions: {str(e)}")
+    return {'meter_id': meter_id, 'versions': versions}
+
+
+@router.post("/versions/{version_id}/promote", dependencies=[Depends(require_admin)])
+async def promote_model_version(version_id: int):
+    """Put a version in service regardless of its metrics, e.g. to roll back"""
+    try:
+        version = await run_in_threadpool(promote_version, version_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Promotion failed: {str(e)}")
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"Model version {version_id} not found")
+    return {'message': f"Model version {version['version']} promoted", 'version': version}
 
 
 @router.post("/load")
 async def load_model():
-    """Load the saved model from disk"""
+    """Reload the saved model from disk and the active registry versions"""
     try:
-        power_prediction_service.load_model()
+        await run_in_threadpool(reload_models)
         stats = power_prediction_service.get_stats()
         return {
             'message': 'Model loaded successfully',
@@ -0,0 +1,229 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import date, datetime, time, timedelta
+
+from ..models import TariffDB, TariffRateDB, TariffSlabDB
+from ..database import get_db
+from ..api.billing import get_interval_energy, mark_bills_dirty
+from ..api.tariff import Intervals, Tariff, compare_tariffs, tariff_from_db
+from .auth.auth_utils import require_admin
+
+router = APIRouter(prefix="/tariffs", tags=["tariffs"])
+
+MAX_WHAT_IF_CANDIDATES = 20
+
+
+class RateWindow(BaseModel):
+    start_month: int = Field(1, ge=1, le=12)
+    end_month: int = Field(12, ge=1, le=12)
+    start_hour: int = Field(..., ge=0, le=23)
+    end_hour: int = Field(..., ge=0, le=24)
+    rate: float = Field(..., ge=0)
+
+
+class Slab(BaseModel):
+    upper_kwh: Optional[float] = Field(None, gt=0)
+    rate: float = Field(..., ge=0)
+
+
+class TariffIn(BaseModel):
+    name: str
+    effective_from: date
+    default_rate: float = Field(..., ge=0)
+    demand_charge: float = Field(0.0, ge=0)
+    fixed_charge: float = Field(0.0, ge=0)
+    is_active: bool = True
+    rates: List[RateWindow] = []
+    slabs: List[Slab] = []
+
+
+class WhatIfRequest(BaseModel):
+    from_date: date
+    to_date: date
+    tariff_ids: List[int] = []
+    tariffs: List[TariffIn] = []
+    meter_ids: Optional[List[int]] = None
+
+
+def _check_slabs(slabs: List[Slab]):
+    uppers = [s.upper_kwh for s in slabs]
+    if None in uppers[:-1]:
+        raise HTTPException(status_code=400, detail="Only the last slab can be unbounded")
+    bounded = [u for u in uppers if u is not None]
+    if any(b <= a for a, b in zip(bounded, bounded[1:])):
+        raise HTTPException(status_code=400, detail="Slab upper bounds must be increasing")
+
+
+def _tariff_from_input(tariff: TariffIn):
+    _check_slabs(tariff.slabs)
+    return Tariff(
+        name=tariff.name,
+        effective_from=tariff.effective_from,
+        default_rate=tariff.default_rate,
+        windows=[(w.start_month, w.end_month, w.start_hour, w.end_hour, w.rate) for w in tariff.rates],
+        slabs=[(s.upper_kwh, s.rate) for s in tariff.slabs],
+        demand_charge=tariff.demand_charge,
+        fixed_charge=tariff.fixed_charge,
+    )
+
+
+def _effective_until(db: Session, row: TariffDB):
+    """When the next active tariff takes over from row, or None if none does"""
+    return (
+        db.query(func.min(TariffDB.effective_from))
+        .filter(
+            TariffDB.is_active.is_(True),
+            TariffDB.effective_from > row.effective_from,
+            TariffDB.id != row.id,
+        )
+        .scalar()
+    )
+
+
+def _tariff_out(db: Session, row: TariffDB):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "effective_from": row.effective_from,
+        "is_active": row.is_active,
+        "default_rate": row.default_rate,
+        "demand_charge": row.demand_charge,
+        "fixed_charge": row.fixed_charge,
+        "rates": [
+            {
+                "start_month": w.start_month,
+                "end_month": w.end_month,
+                "start_hour": w.start_hour,
+                "end_hour": w.end_hour,
+                "rate": w.rate,
+            }
+            for w in db.query(TariffRateDB).filter(TariffRateDB.tariff_id == row.id).order_by(TariffRateDB.id)
+        ],
+        "slabs": [
+            {"upper_kwh": s.upper_kwh, "rate": s.rate}
+            for s in db.query(TariffSlabDB)
+            .filter(TariffSlabDB.tariff_id == row.id)
+            .order_by(TariffSlabDB.upper_kwh.asc().nulls_last())
+        ],
+    }
+
+
+@router.get("")
+def get_tariffs(db: Session = Depends(get_db)):
+    rows = db.query(TariffDB).order_by(TariffDB.effective_from).all()
+    return {
+        "success": True,
+        "data": [_tariff_out(db, row) for row in rows]
+    }
+
+
+@router.post("", dependencies=[Depends(require_admin)])
+def create_tariff(tariff: TariffIn, db: Session = Depends(get_db)):
+    """
+    Add a tariff. Computed bills of the months it covers are flagged for the
+    billing job, which re-prices them on its next run.
+    """
+    _check_slabs(tariff.slabs)
+    if db.query(TariffDB).filter(TariffDB.name == tariff.name).first():
+        raise HTTPException(status_code=400, detail="A tariff with this name already exists")
+
+    try:
+        row = TariffDB(
+            name=tariff.name,
+            effective_from=tariff.effective_from,
+            is_active=tariff.is_active,
+            default_rate=tariff.default_rate,
+            demand_charge=tariff.demand_charge,
+            fixed_charge=tariff.fixed_charge,
+        )
+        db.add(row)
+        db.flush()
+        db.add_all([
+            TariffRateDB(tariff_id=row.id, **window.model_dump())
+            for window in tariff.rates
+        ])
+        db.add_all([
+            TariffSlabDB(tariff_id=row.id, **slab.model_dump())
+            for slab in tariff.slabs
+        ])
+        rebilling = []
+        if row.is_active:
+            rebilling = mark_bills_dirty(db, row.effective_from, _effective_until(db, row))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to create tariff: {str(e)}")
+
+    return {
+        "success": True,
+        "data": _tariff_out(db, row),
+        "rebilling_months": rebilling
+    }
+
+
+@router.delete("/{tariff_id}", dependencies=[Depends(require_admin)])
+def delete_tariff(tariff_id: int, db: Session = Depends(get_db)):
+    """Remove a tariff. Computed bills of the months it covered are flagged for the billing job."""
+    row = db.query(TariffDB).filter(TariffDB.id == tariff_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Tariff not found")
+
+    rebilling = []
+    if row.is_active:
+        rebilling = mark_bills_dirty(db, row.effective_from, _effective_until(db, row))
+    db.delete(row)
+    db.commit()
+
+    return {
+        "success": True,
+        "message": f"Tariff {tariff_id} deleted",
+        "rebilling_months": rebilling
+    }
+
+
+@router.post("/what_if")
+def what_if(request: WhatIfRequest, db: Session = Depends(get_db)):
+    """
+    Price the same period under several candidate tariffs (stored ones by id
+    and/or inline definitions), each applied to the whole period. Nothing
+    is written.
+    """
+    if request.from_date > request.to_date:
+        raise HTTPException(
+            status_code=400,
+            detail="from_date cannot be later than to_date"
+        )
+
+    candidates = []
+    if request.tariff_ids:
+        rows = {row.id: row for row in db.query(TariffDB).filter(TariffDB.id.in_(request.tariff_ids))}
+        missing = set(request.tariff_ids) - set(rows)
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Tariff(s) not found: {sorted(missing)}")
+        candidates += [tariff_from_db(db, rows[tariff_id]) for tariff_id in request.tariff_ids]
+    candidates += [_tariff_from_input(tariff) for tariff in request.tariffs]
+
+    if not candidates:
+        raise HTTPException(status_code=400, detail="At least one tariff is required")
+    if len(candidates) > MAX_WHAT_IF_CANDIDATES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_WHAT_IF_CANDIDATES} tariffs can be compared at once"
+        )
+
+    intervals = Intervals(*get_interval_energy(
+        db,
+        datetime.combine(request.from_date, time.min),
+        datetime.combine(request.to_date + timedelta(days=1), time.min),
+        request.meter_ids,
+    ))
+
+    return {
+        "success": True,
+        "from_date": request.from_date,
+        "to_date": request.to_date,
+        "data": compare_tariffs(candidates, intervals)
+    }
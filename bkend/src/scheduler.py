@@ -1,9 +1,18 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from .database import SessionLocal
-from .api.billing import calculate_bill
+from .database import SessionLocal, db_engine
+from .api.billing import update_dirty_bills
+from .api.demand import refresh_demand
+from .api.energy_balance import refresh_energy_balance
+from .api.interval_energy import refresh_interval_energy
+from .api.model_versions import sync_models
+from .api.training_jobs import meter_training_job
+from .api.projection import refresh_projection
+from .ml_model import power_prediction_service
+from .utils.jobs import SUCCEEDED, jobs
 from .utils.meter_status import update_flatline_status
 
 def meter_status_job():
@@ -19,19 +28,89 @@ def meter_status_job():
 scheduler = BackgroundScheduler()
 
 def daily_billing_job():
+    db: Session = SessionLocal()
+    try:
+        months = update_dirty_bills(db)
+        print(f"Daily billing job updated {months} month(s) at {datetime.now()}")
+    except Exception as e:
+        print(f"Error in daily billing job: {e}")
+    finally:
+        db.close()
+
+
+def demand_job():
+    db: Session = SessionLocal()
+    try:
+        updated = refresh_demand(db)
+        print(f"Demand job refreshed {updated} interval(s) at {datetime.now()}")
+    except Exception as e:
+        print(f"Error in demand job: {e}")
+    finally:
+        db.close()
+
+def interval_energy_job():
+    db: Session = SessionLocal()
+    try:
+        updated = refresh_interval_energy(db)
+        print(f"Interval energy job stored {updated} interval(s) at {datetime.now()}")
+    except Exception as e:
+        print(f"Error in interval energy job: {e}")
+    finally:
+        db.close()
+
+def projection_job():
     db: Session = SessionLocal()
     try:
         now = datetime.now()
-        year = now.year
-        month = now.month
+        meters = refresh_projection(db, now.year, now.month, power_prediction_service, now)
+        print(f"Projection job projected {meters} meter(s) at {now}")
+    except Exception as e:
+        print(f"Error in projection job: {e}")
+    finally:
+        db.close()
 
-        calculate_bill(year, month, db)
-        print(f"Daily billing job completed for {year}-{month:02d} at {now}")
+def model_sync_job():
+    db: Session = SessionLocal()
+    try:
+        swapped = sync_models(db)
+        if swapped:
+            print(f"Model sync job swapped in {swapped} model(s) at {datetime.now()}")
     except Exception as e:
-        print(f"Error in daily billing job: {e}")
+        print(f"Error in model sync job: {e}")
     finally:
         db.close()
 
+def model_retrain_job():
+    if jobs.running("meter_training"):
+        return
+    # Every process runs the scheduler; the first to take the lock retrains
+    # and the others pick the promoted versions up through model_sync_job.
+    # Autocommit, so the connection holding the lock is not left idle in a
+    # transaction for the whole run.
+    with db_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        key = func.hashtext("model_retrain_job")
+        if not lock_conn.execute(select(func.pg_try_advisory_lock(key))).scalar():
+            return
+        try:
+            # Tracked like any job, so it shows in /jobs and can be cancelled
+            job = jobs.run("meter_training", meter_training_job, params={"scheduled": True})
+            if job.status == SUCCEEDED:
+                promoted = sum(version["status"] == "active" for version in job.result.values())
+                print(f"Model retrain job promoted {promoted} of {len(job.result)} meter model(s) at {datetime.now()}")
+        except Exception as e:
+            print(f"Error in model retrain job: {e}")
+        finally:
+            lock_conn.execute(select(func.pg_advisory_unlock(key)))
+
+def energy_balance_job():
+    db: Session = SessionLocal()
+    try:
+        days = refresh_energy_balance(db)
+        print(f"Energy balance job refreshed {days} day(s) at {datetime.now()}")
+    except Exception as e:
+        print(f"Error in energy balance job: {e}")
+    finally:
+        db.close()
 
 
 scheduler.add_job(
@@ -49,3 +128,51 @@ scheduler.add_job(
     id="meter_status_job",
     replace_existing=True
 )
+
+scheduler.add_job(
+    demand_job,
+    trigger="interval",
+    minutes=15,
+    id="demand_job",
+    replace_existing=True
+)
+
+scheduler.add_job(
+    energy_balance_job,
+    trigger="interval",
+    hours=1,
+    id="energy_balance_job",
+    replace_existing=True
+)
+
+scheduler.add_job(
+    interval_energy_job,
+    trigger="interval",
+    hours=1,
+    id="interval_energy_job",
+    replace_existing=True
+)
+
+scheduler.add_job(
+    projection_job,
+    trigger="interval",
+    hours=1,
+    id="projection_job",
+    replace_existing=True
+)
+
+scheduler.add_job(
+    model_sync_job,
+    trigger="interval",
+    minutes=1,
+    id="model_sync_job",
+    replace_existing=True
+)
+
+scheduler.add_job(
+    model_retrain_job,
+    trigger="interval",
+    hours=24,
+    id="model_retrain_job",
+    replace_existing=True
+)
@@ -0,0 +1,159 @@
+import threading
+import traceback
+import uuid
+from datetime import datetime
+from typing import Callable, Optional
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    A long-running task started from a route or the CLI. The task function
+    receives the job and reports progress through it; it should call
+    check_cancelled() between units of work.
+    """
+
+    def __init__(self, kind: str, total: Optional[int] = None, params: Optional[dict] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = PENDING
+        self.total = total
+        self.done = 0
+        self.message: Optional[str] = None
+        self.errors: list[str] = []
+        self.result = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+
+    def advance(self, steps: int = 1, message: Optional[str] = None):
+        self.done += steps
+        if message is not None:
+            self.message = message
+
+    def fail_step(self, error: str):
+        self.errors.append(error)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def wait(self, timeout: Optional[float] = None):
+        return self._finished.wait(timeout)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "progress": self.done / self.total if self.total else None,
+            "message": self.message,
+            "errors": self.errors,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobRegistry:
+    """In-process registry of background jobs, each run on its own thread"""
+
+    def __init__(self, keep: int = 100):
+        self.keep = keep
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable,
+        *args,
+        total: Optional[int] = None,
+        params: Optional[dict] = None,
+        **kwargs,
+    ) -> Job:
+        job = Job(kind, total=total, params=params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+
+        thread = threading.Thread(
+            target=self._run, args=(job, fn, args, kwargs), name=f"job-{kind}-{job.id[:8]}", daemon=True
+        )
+        thread.start()
+        return job
+
+    def run(self, kind: str, fn: Callable, *args, total: Optional[int] = None, params: Optional[dict] = None, **kwargs) -> Job:
+        """Run a job on the calling thread, e.g. from the CLI"""
+        job = Job(kind, total=total, params=params)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._run(job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn: Callable, args, kwargs):
+        job.status = RUNNING
+        job.started_at = datetime.utcnow()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = CANCELLED if job.cancel_requested else SUCCEEDED
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.status = FAILED
+            job.errors.append(f"{type(e).__name__}: {e}")
+            traceback.print_exc()
+        finally:
+            job.finished_at = datetime.utcnow()
+            job._finished.set()
+            print(f"Job {job.kind} {job.id} {job.status}")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, kind: Optional[str] = None):
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if kind is None or j.kind == kind]
+        return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+    def running(self, kind: str):
+        return [j for j in self.list(kind) if j.status not in FINISHED]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED:
+            job._cancel.set()
+        return job
+
+    def _prune(self):
+        finished = sorted(
+            (j for j in self._jobs.values() if j.status in FINISHED),
+            key=lambda j: j.created_at,
+        )
+        for job in finished[:max(0, len(self._jobs) - self.keep)]:
+            del self._jobs[job.id]
+
+
+jobs = JobRegistry()
@@ -0,0 +1,215 @@
+import functools
+import inspect
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, List, Optional
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from src.database import SessionLocal
+from src.utils.watermark import get_watermarks
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "snapshot", "size")
+
+    def __init__(self, value, expires_at, snapshot, size):
+        self.value = value
+        self.expires_at = expires_at
+        self.snapshot = snapshot
+        self.size = size
+
+
+class ResultCache:
+    """
+    Size-bounded LRU of route results. Every entry carries a TTL and a
+    snapshot of the watermarks (or other version) it was computed from;
+    a lookup whose snapshot no longer matches counts as an invalidation.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, key, snapshot):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            if entry.expires_at < time.monotonic() or entry.snapshot != snapshot:
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry.value
+
+    def put(self, key, value, ttl: float, snapshot):
+        try:
+            size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            # Not measurable, so not cacheable
+            return
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, time.monotonic() + ttl, snapshot, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._lock:
+            keys = [k for k in self._entries if namespace is None or k[0] == namespace]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            namespaces = {}
+            for key, entry in self._entries.items():
+                ns = namespaces.setdefault(key[0], {"entries": 0, "bytes": 0})
+                ns["entries"] += 1
+                ns["bytes"] += entry.size
+
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else None,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "namespaces": namespaces,
+            }
+
+
+result_cache = ResultCache()
+
+
+def _normalize(value):
+    if isinstance(value, BaseModel):
+        return _normalize(value.model_dump())
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def cached(
+    ttl: float = 300,
+    namespace: Optional[str] = None,
+    resources: Optional[Callable[..., List[str]]] = None,
+    prefix: Optional[str] = None,
+    version: Optional[Callable[[], Any]] = None,
+    cache: ResultCache = result_cache,
+):
+    """
+    Cache a route's return value keyed by its normalized parameters.
+
+    resources / prefix name the watermarks the result depends on (resources
+    is called with the route's arguments); version is any other cheap
+    callable whose change should invalidate entries, e.g. a model version.
+    Sessions, requests and responses are not part of the key. For async
+    routes the watermark lookup runs in the threadpool, off the event loop.
+    """
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        ns = namespace or fn.__name__
+
+        def key_and_snapshot(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+
+            db = None
+            params = []
+            for name, value in bound.arguments.items():
+                if isinstance(value, Session):
+                    db = value
+                    continue
+                if isinstance(value, (Request, Response)):
+                    continue
+                params.append((name, _normalize(value)))
+
+            snapshot = None
+            if resources is not None or prefix is not None:
+                keys = resources(**bound.arguments) if resources else []
+                if db is not None:
+                    watermarks = get_watermarks(db, resources=keys, prefix=prefix)
+                else:
+                    session = SessionLocal()
+                    try:
+                        watermarks = get_watermarks(session, resources=keys, prefix=prefix)
+                    finally:
+                        session.close()
+                snapshot = tuple(sorted((k, v) for k, (v, _) in watermarks.items()))
+            if version is not None:
+                snapshot = (snapshot, version())
+
+            return (ns, tuple(params)), snapshot
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if resources is not None or prefix is not None:
+                    # A blocking database query
+                    key, snapshot = await run_in_threadpool(key_and_snapshot, args, kwargs)
+                else:
+                    key, snapshot = key_and_snapshot(args, kwargs)
+                hit, value = cache.get(key, snapshot)
+                if hit:
+                    return value
+                value = await fn(*args, **kwargs)
+                cache.put(key, value, ttl, snapshot)
+                return value
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key, snapshot = key_and_snapshot(args, kwargs)
+            hit, value = cache.get(key, snapshot)
+            if hit:
+                return value
+            value = fn(*args, **kwargs)
+            cache.put(key, value, ttl, snapshot)
+            return value
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,101 @@
+from datetime import date, datetime
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from src.models import DataWatermarkDB
+
+METER_REGISTRY = "meters"
+# Bumped whenever a forecasting model version is promoted
+MODEL_REGISTRY = "models"
+METER_PREFIX = "meter:"
+BILLING_PREFIX = "billing:"
+# Readings of any meter, or of one meter, within a calendar month. Results
+# over a fixed period depend on these rather than on every meter's key, so
+# ingest of today's readings leaves cached past months valid.
+PERIOD_PREFIX = "period:"
+METER_PERIOD_PREFIX = "meter_period:"
+
+
+def meter_key(meter_id: int) -> str:
+    return f"{METER_PREFIX}{meter_id}"
+
+
+def period_key(day) -> str:
+    """Key of the month containing a date or datetime"""
+    return f"{PERIOD_PREFIX}{day.year}-{day.month:02d}"
+
+
+def meter_period_key(meter_id: int, day) -> str:
+    return f"{METER_PERIOD_PREFIX}{meter_id}:{day.year}-{day.month:02d}"
+
+
+def reading_keys(meter_id: int, days) -> list[str]:
+    """Everything to bump when a meter's readings on the given dates change"""
+    keys = {meter_key(meter_id)}
+    for day in days:
+        keys.add(period_key(day))
+        keys.add(meter_period_key(meter_id, day))
+    return sorted(keys)
+
+
+def months_in(start, end) -> list[date]:
+    """First day of every month overlapping [start, end)"""
+    months = []
+    year, month = start.year, start.month
+    while date(year, month, 1) < end:
+        months.append(date(year, month, 1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def billing_key(month_key: str) -> str:
+    return f"{BILLING_PREFIX}{month_key}"
+
+
+def bump_watermark(db: Session, *resources: str):
+    # Runs inside the caller's transaction so the watermark moves together
+    # with the data it describes; the caller commits.
+    if not resources:
+        return
+
+    now = datetime.utcnow()
+    stmt = insert(DataWatermarkDB).values([
+        {"resource": resource, "version": 1, "updated_at": now}
+        for resource in sorted(set(resources))
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DataWatermarkDB.resource],
+        set_={
+            "version": DataWatermarkDB.version + 1,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt)
+
+
+def get_watermarks(
+    db: Session,
+    resources: list[str] | None = None,
+    prefix: str | None = None,
+) -> dict[str, tuple[int, datetime]]:
+    query = db.query(
+        DataWatermarkDB.resource,
+        DataWatermarkDB.version,
+        DataWatermarkDB.updated_at,
+    )
+
+    conditions = []
+    if resources:
+        conditions.append(DataWatermarkDB.resource.in_(resources))
+    if prefix:
+        conditions.append(DataWatermarkDB.resource.startswith(prefix))
+    if not conditions:
+        return {}
+
+    rows = query.filter(or_(*conditions)).all()
+
+    return {
+        row.resource: (row.version, row.updated_at)
+        for row in rows
+    }